@@ -1,13 +1,49 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import Optional
-from ..database.database import DatabaseService
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from ..core.config import settings
+from ..core.logging import log_interaction_event
+from ..database.async_database import AsyncDatabaseService
+from ..database.database import VALID_INTERACTION_TYPES, DatabaseService, decode_history_cursor, validate_interaction
+from ..services.events import EngineBuilt, InteractionRecorded, event_bus
+from ..services.interaction_ingestor import IngestionBackpressure, InteractionIngestor
+import asyncio
+import json
 import logging
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 db_service = DatabaseService()
+async_db_service = AsyncDatabaseService(identity=db_service.identity)
+
+def handle_engine_built(event: EngineBuilt) -> None:
+    """
+    Adopt the new snapshot's post categories, then credit the preferences
+    recorded before those categories were known (off the event loop)
+    """
+    db_service.identity.update_post_categories(event.engine.post_categories)
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        db_service.credit_pending_preferences()
+        return
+    future = asyncio.ensure_future(asyncio.to_thread(db_service.credit_pending_preferences))
+    # Already logged by credit_pending_preferences; retrieve it so it is not reported again
+    future.add_done_callback(lambda done: done.cancelled() or done.exception())
+
+event_bus.subscribe(EngineBuilt, handle_engine_built)
+
+interaction_ingestor = InteractionIngestor(
+    write_batch=db_service.record_interactions,
+    batch_size=settings.INGEST_BATCH_SIZE,
+    max_delay_seconds=settings.INGEST_MAX_DELAY_SECONDS,
+    max_queue_size=settings.INGEST_MAX_QUEUE_SIZE,
+    durability=settings.INGEST_DURABILITY,
+    enqueue_timeout_seconds=settings.INGEST_ENQUEUE_TIMEOUT_SECONDS,
+    bulk_queue_share=settings.INGEST_BULK_QUEUE_SHARE
+)
 
 class InteractionCreate(BaseModel):
     username: str
@@ -19,32 +55,194 @@ class InteractionCreate(BaseModel):
 async def record_interaction(interaction: InteractionCreate):
     """Record a user interaction with a post"""
     try:
-        db_service.record_interaction(
+        db_service.validate_interaction(interaction.interaction_type, interaction.rating)
+        await interaction_ingestor.submit({
+            'username': interaction.username,
+            'post_id': interaction.post_id,
+            'interaction_type': interaction.interaction_type,
+            'rating': interaction.rating
+        })
+        event_bus.publish(InteractionRecorded(
             username=interaction.username,
             post_id=interaction.post_id,
             interaction_type=interaction.interaction_type,
             rating=interaction.rating
-        )
+        ))
+        log_interaction_event(interaction.username, interaction.post_id, interaction.interaction_type, interaction.rating)
         return {"status": "success"}
     except ValueError as ve:
         # Handle validation errors
         logger.warning(f"Validation error: {str(ve)}")
         return {"status": "error", "message": str(ve)}
+    except IngestionBackpressure as bp:
+        logger.warning(f"Interaction ingestion saturated: {str(bp)}")
+        raise HTTPException(status_code=503, detail=str(bp))
     except Exception as e:
         # Handle other errors
         logger.error(f"Error recording interaction: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def parse_bulk_interaction(record: Any) -> Dict[str, Any]:
+    """Check one bulk item with the same rules InteractionCreate and validate_interaction apply"""
+    if not isinstance(record, dict):
+        raise ValueError("Interaction must be a JSON object")
+    username = record.get('username')
+    if not isinstance(username, str) or not username:
+        raise ValueError("username is required")
+
+    post_id = record.get('post_id')
+    if isinstance(post_id, bool) or not isinstance(post_id, (int, str)):
+        raise ValueError("post_id must be an integer")
+    try:
+        post_id = int(post_id)
+    except ValueError:
+        raise ValueError("post_id must be an integer")
+
+    rating = record.get('rating')
+    if rating is not None:
+        if isinstance(rating, bool) or not isinstance(rating, (int, float)):
+            raise ValueError("rating must be a number")
+        rating = float(rating)
+
+    interaction_type = record.get('interaction_type')
+    validate_interaction(interaction_type, rating)
+    return {'username': username, 'post_id': post_id, 'interaction_type': interaction_type, 'rating': rating}
+
+def _body_too_large() -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"Request body exceeds {settings.INTERACTION_BULK_MAX_BYTES} bytes"
+    )
+
+async def _limited_body(request: Request) -> AsyncIterator[bytes]:
+    """Stream the request body, rejecting it once it grows past INTERACTION_BULK_MAX_BYTES"""
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > settings.INTERACTION_BULK_MAX_BYTES:
+        raise _body_too_large()
+    received = 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > settings.INTERACTION_BULK_MAX_BYTES:
+            raise _body_too_large()
+        yield chunk
+
+async def _ndjson_records(request: Request) -> AsyncIterator[Tuple[Any, Optional[str]]]:
+    """Yield (record, parse error) per non-empty line of a streamed NDJSON body"""
+    buffer = b""
+    async for chunk in _limited_body(request):
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield _decode_line(line)
+    if buffer.strip():
+        yield _decode_line(buffer)
+
+def _decode_line(line: bytes) -> Tuple[Any, Optional[str]]:
+    try:
+        return json.loads(line), None
+    except ValueError:
+        return None, "Invalid JSON"
+
+@router.post("/bulk")
+async def record_interactions_bulk(request: Request):
+    """
+    Record many interactions from a JSON array or an NDJSON body
+    (Content-Type: application/x-ndjson) in one transaction. Invalid items are
+    reported by index and skipped; valid ones are written together by the
+    ingestion writer thread. The write holds ingestion queue slots for its
+    rows, so a saturated queue answers 503.
+    """
+    accepted: List[Dict[str, Any]] = []
+    errors: List[Dict[str, Any]] = []
+
+    def check(index: int, record: Any, parse_error: Optional[str] = None) -> None:
+        if len(accepted) + len(errors) >= settings.INTERACTION_BULK_MAX_ITEMS:
+            raise HTTPException(
+                status_code=413,
+                detail=f"At most {settings.INTERACTION_BULK_MAX_ITEMS} interactions per request"
+            )
+        if parse_error is not None:
+            errors.append({"index": index, "message": parse_error})
+            return
+        try:
+            accepted.append(parse_bulk_interaction(record))
+        except ValueError as ve:
+            errors.append({"index": index, "message": str(ve)})
+
+    if "application/x-ndjson" in request.headers.get("content-type", ""):
+        index = 0
+        async for record, parse_error in _ndjson_records(request):
+            check(index, record, parse_error)
+            index += 1
+    else:
+        try:
+            records = json.loads(b"".join([chunk async for chunk in _limited_body(request)]))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+        if not isinstance(records, list):
+            raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+        for index, record in enumerate(records):
+            check(index, record)
+
+    try:
+        written = 0
+        if accepted:
+            written = await interaction_ingestor.submit_many(accepted)
+    except IngestionBackpressure as bp:
+        logger.warning(f"Interaction ingestion saturated: {str(bp)}")
+        raise HTTPException(status_code=503, detail=str(bp))
+    except Exception as e:
+        logger.error(f"Error recording interaction batch: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    for interaction in accepted:
+        event_bus.publish(InteractionRecorded(**interaction))
+
+    if errors:
+        logger.warning(f"Rejected {len(errors)} of {len(errors) + written} bulk interactions")
+    return {
+        "status": "success" if not errors else "partial" if written else "error",
+        "accepted": written,
+        "rejected": len(errors),
+        "errors": errors
+    }
+
 @router.get("/{username}")
-async def get_user_interactions(username: str):
-    """Get a user's interaction history"""
+async def get_user_interactions(
+    request: Request,
+    username: str,
+    limit: int = Query(settings.HISTORY_PAGE_SIZE, ge=1, le=settings.HISTORY_MAX_PAGE_SIZE, description="Maximum interactions to return"),
+    before: Optional[str] = Query(None, description="Cursor from a previous page's next_cursor"),
+    interaction_type: Optional[List[str]] = Query(None, alias="type", description="Only include these interaction types")
+):
+    """Get a page of a user's interaction history, newest first"""
     try:
-        history = db_service.get_user_history(username)
+        if before:
+            decode_history_cursor(before)
+        invalid_types = set(interaction_type or []) - set(VALID_INTERACTION_TYPES)
+        if invalid_types:
+            raise ValueError(f"Invalid interaction type. Must be one of: {VALID_INTERACTION_TYPES}")
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
+
+    if "application/x-ndjson" in request.headers.get("accept", ""):
+        async def stream_history():
+            async for record in async_db_service.stream_user_history(
+                username, limit, before, interaction_type, chunk_size=settings.HISTORY_STREAM_CHUNK_SIZE
+            ):
+                yield json.dumps(record) + "\n"
+
+        return StreamingResponse(stream_history(), media_type="application/x-ndjson")
+
+    try:
+        page = await async_db_service.get_user_history_page(username, limit, before, interaction_type)
         return {
             "username": username,
-            "history": history,
-            "preferences": db_service.get_user_preferences(username)
+            "history": page['history'],
+            "preferences": await async_db_service.get_user_preferences(username),
+            "next_cursor": page['next_cursor']
         }
     except Exception as e:
         logger.error(f"Error fetching interactions: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
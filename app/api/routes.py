@@ -1,18 +1,310 @@
+import asyncio
+import json
 import logging
 import time
-from fastapi import APIRouter, HTTPException, Query
-from fastapi.responses import JSONResponse
-from typing import Optional, List, Dict, Any
+from datetime import datetime
+from fastapi import APIRouter, Header, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from typing import AsyncIterator, Awaitable, Iterable, Iterator, Optional, List, Dict, Any, Tuple, Union
+from urllib.parse import urlsplit
 from pydantic import BaseModel
-from cachetools import TTLCache
 from ..core.config import settings
+from ..core.logging import log_recommendation_event, logging_stats
+from .interaction_routes import async_db_service, interaction_ingestor
+from ..services.cache_warmer import CacheWarmer, FeedShape
+from ..services.compute_pool import ComputePool, LoopLagMonitor
 from ..services.data_fetcher import DataFetcher
+from ..services.deadline import Deadline, DeadlineExceeded
+from ..services.engine_snapshot import EngineSnapshot
+from ..services.events import EngineBuilt, InteractionRecorded, event_bus
+from ..services.feed_cache import FeedCache, feed_cache_key, feed_tags
+from ..services.feed_store import FeedStore
+from ..services.metrics import Sample, metrics
+from ..services.popularity import PopularityFeed
+from ..services.profiler import RequestProfiler
 from ..services.recommendation_engine import RecommendationEngine
+from ..services.upstream import BREAKER_STATES, UpstreamRegistry, UpstreamUnavailable
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
-posts_cache = TTLCache(maxsize=settings.CACHE_MAXSIZE, ttl=settings.CACHE_TTL)
+posts_cache = FeedCache(
+    maxsize=settings.CACHE_MAXSIZE,
+    ttl=settings.CACHE_TTL,
+    popularity_threshold=settings.CACHE_POPULARITY_INVALIDATION_THRESHOLD
+)
+event_bus.subscribe(InteractionRecorded, posts_cache.handle_interaction)
+
+feed_store = FeedStore(
+    settings.FEED_STORE_PATH,
+    max_age_seconds=settings.FEED_STORE_MAX_AGE_SECONDS
+) if settings.FEED_STORE_PATH else None
+if feed_store is not None:
+    event_bus.subscribe(InteractionRecorded, feed_store.handle_interaction)
+
+compute_pool = ComputePool(
+    build_offload_min_items=settings.ENGINE_BUILD_OFFLOAD_MIN_ITEMS,
+    scoring_threads=settings.SCORING_THREADS,
+    scoring_inline_threshold_ms=settings.SCORING_INLINE_THRESHOLD_MS
+)
+loop_lag_monitor = LoopLagMonitor(interval_seconds=settings.LOOP_LAG_SAMPLE_INTERVAL_SECONDS)
+
+upstream = UpstreamRegistry(
+    max_retries=settings.UPSTREAM_MAX_RETRIES,
+    retry_backoff_seconds=settings.UPSTREAM_RETRY_BACKOFF_SECONDS,
+    hedge_percentile=settings.UPSTREAM_HEDGE_PERCENTILE,
+    hedge_min_samples=settings.UPSTREAM_HEDGE_MIN_SAMPLES,
+    breaker_failure_threshold=settings.UPSTREAM_BREAKER_FAILURE_THRESHOLD,
+    breaker_reset_seconds=settings.UPSTREAM_BREAKER_RESET_SECONDS
+)
+
+popular_feeds = PopularityFeed(top_n=settings.FEED_POPULARITY_TOP_N)
+
+request_profiler = RequestProfiler(
+    settings.PROFILE_DIR,
+    admin_token=settings.PROFILE_ADMIN_TOKEN,
+    sample_rate=settings.PROFILE_SAMPLE_RATE,
+    interval_seconds=settings.PROFILE_INTERVAL_SECONDS,
+    max_profiles=settings.PROFILE_MAX_FILES
+)
+event_bus.subscribe(EngineBuilt, popular_feeds.handle_engine_built)
+
+async def _load_local_scores(since: Optional[datetime] = None):
+    """Read locally recorded interaction aggregates changed since a time, or None when disabled or unavailable"""
+    if not settings.ENGINE_LOCAL_SIGNALS:
+        return None
+    try:
+        return await async_db_service.load_user_post_scores(since)
+    except Exception as e:
+        logger.error(f"Error loading local interaction scores: {str(e)}")
+        return None
+
+async def _fetch_datasets(datasets: List[str]) -> Dict[str, Any]:
+    """Fetch only the given upstream datasets"""
+    data_fetcher = DataFetcher(upstream=upstream)
+    try:
+        with metrics.stage("upstream_fetch"):
+            return await data_fetcher.get_all_data(datasets=datasets)
+    finally:
+        await data_fetcher.close()
+
+async def _build_engine(
+    data: Dict[str, Any],
+    local_scores: Optional[List[Tuple[str, int, float]]],
+    previous: Optional[RecommendationEngine]
+) -> RecommendationEngine:
+    """Build an engine from refreshed datasets, reusing what did not change"""
+    with metrics.stage("engine_build"):
+        engine = await compute_pool.build_engine(data, local_scores=local_scores, previous=previous)
+    event_bus.publish(EngineBuilt(engine=engine))
+    return engine
+
+engine_snapshot = EngineSnapshot(
+    fetch=_fetch_datasets,
+    build=_build_engine,
+    load_local_scores=_load_local_scores,
+    cadences=settings.DATASET_REFRESH_SECONDS,
+    local_refresh_seconds=settings.ENGINE_LOCAL_REFRESH_SECONDS
+)
+
+async def _load_engine() -> RecommendationEngine:
+    """Current engine, refreshed first if any of its datasets are due"""
+    with metrics.stage("engine_load"):
+        return await engine_snapshot.get()
+
+def _shared_engine_load() -> Awaitable[RecommendationEngine]:
+    """
+    Engine load shielded from the request awaiting it: the build is shared by
+    every request, so one running out of budget must not cancel it.
+    """
+    load = asyncio.ensure_future(_load_engine())
+    load.add_done_callback(lambda task: task.cancelled() or task.exception())
+    return asyncio.shield(load)
+
+def _performance_metrics(start_time: float, timings: Optional[Dict[str, float]] = None) -> Dict[str, float]:
+    """Wall time of this request so far and the time it spent in each stage"""
+    timings = metrics.request_timings() if timings is None else timings
+    return {
+        "processing_time_seconds": time.time() - start_time,
+        **{f"{stage}_seconds": seconds for stage, seconds in timings.items()}
+    }
+
+def _json_response(content: Dict[str, Any]) -> JSONResponse:
+    with metrics.stage("serialization"):
+        return JSONResponse(content=content)
+
+def _rank_feed(
+    engine: RecommendationEngine,
+    username: str,
+    category_id: Optional[int],
+    mood: Optional[str],
+    limit: int
+) -> Tuple[List[Dict[str, Any]], bool]:
+    """CPU-bound part of a feed request: rank posts and check personalization"""
+    recommendations = engine.rank_posts(category_id=category_id, mood=mood, limit=limit)
+    return recommendations, engine.is_personalized(username)
+
+def _cache_feed_response(
+    username: str,
+    category_id: Optional[int],
+    mood: Optional[str],
+    limit: int,
+    recommendations: List[Dict[str, Any]],
+    is_personalized: bool,
+    start_time: float
+) -> Dict[str, Any]:
+    """Build a feed response from ranked posts and cache it unless it is empty"""
+    response = {
+        "recommendations": recommendations,
+        "total_count": len(recommendations),
+        "has_more": len(recommendations) == limit,
+        "is_personalized": is_personalized,
+        "performance_metrics": _performance_metrics(start_time)
+    }
+
+    # An empty feed usually means upstream trouble; caching it would pin it for the TTL
+    if recommendations:
+        posts_cache.set(
+            feed_cache_key(username, category_id, mood, limit),
+            response,
+            tags=feed_tags(username, recommendations)
+        )
+    return response
+
+async def _build_feed_response(
+    engine: RecommendationEngine,
+    username: str,
+    category_id: Optional[int],
+    mood: Optional[str],
+    limit: int,
+    start_time: float
+) -> Dict[str, Any]:
+    """Rank a feed with the given engine and cache the response"""
+    recommendations, is_personalized = await compute_pool.score(
+        engine, _rank_feed, engine, username, category_id, mood, limit
+    )
+    log_recommendation_event(username, recommendations, category_id, mood, source="online")
+    return _cache_feed_response(username, category_id, mood, limit, recommendations, is_personalized, start_time)
+
+def _degraded_feed_response(category_id: Optional[int], limit: int, start_time: float) -> Dict[str, Any]:
+    """Popularity feed for a request out of time; never cached, so the next request retries"""
+    recommendations = popular_feeds.get(category_id, limit)
+    return {
+        "recommendations": recommendations,
+        "total_count": len(recommendations),
+        "has_more": len(recommendations) == limit,
+        "is_personalized": False,
+        "degraded": True,
+        "performance_metrics": _performance_metrics(start_time)
+    }
+
+def _stream_feed(metadata: Dict[str, Any], payloads: Iterable[str], start_time: float) -> StreamingResponse:
+    """
+    Stream a feed as NDJSON: a metadata line, one line per post in rank
+    order, each serialized only when it is sent, then timing.
+    """
+    timings = metrics.request_timings()
+
+    async def stream_posts():
+        yield json.dumps({"metadata": metadata}) + "\n"
+        for payload in payloads:
+            yield payload + "\n"
+        yield json.dumps({"performance_metrics": _performance_metrics(start_time, timings)}) + "\n"
+
+    return StreamingResponse(stream_posts(), media_type="application/x-ndjson")
+
+def _stream_feed_response(response: Dict[str, Any], source: str, start_time: float) -> StreamingResponse:
+    """Stream an already ranked feed response"""
+    metadata = {key: response[key] for key in ("total_count", "has_more", "is_personalized")}
+    if response.get("degraded"):
+        metadata["degraded"] = True
+    return _stream_feed(
+        {**metadata, "source": source},
+        (json.dumps(post) for post in response["recommendations"]),
+        start_time
+    )
+
+async def _warm_feed(engine: RecommendationEngine, shape: FeedShape, refresh: bool) -> bool:
+    """Cache the feed for one access-log shape unless it is already warm and not being refreshed"""
+    if not refresh and feed_cache_key(*shape) in posts_cache:
+        return False
+    await _build_feed_response(engine, *shape, start_time=time.time())
+    return True
+
+feed_warmer = CacheWarmer(
+    log_path=settings.CACHE_WARM_LOG_PATH,
+    load_context=_load_engine,
+    warm_one=_warm_feed,
+    top_n=settings.CACHE_WARM_TOP_N,
+    time_budget_seconds=settings.CACHE_WARM_TIME_BUDGET_SECONDS,
+    cpu_budget_seconds=settings.CACHE_WARM_CPU_BUDGET_SECONDS
+)
+event_bus.subscribe(EngineBuilt, feed_warmer.handle_engine_built)
+
+async def _stream_batch_feeds(
+    engine: RecommendationEngine,
+    users: List[Tuple[str, Optional[int], Optional[str], int]],
+    rejected: List[Tuple[str, str]]
+) -> AsyncIterator[str]:
+    """
+    Rank each distinct (category, mood) shape once and stream one NDJSON line
+    per user as soon as their shape is ranked.
+    """
+    start_time = time.time()
+    shapes: Dict[Tuple[Optional[int], Optional[str]], List[Tuple[str, int]]] = {}
+    for username, category_id, mood, limit in users:
+        shapes.setdefault((category_id, mood), []).append((username, limit))
+
+    tasks = {
+        asyncio.ensure_future(compute_pool.score(
+            engine, engine.rank_posts, category_id, mood, max(limit for _, limit in members)
+        )): (category_id, mood)
+        for (category_id, mood), members in shapes.items()
+    }
+    for username, error in rejected:
+        yield json.dumps({"username": username, "error": error}) + "\n"
+    errors = len(rejected)
+    try:
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                shape = tasks[task]
+                try:
+                    ranked = task.result()
+                except Exception as e:
+                    logger.error(f"Error ranking batch feed shape {shape}: {str(e)}")
+                    ranked, error = None, str(e)
+
+                for username, limit in shapes[shape]:
+                    if ranked is None:
+                        errors += 1
+                        yield json.dumps({"username": username, "error": error}) + "\n"
+                        continue
+                    try:
+                        recommendations = ranked[:limit]
+                        line = json.dumps({
+                            "username": username,
+                            "recommendations": recommendations,
+                            "total_count": len(recommendations),
+                            "has_more": len(recommendations) == limit,
+                            "is_personalized": engine.is_personalized(username)
+                        })
+                    except Exception as e:
+                        logger.error(f"Error building batch feed for {username}: {str(e)}")
+                        errors += 1
+                        line = json.dumps({"username": username, "error": str(e)})
+                    yield line + "\n"
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    yield json.dumps({"summary": {
+        "users": len(users) + len(rejected),
+        "shapes": len(shapes),
+        "errors": errors,
+        "processing_time_seconds": time.time() - start_time
+    }}) + "\n"
 
 class PostResponse(BaseModel):
     id: int
@@ -28,53 +320,233 @@ class RecommendationResponse(BaseModel):
     total_count: int
     has_more: bool = False
     is_personalized: bool = False
+    degraded: bool = False
     performance_metrics: Dict[str, float]
 
 @router.get("/feed", response_model=RecommendationResponse)
 async def get_feed(
+    request: Request,
     username: str = Query(..., description="Username to get recommendations for"),
     category_id: Optional[int] = Query(None, description="Category ID to filter recommendations"),
     mood: Optional[str] = Query(None, description="User's current mood (happy, sad, excited, calm, anxious)"),
     limit: int = Query(10, description="Number of recommendations to return", ge=1, le=50)
 ):
-    """Get personalized video recommendations"""
+    """
+    Get personalized video recommendations. Send `Accept: application/x-ndjson`
+    to stream a metadata line followed by one post per line. Requests that
+    exceed their time budget (X-Deadline-Ms header, or FEED_DEADLINE_SECONDS)
+    get a popularity feed flagged `degraded`.
+    """
     try:
-        cache_key = f"{username}:{category_id}:{mood}:{limit}"
-        if cache_key in posts_cache:
-            return JSONResponse(content=posts_cache[cache_key])
-        
         start_time = time.time()
-        data_fetcher = DataFetcher()
-        
+        metrics.start_request()
+        deadline = Deadline.from_header(request.headers.get("x-deadline-ms"), settings.FEED_DEADLINE_SECONDS)
+        streaming = "application/x-ndjson" in request.headers.get("accept", "")
+        cache_key = feed_cache_key(username, category_id, mood, limit)
+        with metrics.stage("cache_lookup"):
+            cached = posts_cache.get(cache_key)
+        if cached is not None:
+            if streaming:
+                return _stream_feed_response(cached, "cache", start_time)
+            # The cached timings belong to the request that ranked the feed
+            return _json_response({**cached, "performance_metrics": _performance_metrics(start_time)})
+
+        # A precomputed feed is a key lookup in a local SQLite file, cheap enough to do on the loop
+        if feed_store is not None and streaming:
+            with metrics.stage("store_lookup"):
+                stored = feed_store.get_payloads(username, category_id, mood, limit)
+            if stored is not None:
+                # Stored posts are already JSON, so they go out without a decode/encode round trip
+                payloads, is_personalized = stored
+                metadata = {
+                    "total_count": len(payloads),
+                    "has_more": len(payloads) == limit,
+                    "is_personalized": is_personalized,
+                    "source": "store"
+                }
+                return _stream_feed(metadata, payloads, start_time)
+        elif feed_store is not None:
+            with metrics.stage("store_lookup"):
+                stored = feed_store.get(username, category_id, mood, limit)
+            if stored is not None:
+                recommendations, is_personalized = stored
+                response = _cache_feed_response(
+                    username, category_id, mood, limit, recommendations, is_personalized, start_time
+                )
+                return _json_response(response)
+
         try:
-            data = await data_fetcher.get_all_data()
-            engine = RecommendationEngine(data)
-            
-            recommendations = engine.get_recommendations(
-                username=username,
-                category_id=category_id,
-                mood=mood,
-                limit=limit
+            engine = await deadline.run("engine load", _shared_engine_load())
+            response = await deadline.run(
+                "scoring", _build_feed_response(engine, username, category_id, mood, limit, start_time)
             )
-            
-            processing_time = time.time() - start_time
-            
-            response = {
-                "recommendations": recommendations,
-                "total_count": len(recommendations),
-                "has_more": len(recommendations) == limit,
-                "is_personalized": engine.is_personalized(username),
-                "performance_metrics": {
-                    "processing_time_seconds": processing_time
-                }
-            }
-            
-            posts_cache[cache_key] = response
-            return JSONResponse(content=response)
-            
-        finally:
-            await data_fetcher.close()
-            
+        except (DeadlineExceeded, UpstreamUnavailable) as de:
+            if not popular_feeds.ready:
+                # Cold start: no engine was ever built, so there is nothing to degrade to
+                logger.warning("No feed for %s before the first engine build: %s", username, de)
+                raise HTTPException(status_code=503, detail=f"Recommendations unavailable: {de}")
+            logger.warning("Serving degraded feed to %s: %s (%.3fs budget)", username, de, deadline.budget_seconds)
+            response = _degraded_feed_response(category_id, limit, start_time)
+            log_recommendation_event(username, response["recommendations"], category_id, mood, source="degraded")
+            if streaming:
+                return _stream_feed_response(response, "degraded", start_time)
+            return _json_response(response)
+
+        if streaming:
+            return _stream_feed_response(response, "online", start_time)
+        return _json_response(response)
+
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error processing recommendation request: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+class BatchFeedUser(BaseModel):
+    username: str
+    # Unset fields fall back to the batch-level values
+    category_id: Optional[int] = None
+    mood: Optional[str] = None
+    limit: Optional[int] = None
+
+class BatchFeedRequest(BaseModel):
+    users: List[Union[str, BatchFeedUser]]
+    category_id: Optional[int] = None
+    mood: Optional[str] = None
+    limit: int = 10
+
+@router.post("/feed/batch")
+async def get_feed_batch(request: BatchFeedRequest):
+    """Get recommendations for many users at once, streamed as NDJSON in completion order"""
+    if not request.users:
+        raise HTTPException(status_code=400, detail="users must not be empty")
+    if len(request.users) > settings.FEED_BATCH_MAX_USERS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.FEED_BATCH_MAX_USERS} users per batch"
+        )
+
+    users = []
+    rejected = []
+    for user in request.users:
+        if isinstance(user, str):
+            user = BatchFeedUser(username=user)
+        limit = user.limit if user.limit is not None else request.limit
+        if not 1 <= limit <= 50:
+            rejected.append((user.username, "limit must be between 1 and 50"))
+            continue
+        users.append((
+            user.username,
+            user.category_id if user.category_id is not None else request.category_id,
+            user.mood if user.mood is not None else request.mood,
+            limit
+        ))
+
+    try:
+        engine = await _load_engine()
+    except Exception as e:
+        logger.error(f"Error processing batch recommendation request: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return StreamingResponse(_stream_batch_feeds(engine, users, rejected), media_type="application/x-ndjson")
+
+@router.get("/cache/warming")
+async def get_cache_warming():
+    """Get progress and coverage of the feed cache warmer"""
+    return feed_warmer.report.as_dict()
+
+@router.get("/compute/stats")
+async def get_compute_stats():
+    """Get queue depth and wait times of the engine worker pools and event-loop lag"""
+    return {
+        **compute_pool.stats(),
+        "event_loop_lag": loop_lag_monitor.as_dict(),
+        "engine_snapshot": engine_snapshot.stats(),
+        "popularity_fallback": popular_feeds.as_dict(),
+        "profiler": request_profiler.stats(),
+        "logging": logging_stats()
+    }
+
+@router.get("/upstream/stats")
+async def get_upstream_stats():
+    """Get circuit breaker state, latency percentiles and retry/hedge counters per upstream endpoint"""
+    return upstream.stats()
+
+@router.get("/feed/store")
+async def get_feed_store():
+    """Get freshness and hit rate of the precomputed feed store"""
+    if feed_store is None:
+        return {"enabled": False}
+    return {"enabled": True, **feed_store.stats()}
+
+def _collect_metrics() -> Iterator[Sample]:
+    """Cache, pool, queue, upstream and engine gauges for /metrics"""
+    yield Sample("feed_cache_entries", "gauge", "Feed responses currently cached", {}, len(posts_cache))
+    yield Sample("feed_cache_hits_total", "counter", "Feed cache lookups that found a response", {}, posts_cache.hits)
+    yield Sample("feed_cache_misses_total", "counter", "Feed cache lookups that found nothing", {}, posts_cache.misses)
+
+    for pool, stats in (("engine_build", compute_pool.build_stats), ("scoring", compute_pool.scoring_stats)):
+        labels = {"pool": pool}
+        yield Sample("pool_queue_depth", "gauge", "Jobs waiting for a free worker", labels, stats.queue_depth)
+        yield Sample("pool_in_flight", "gauge", "Jobs submitted and not yet finished", labels, stats.in_flight)
+        yield Sample("pool_jobs_completed_total", "counter", "Jobs finished, failed or cancelled", labels, stats.completed)
+        yield Sample("pool_max_wait_seconds", "gauge", "Longest wait for a free worker so far", labels, stats.max_wait_seconds)
+    yield Sample("scoring_inline_total", "counter", "Scoring calls cheap enough to run on the event loop", {},
+                 compute_pool.scoring_stats.inline)
+    yield Sample("event_loop_lag_seconds", "gauge", "Latest sampled event-loop wake-up lag", {},
+                 loop_lag_monitor.last_lag_seconds)
+    yield Sample("event_loop_max_lag_seconds", "gauge", "Largest sampled event-loop wake-up lag", {},
+                 loop_lag_monitor.max_lag_seconds)
+
+    yield Sample("ingestor_queue_depth", "gauge", "Interactions waiting for the write-behind writer", {},
+                 interaction_ingestor.queue_depth)
+    yield Sample("ingestor_written_total", "counter", "Interactions committed by the writer", {}, interaction_ingestor.written)
+    yield Sample("ingestor_failed_total", "counter", "Interactions whose batch failed to commit", {}, interaction_ingestor.failed)
+
+    for url, endpoint in upstream.stats().items():
+        labels = {"endpoint": urlsplit(url).path}
+        for state in BREAKER_STATES:
+            yield Sample("upstream_breaker_state", "gauge", "1 for the current circuit breaker state of each endpoint",
+                         {**labels, "state": state}, float(endpoint["breaker_state"] == state))
+        for key in ("requests", "failures", "retries", "hedges", "not_modified", "bytes_received", "bytes_saved"):
+            yield Sample(f"upstream_{key}_total", "counter", f"Upstream {key.replace('_', ' ')} per endpoint",
+                         labels, endpoint[key])
+
+    snapshot = engine_snapshot.stats()
+    for key in ("rebuilds", "rebuilds_skipped", "failed_refreshes"):
+        yield Sample(f"engine_{key}_total", "counter", f"Engine snapshot {key.replace('_', ' ')}", {}, snapshot[key])
+    for name, dataset in snapshot["datasets"].items():
+        if dataset["age_seconds"] is not None:
+            yield Sample("engine_dataset_age_seconds", "gauge", "Time since each engine dataset was fetched",
+                         {"dataset": name}, dataset["age_seconds"])
+
+    if feed_store is not None:
+        yield Sample("feed_store_hits_total", "counter", "Feeds served from the precomputed store", {}, feed_store.hits)
+        yield Sample("feed_store_misses_total", "counter", "Precomputed store lookups that missed", {}, feed_store.misses)
+    yield Sample("cache_warming_coverage", "gauge", "Share of logged requests whose feed shape is warm", {},
+                 feed_warmer.report.coverage)
+
+    log_pipeline = logging_stats()
+    if log_pipeline["enabled"]:
+        yield Sample("log_queue_depth", "gauge", "Log records waiting for the listener thread", {},
+                     log_pipeline["queue_depth"])
+        for key in ("dropped", "sampled_out", "rate_limited"):
+            yield Sample(f"log_records_{key}_total", "counter", f"Log records {key.replace('_', ' ')}", {},
+                         log_pipeline[key])
+
+metrics.register(_collect_metrics)
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Get per-stage latency histograms and cache, pool, queue and upstream gauges in Prometheus text format"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@router.get("/profiles/{profile_id}")
+async def get_profile(profile_id: str, x_admin_token: Optional[str] = Header(None)):
+    """Get the top-functions summary of a stored request profile (admin only)"""
+    if not request_profiler.is_admin(x_admin_token):
+        raise HTTPException(status_code=403, detail="Admin token required")
+    summary = request_profiler.load(profile_id)
+    if summary is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return summary
@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import Dict
+from typing import Dict, Optional
 
 class Settings(BaseSettings):
     # Base URL and Authentication
@@ -27,9 +27,122 @@ class Settings(BaseSettings):
     # API Parameters
     DEFAULT_PAGE_SIZE: int = 1000
     
+    # Upstream resilience: per-attempt timeout, retries with jittered backoff,
+    # hedged duplicates past the latency percentile, and a circuit breaker
+    UPSTREAM_TIMEOUT_SECONDS: float = 10.0
+    UPSTREAM_MAX_RETRIES: int = 2
+    UPSTREAM_RETRY_BACKOFF_SECONDS: float = 0.2
+    UPSTREAM_HEDGE_PERCENTILE: float = 95.0
+    UPSTREAM_HEDGE_MIN_SAMPLES: int = 20
+    UPSTREAM_BREAKER_FAILURE_THRESHOLD: int = 5
+    UPSTREAM_BREAKER_RESET_SECONDS: float = 30.0
+
+    # Refresh cadence per upstream dataset the engine reads; each is refetched
+    # only when due and the engine rebuilds just the structures derived from it
+    DATASET_REFRESH_SECONDS: Dict[str, float] = {
+        'posts': 3600.0,
+        'viewed': 60.0,
+        'liked': 60.0,
+        'inspired': 60.0,
+        'rated': 60.0
+    }
+    ENGINE_LOCAL_REFRESH_SECONDS: float = 60.0
+
     # Cache settings
     CACHE_TTL: int = 3600  # 1 hour
     CACHE_MAXSIZE: int = 1000
+    # Interactions on a post before feeds containing it are invalidated for everyone
+    CACHE_POPULARITY_INVALIDATION_THRESHOLD: int = 50
+
+    # Count users with locally recorded interaction aggregates as personalized
+    ENGINE_LOCAL_SIGNALS: bool = True
+
+    # Cache warming (disabled unless an access log is configured)
+    CACHE_WARM_LOG_PATH: Optional[str] = None
+    CACHE_WARM_TOP_N: int = 200
+    CACHE_WARM_TIME_BUDGET_SECONDS: float = 30.0
+    CACHE_WARM_CPU_BUDGET_SECONDS: float = 10.0
+
+    # Per-request /feed time budget (overridable with the X-Deadline-Ms header);
+    # requests that run out get a degraded popularity feed instead of waiting
+    FEED_DEADLINE_SECONDS: float = 2.0
+    FEED_POPULARITY_TOP_N: int = 50
+
+    # Batch feed requests (POST /feed/batch)
+    FEED_BATCH_MAX_USERS: int = 1000
+
+    # Offline precomputed feeds (disabled unless a store path is configured)
+    FEED_STORE_PATH: Optional[str] = None
+    FEED_STORE_MAX_AGE_SECONDS: float = 3600.0
+    FEED_PRECOMPUTE_TOP_N: int = 50
+    FEED_PRECOMPUTE_USERS: int = 10000
+    FEED_PRECOMPUTE_HEAVY_USERS: int = 500  # also precomputed per category and logged shape
+
+    # Request profiling for /feed and /interactions. On demand it needs PROFILE_ADMIN_TOKEN in
+    # X-Admin-Token plus ?profile=1 (or an X-Profile header); PROFILE_SAMPLE_RATE (capped at 5%)
+    # profiles a random share of requests. With neither set the middleware is not installed.
+    PROFILE_ADMIN_TOKEN: Optional[str] = None
+    PROFILE_SAMPLE_RATE: float = 0.0
+    PROFILE_INTERVAL_SECONDS: float = 0.005
+    PROFILE_DIR: str = "./data/profiles"
+    PROFILE_MAX_FILES: int = 50
+
+    # Logging goes through a bounded queue to a listener thread. Records below WARNING from
+    # the loggers in LOG_SAMPLE_RATES are sampled, and every source line is rate limited
+    LOG_LEVEL: str = "INFO"
+    LOG_JSON: bool = True
+    LOG_FILE: Optional[str] = None
+    LOG_QUEUE_SIZE: int = 10000
+    LOG_SAMPLE_RATES: Dict[str, float] = {
+        'app.services.recommendation_engine': 0.1
+    }
+    LOG_RATE_LIMIT_PER_SECOND: float = 20.0
+
+    # SQLite storage profile
+    SQLITE_JOURNAL_MODE: str = "WAL"
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+    SQLITE_CACHE_SIZE_KB: int = 65536
+    SQLITE_MMAP_SIZE_BYTES: int = 268435456
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+
+    # Async database connection pool
+    DB_POOL_SIZE: int = 5
+    DB_POOL_MAX_OVERFLOW: int = 5
+    DB_POOL_TIMEOUT_SECONDS: float = 10.0
+
+    # Identity cache (username -> user_id)
+    USER_ID_CACHE_SIZE: int = 100000
+    # Preference credits for posts not yet in an engine snapshot wait this long for their category
+    PREFERENCE_PENDING_MAX_AGE_DAYS: int = 7
+
+    # Interaction history pagination
+    HISTORY_PAGE_SIZE: int = 100
+    HISTORY_MAX_PAGE_SIZE: int = 1000
+    HISTORY_STREAM_CHUNK_SIZE: int = 200
+
+    # Interaction ingestion (write-behind batching)
+    INGEST_BATCH_SIZE: int = 500
+    INGEST_MAX_DELAY_SECONDS: float = 0.05
+    INGEST_MAX_QUEUE_SIZE: int = 10000
+    INGEST_ENQUEUE_TIMEOUT_SECONDS: float = 1.0
+    INGEST_DURABILITY: str = "commit"  # "commit" or "enqueue"
+    INGEST_BULK_QUEUE_SHARE: float = 0.5  # most of the queue that bulk requests may hold together
+    INTERACTION_BULK_MAX_ITEMS: int = 50000  # per POST /interactions/bulk request
+    INTERACTION_BULK_MAX_BYTES: int = 10 * 1024 * 1024  # request body size cap for the same endpoint
+
+    # Interaction retention (compaction of raw rows)
+    INTERACTION_RAW_RETENTION_DAYS: int = 90
+    INTERACTION_RETENTION_POLICY: str = "archive"  # "archive" or "drop"; old views are rolled up either way
+    INTERACTION_ARCHIVE_RETENTION_MONTHS: int = 24  # months of archive partitions and view rollups kept
+
+    # CPU-bound engine work off the event loop
+    ENGINE_BUILD_OFFLOAD_MIN_ITEMS: int = 5000  # posts + interactions; smaller builds run inline
+    SCORING_THREADS: int = 4
+    SCORING_INLINE_THRESHOLD_MS: float = 2.0
+    LOOP_LAG_SAMPLE_INTERVAL_SECONDS: float = 0.1
+
+    # Bulk interaction backfill
+    BACKFILL_CHUNK_SIZE: int = 50000
 
     class Config:
         env_file = ".env"
@@ -0,0 +1,34 @@
+from typing import Optional
+
+# Profile weight per upstream interaction type
+INTERACTION_WEIGHTS = {
+    'viewed': 1.0,
+    'liked': 3.0,
+    'inspired': 4.0,
+    'rated': 2.0
+}
+
+# Locally recorded interaction types and their upstream equivalents
+LOCAL_INTERACTION_TYPES = {
+    'view': 'viewed',
+    'like': 'liked',
+    'inspire': 'inspired',
+    'rate': 'rated'
+}
+
+# Local ratings are 0-5, upstream ratings 0-100
+LOCAL_RATING_SCALE = 20.0
+
+def interaction_weight(interaction_type: str, rating: Optional[float] = None) -> float:
+    """Profile weight of one upstream interaction"""
+    weight = INTERACTION_WEIGHTS.get(interaction_type, 1.0)
+    if interaction_type == 'rated':
+        weight *= (1 + float(rating or 0) / 100.0)
+    return weight
+
+def local_interaction_weight(interaction_type: str, rating: Optional[float] = None) -> float:
+    """Profile weight of one locally recorded interaction, on the upstream scale"""
+    return interaction_weight(
+        LOCAL_INTERACTION_TYPES.get(interaction_type, interaction_type),
+        rating * LOCAL_RATING_SCALE if rating is not None else None
+    )
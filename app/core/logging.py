@@ -1,22 +1,189 @@
+import atexit
+import json
 import logging
+import queue
+import random
 import sys
-from typing import Any
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, List, Optional, Tuple
 
 # Configure logging format
 LOGGING_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
 DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
 
-def setup_logging() -> None:
-    """Configure logging settings for the application"""
-    logging.basicConfig(
-        level=logging.INFO,
-        format=LOGGING_FORMAT,
-        datefmt=DATE_FORMAT,
-        handlers=[
-            logging.StreamHandler(sys.stdout),
-            logging.FileHandler("app.log")
-        ]
-    )
+# Attributes every LogRecord has; anything else on a record came from `extra`
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: time, level, logger, message, `extra` fields and any exception"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+class HotPathFilter(logging.Filter):
+    """
+    Per-logger sampling and a per-call-site rate limit, applied before a
+    record is queued so dropped records cost almost nothing.
+
+    `sample_rates` maps logger names (a prefix covers its children) to the
+    share of DEBUG/INFO records kept; warnings and errors are never sampled.
+    Every record is rate limited to `rate_limit_per_second` per source line;
+    the next record let through from that line carries how many were
+    suppressed in between.
+    """
+
+    def __init__(self, sample_rates: Optional[Dict[str, float]] = None, rate_limit_per_second: float = 0.0):
+        super().__init__()
+        self.sample_rates = dict(sample_rates or {})
+        self.rate_limit_per_second = rate_limit_per_second
+        self.sampled_out = 0
+        self.rate_limited = 0
+        self._rates: Dict[str, float] = {}
+        # (logger, path, line) -> [tokens, last refill, suppressed since last pass]
+        self._buckets: Dict[Tuple[str, str, int], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def _sample_rate(self, name: str) -> float:
+        rate = self._rates.get(name)
+        if rate is None:
+            rate = 1.0
+            # The longest configured prefix wins, as logger levels inherit from the nearest parent
+            for prefix in sorted(self.sample_rates, key=len, reverse=True):
+                if name == prefix or name.startswith(prefix + "."):
+                    rate = self.sample_rates[prefix]
+                    break
+            self._rates[name] = rate
+        return rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno < logging.WARNING:
+            rate = self._sample_rate(record.name)
+            if rate < 1.0 and random.random() >= rate:
+                self.sampled_out += 1
+                return False
+            if rate < 1.0:
+                record.sample_rate = rate
+
+        if self.rate_limit_per_second <= 0:
+            return True
+        now = time.monotonic()
+        key = (record.name, record.pathname, record.lineno)
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [self.rate_limit_per_second, now, 0]
+            # Refill, allowing a burst of one second's worth
+            bucket[0] = min(self.rate_limit_per_second, bucket[0] + (now - bucket[1]) * self.rate_limit_per_second)
+            bucket[1] = now
+            if bucket[0] < 1.0:
+                bucket[2] += 1
+                self.rate_limited += 1
+                return False
+            bucket[0] -= 1.0
+            suppressed, bucket[2] = int(bucket[2]), 0
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+class AsyncQueueHandler(QueueHandler):
+    """
+    Queues records for a QueueListener thread without formatting them, so
+    neither message formatting nor file I/O runs on the caller's thread.
+    Log arguments must therefore not be mutated after the call. When the
+    queue is full, records are dropped and counted instead of blocking.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+# The installed handler and listener thread, if setup_logging has run
+_pipeline: Optional[Tuple[AsyncQueueHandler, HotPathFilter, QueueListener]] = None
+
+def setup_logging(
+    level: str = "INFO",
+    json_format: bool = True,
+    log_file: Optional[str] = None,
+    queue_size: int = 10000,
+    sample_rates: Optional[Dict[str, float]] = None,
+    rate_limit_per_second: float = 0.0
+) -> QueueListener:
+    """
+    Route every logger through a bounded queue to a listener thread writing
+    to stdout and, if given, `log_file`. Replaces a previous pipeline.
+    """
+    global _pipeline
+    shutdown_logging()
+
+    formatter = JsonFormatter() if json_format else logging.Formatter(LOGGING_FORMAT, DATE_FORMAT)
+    handlers: List[logging.Handler] = [logging.StreamHandler(sys.stdout)]
+    if log_file:
+        handlers.append(logging.FileHandler(log_file))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+    queue_handler = AsyncQueueHandler(log_queue)
+    hot_path_filter = HotPathFilter(sample_rates, rate_limit_per_second)
+    queue_handler.addFilter(hot_path_filter)
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(queue_handler)
+    listener.start()
+    _pipeline = (queue_handler, hot_path_filter, listener)
+    return listener
+
+def shutdown_logging() -> None:
+    """Flush queued records and remove the pipeline installed by setup_logging"""
+    global _pipeline
+    if _pipeline is None:
+        return
+    queue_handler, _, listener = _pipeline
+    _pipeline = None
+    logging.getLogger().removeHandler(queue_handler)
+    listener.stop()
+    for handler in listener.handlers:
+        handler.close()
+
+# Runs before logging's own shutdown hook, which was registered first
+atexit.register(shutdown_logging)
+
+def logging_stats() -> Dict[str, Any]:
+    """Queue depth and records dropped, sampled out or rate limited by the pipeline"""
+    if _pipeline is None:
+        return {"enabled": False}
+    queue_handler, hot_path_filter, _ = _pipeline
+    return {
+        "enabled": True,
+        "queue_depth": queue_handler.queue.qsize(),
+        "dropped": queue_handler.dropped,
+        "sampled_out": hot_path_filter.sampled_out,
+        "rate_limited": hot_path_filter.rate_limited
+    }
 
 def get_logger(name: str) -> Any:
     """Get a logger instance with the specified name"""
@@ -24,19 +191,32 @@ def get_logger(name: str) -> Any:
     logger.setLevel(logging.INFO)
     return logger
 
+_recommendation_events = get_logger("recommendation_events")
+_interaction_events = get_logger("interaction_events")
+
 # Custom logging function for recommendation events
 def log_recommendation_event(
     username: str,
     recommendations: list,
     category_id: int = None,
-    mood: str = None
+    mood: str = None,
+    source: str = None
 ) -> None:
     """Log recommendation events with relevant details"""
-    logger = get_logger("recommendation_events")
-    logger.info(
-        f"Recommendations generated for user: {username} | "
-        f"Category: {category_id} | Mood: {mood} | "
-        f"Count: {len(recommendations)}"
+    if not _recommendation_events.isEnabledFor(logging.INFO):
+        return
+    count = len(recommendations)
+    _recommendation_events.info(
+        "Recommendations generated for user: %s | Category: %s | Mood: %s | Count: %d",
+        username, category_id, mood, count,
+        extra={
+            "event": "recommendation",
+            "username": username,
+            "category_id": category_id,
+            "mood": mood,
+            "count": count,
+            "source": source
+        }
     )
 
 # Custom logging function for user interactions
@@ -47,9 +227,16 @@ def log_interaction_event(
     rating: float = None
 ) -> None:
     """Log user interaction events"""
-    logger = get_logger("interaction_events")
-    logger.info(
-        f"User interaction recorded | User: {username} | "
-        f"Post: {post_id} | Type: {interaction_type} | "
-        f"Rating: {rating}"
-    )
\ No newline at end of file
+    if not _interaction_events.isEnabledFor(logging.INFO):
+        return
+    _interaction_events.info(
+        "User interaction recorded | User: %s | Post: %s | Type: %s | Rating: %s",
+        username, post_id, interaction_type, rating,
+        extra={
+            "event": "interaction",
+            "username": username,
+            "post_id": post_id,
+            "interaction_type": interaction_type,
+            "rating": rating
+        }
+    )
@@ -0,0 +1,175 @@
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from datetime import datetime
+from typing import Any, AsyncIterator, List, Dict, Optional, Tuple
+import logging
+from pathlib import Path
+from ..core.config import settings
+from ..database.database import (
+    archive_tables, empty_history, group_history, history_item, history_query, next_history_cursor, user_post_scores_query
+)
+from ..database.identity import IdentityCache
+from ..database.migrations import migrate
+from ..database.models import User, UserPreference
+from ..database.storage import apply_sqlite_profile
+from ..services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+class AsyncDatabaseService:
+    """
+    asyncio read side of DatabaseService on an aiosqlite engine.
+
+    Queries run on aiosqlite's worker threads, so awaiting them never stalls
+    the event loop. Concurrency is capped by a bounded connection pool.
+    Interactions are only written through DatabaseService, by the ingestor.
+    """
+
+    def __init__(self, database_url: Optional[str] = None, identity: Optional[IdentityCache] = None):
+        if database_url is None:
+            data_dir = Path("data")
+            data_dir.mkdir(exist_ok=True)
+            database_url = f"sqlite+aiosqlite:///{data_dir / 'recommendation_system.db'}"
+
+        self.database_url = database_url
+        logger.info(f"Initializing async database at {self.database_url}")
+
+        self.engine = create_async_engine(
+            self.database_url,
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_POOL_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS
+        )
+        apply_sqlite_profile(self.engine.sync_engine)
+        self.SessionLocal = async_sessionmaker(self.engine, expire_on_commit=False)
+        self.identity = identity or IdentityCache(maxsize=settings.USER_ID_CACHE_SIZE)
+        self._schema_ready = False
+
+    async def _ensure_schema(self):
+        if not self._schema_ready:
+            async with self.engine.begin() as conn:
+                await conn.run_sync(migrate)
+            self._schema_ready = True
+
+    async def _get_user_id(self, session, username: str) -> Optional[int]:
+        """Look up an existing user's id, consulting the identity cache first"""
+        user_id = self.identity.get_user_id(username)
+        if user_id is None:
+            result = await session.execute(select(User.id).where(User.username == username))
+            user_id = result.scalar_one_or_none()
+            if user_id is not None:
+                self.identity.remember_users({username: user_id})
+        return user_id
+
+    @metrics.timed("db_load_user_post_scores")
+    async def load_user_post_scores(
+        self,
+        since: Optional[datetime] = None,
+        chunk_size: int = 10000
+    ) -> List[Tuple[str, int, float]]:
+        """Read (username, post_id, score) aggregate rows for an engine build, or only those changed since a time"""
+        await self._ensure_schema()
+        scores = []
+        async with self.SessionLocal() as session:
+            query = user_post_scores_query(since).execution_options(yield_per=chunk_size)
+            result = await session.stream(query)
+            async for partition in result.partitions():
+                scores.extend(tuple(row) for row in partition)
+        return scores
+
+    async def get_user_history(
+        self,
+        username: str,
+        limit: Optional[int] = None,
+        before: Optional[str] = None,
+        interaction_types: Optional[List[str]] = None
+    ) -> Dict[str, List[Dict]]:
+        """Get user's interaction history"""
+        page = await self.get_user_history_page(username, limit, before, interaction_types)
+        return page['history']
+
+    @metrics.timed("db_get_user_history")
+    async def get_user_history_page(
+        self,
+        username: str,
+        limit: Optional[int] = None,
+        before: Optional[str] = None,
+        interaction_types: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """Get one keyset page of history plus the cursor for the next page"""
+        await self._ensure_schema()
+        async with self.SessionLocal() as session:
+            try:
+                user_id = await self._get_user_id(session, username)
+                if user_id is None:
+                    return {'history': empty_history(), 'next_cursor': None}
+
+                result = await session.execute(history_query(
+                    user_id, limit, before, interaction_types,
+                    archive_tables=await session.run_sync(archive_tables), include_rollups=True
+                ))
+                interactions = result.all()
+                return {
+                    'history': group_history(interactions),
+                    'next_cursor': next_history_cursor(
+                        interactions[-1] if interactions else None, len(interactions), limit
+                    )
+                }
+
+            except Exception as e:
+                logger.error(f"Error fetching user history: {str(e)}")
+                raise
+
+    async def stream_user_history(
+        self,
+        username: str,
+        limit: int,
+        before: Optional[str] = None,
+        interaction_types: Optional[List[str]] = None,
+        chunk_size: int = 200
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yield one page of history rows as they are read, in chunks of
+        `chunk_size`, followed by a final {'next_cursor': ...} record.
+        """
+        await self._ensure_schema()
+        async with self.SessionLocal() as session:
+            user_id = await self._get_user_id(session, username)
+            last, count = None, 0
+            if user_id is not None:
+                result = await session.stream(
+                    history_query(
+                        user_id, limit, before, interaction_types,
+                        archive_tables=await session.run_sync(archive_tables), include_rollups=True
+                    ).execution_options(yield_per=chunk_size)
+                )
+                async for partition in result.partitions():
+                    for interaction in partition:
+                        yield history_item(interaction)
+                    last, count = partition[-1], count + len(partition)
+
+            yield {'next_cursor': next_history_cursor(last, count, limit)}
+
+    @metrics.timed("db_get_user_preferences")
+    async def get_user_preferences(self, username: str) -> Dict[int, float]:
+        """Get user's category preferences"""
+        await self._ensure_schema()
+        async with self.SessionLocal() as session:
+            try:
+                user_id = await self._get_user_id(session, username)
+                if user_id is None:
+                    return {}
+
+                result = await session.execute(
+                    select(UserPreference.category_id, UserPreference.preference_score)
+                    .where(UserPreference.user_id == user_id)
+                )
+                return {category_id: score for category_id, score in result.all()}
+
+            except Exception as e:
+                logger.error(f"Error fetching user preferences: {str(e)}")
+                raise
+
+    async def close(self):
+        """Release pooled connections"""
+        await self.engine.dispose()
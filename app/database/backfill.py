@@ -0,0 +1,268 @@
+from sqlalchemy import select, text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+import json
+import logging
+import time
+from ..core.config import settings
+from ..database.database import (
+    preference_credits, resolve_user_ids, validate_interaction, write_preference_credits
+)
+from ..database.identity import IdentityCache
+from ..database.migrations import create_missing_indexes, user_post_aggregates_select
+from ..database.models import BackfillCheckpoint, UserInteraction
+from ..core.interactions import LOCAL_INTERACTION_TYPES, LOCAL_RATING_SCALE
+
+logger = logging.getLogger(__name__)
+
+# Secondary indexes on user_interactions that are dropped during a load and rebuilt once at the end
+DEFERRED_INDEXES = [index.name for index in UserInteraction.__table__.indexes]
+
+INSERT_INTERACTIONS_SQL = (
+    "INSERT INTO user_interactions (user_id, post_id, interaction_type, rating, created_at) "
+    "VALUES (?, ?, ?, ?, ?)"
+)
+
+# Fold the rows just inserted into the running aggregates, as upsert_aggregates_statement does per batch
+# ("WHERE true" keeps SQLite from parsing ON CONFLICT as a join constraint)
+UPSERT_CHUNK_AGGREGATES_SQL = f"""
+    INSERT INTO user_post_aggregates
+        (user_id, post_id, score, view_count, like_count, inspire_count, rate_count, last_seen, updated_at)
+    SELECT folded.*, :now FROM ({user_post_aggregates_select("id > :first_id")}) AS folded WHERE true
+    ON CONFLICT (user_id, post_id) DO UPDATE SET
+        score = user_post_aggregates.score + excluded.score,
+        view_count = user_post_aggregates.view_count + excluded.view_count,
+        like_count = user_post_aggregates.like_count + excluded.like_count,
+        inspire_count = user_post_aggregates.inspire_count + excluded.inspire_count,
+        rate_count = user_post_aggregates.rate_count + excluded.rate_count,
+        last_seen = max(user_post_aggregates.last_seen, excluded.last_seen),
+        updated_at = excluded.updated_at
+"""
+
+UPSTREAM_INTERACTION_TYPES = {upstream: local for local, upstream in LOCAL_INTERACTION_TYPES.items()}
+
+# A source yields (records, position) batches; position resumes the source just after the batch
+BatchSource = Callable[[Optional[str]], Iterable[Tuple[List[Dict[str, Any]], str]]]
+
+@dataclass
+class BackfillReport:
+    """Outcome of loading one source"""
+    source: str
+    rows: int = 0
+    skipped: int = 0
+    chunks: int = 0
+    seconds: float = 0.0
+    resumed_from: Optional[str] = None
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {**asdict(self), 'rows_per_second': round(self.rows_per_second, 1)}
+
+def parse_timestamp(value: Any) -> Optional[datetime]:
+    """Accept epoch milliseconds (as upstream sends them), epoch seconds or ISO 8601 strings"""
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return datetime.utcfromtimestamp(value / 1000 if value > 1e11 else value)
+    return datetime.fromisoformat(str(value).replace("Z", "+00:00")).replace(tzinfo=None)
+
+def normalize_interaction(record: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Turn an upstream or dumped interaction record into the shape record_interactions
+    expects. Upstream type names ("viewed", "rated", ...) are mapped to local ones
+    and upstream ratings (0-100) are rescaled to the local 0-5 range.
+    """
+    interaction_type = record.get('interaction_type')
+    rating = record.get('rating')
+    if interaction_type in UPSTREAM_INTERACTION_TYPES:
+        interaction_type = UPSTREAM_INTERACTION_TYPES[interaction_type]
+        if rating is not None:
+            rating = float(rating) / LOCAL_RATING_SCALE
+
+    username = record.get('username')
+    post_id = record.get('post_id')
+    if not username or post_id is None:
+        raise ValueError("Interaction needs a username and a post_id")
+    validate_interaction(interaction_type, rating)
+
+    return {
+        'username': str(username),
+        'post_id': int(post_id),
+        'interaction_type': interaction_type,
+        'rating': rating if interaction_type == "rate" else None,
+        'created_at': parse_timestamp(record.get('created_at'))
+    }
+
+def jsonl_batches(path: str, batch_lines: int = 1000) -> BatchSource:
+    """Read a JSON-lines dump, resuming from a byte offset"""
+    def batches(position: Optional[str]) -> Iterator[Tuple[List[Dict[str, Any]], str]]:
+        offset = int(position or 0)
+        with open(path, "rb") as dump:
+            dump.seek(offset)
+            records = []
+            for line in dump:
+                offset += len(line)
+                line = line.strip()
+                if line:
+                    records.append(json.loads(line))
+                if len(records) >= batch_lines:
+                    yield records, str(offset)
+                    records = []
+            if records:
+                yield records, str(offset)
+    return batches
+
+def upstream_batches(client, interaction_type: str, page_size: Optional[int] = None) -> BatchSource:
+    """Page through one upstream interaction endpoint with a synchronous httpx client, resuming from a page"""
+    url = f"{settings.BASE_URL}{settings.ENDPOINTS[interaction_type]}"
+    page_size = page_size or settings.DEFAULT_PAGE_SIZE
+
+    def batches(position: Optional[str]) -> Iterator[Tuple[List[Dict[str, Any]], str]]:
+        page = int(position or 1)
+        while True:
+            response = client.get(url, params={
+                "page": page,
+                "page_size": page_size,
+                "resonance_algorithm": settings.RESONANCE_ALGORITHM
+            })
+            response.raise_for_status()
+            data = response.json()
+            records = data.get('posts', data.get('data', [])) if isinstance(data, dict) else data
+            records = [dict(r, interaction_type=interaction_type) for r in records or [] if isinstance(r, dict)]
+            if not records:
+                return
+            page += 1
+            yield records, str(page)
+            if len(records) < page_size:
+                return
+    return batches
+
+class InteractionBackfill:
+    """
+    Bulk loader for historical interactions.
+
+    Records are streamed from a source, users are resolved in bulk and each
+    chunk is written in one transaction together with its aggregates,
+    preference credits and the source's checkpoint, so a rerun resumes
+    exactly where the last committed chunk ended.
+    """
+
+    def __init__(
+        self,
+        engine,
+        chunk_size: int = settings.BACKFILL_CHUNK_SIZE,
+        identity: Optional[IdentityCache] = None
+    ):
+        self.engine = engine
+        self.chunk_size = chunk_size
+        self.identity = identity or IdentityCache(maxsize=settings.USER_ID_CACHE_SIZE)
+
+    def checkpoint(self, source: str) -> Optional[str]:
+        with self.engine.connect() as connection:
+            return connection.execute(
+                select(BackfillCheckpoint.position).where(BackfillCheckpoint.source == source)
+            ).scalar()
+
+    @contextmanager
+    def deferred_indexes(self):
+        """Drop the secondary interaction indexes for the duration of a load, then rebuild them"""
+        with self.engine.begin() as connection:
+            for name in DEFERRED_INDEXES:
+                connection.execute(text(f"DROP INDEX IF EXISTS {name}"))
+        try:
+            yield
+        finally:
+            started = time.perf_counter()
+            with self.engine.begin() as connection:
+                create_missing_indexes(connection)
+                connection.execute(text("ANALYZE user_interactions"))
+            logger.info(f"Rebuilt interaction indexes in {time.perf_counter() - started:.1f}s")
+
+    def load(self, source: str, batches: BatchSource) -> BackfillReport:
+        """Load every remaining batch of a source, committing every `chunk_size` rows"""
+        position = self.checkpoint(source)
+        report = BackfillReport(source=source, resumed_from=position)
+        if position is not None:
+            logger.info(f"Resuming backfill of {source} from {position}")
+
+        started = time.perf_counter()
+        chunk: List[Dict[str, Any]] = []
+        for records, position in batches(position):
+            for record in records:
+                try:
+                    chunk.append(normalize_interaction(record))
+                except (ValueError, TypeError) as e:
+                    report.skipped += 1
+                    logger.debug(f"Skipping interaction from {source}: {str(e)}")
+            if len(chunk) >= self.chunk_size:
+                self._write_chunk(source, chunk, position, report)
+                self._log_progress(report, started)
+                chunk = []
+
+        if chunk or position is not None:
+            self._write_chunk(source, chunk, position, report)
+
+        report.seconds = time.perf_counter() - started
+        logger.info(
+            f"Backfilled {source} | Rows: {report.rows} | Skipped: {report.skipped} | "
+            f"Time: {report.seconds:.1f}s | Rows/s: {report.rows_per_second:.0f}"
+        )
+        return report
+
+    def _write_chunk(self, source: str, chunk: List[Dict[str, Any]], position: Optional[str], report: BackfillReport):
+        now = datetime.utcnow()
+        with self.engine.begin() as connection:
+            # Writing the checkpoint first takes SQLite's write lock, so every
+            # interaction id above first_id below belongs to this chunk
+            if position is not None:
+                stmt = sqlite_insert(BackfillCheckpoint).values(
+                    source=source, position=position, rows_loaded=len(chunk), updated_at=now
+                )
+                connection.execute(stmt.on_conflict_do_update(
+                    index_elements=[BackfillCheckpoint.source],
+                    set_={
+                        'position': stmt.excluded.position,
+                        'rows_loaded': BackfillCheckpoint.rows_loaded + stmt.excluded.rows_loaded,
+                        'updated_at': stmt.excluded.updated_at
+                    }
+                ))
+            if not chunk:
+                return
+
+            user_ids = resolve_user_ids(connection, {i['username'] for i in chunk}, self.identity)
+            first_id = connection.execute(text("SELECT COALESCE(MAX(id), 0) FROM user_interactions")).scalar()
+
+            # Plain DB-API executemany: skips per-row parameter processing, the dominant cost at this volume
+            connection.exec_driver_sql(INSERT_INTERACTIONS_SQL, [
+                (
+                    user_ids[interaction['username']],
+                    interaction['post_id'],
+                    interaction['interaction_type'],
+                    interaction['rating'],
+                    (interaction['created_at'] or now).isoformat(sep=" ", timespec="microseconds")
+                )
+                for interaction in chunk
+            ])
+            connection.execute(text(UPSERT_CHUNK_AGGREGATES_SQL), {
+                'first_id': first_id,
+                'now': now.isoformat(sep=" ", timespec="microseconds")
+            })
+
+            credits, pending = preference_credits(chunk, user_ids, self.identity)
+            write_preference_credits(connection, credits, pending, now)
+
+        self.identity.remember_users(user_ids)
+        report.rows += len(chunk)
+        report.chunks += 1
+
+    def _log_progress(self, report: BackfillReport, started: float):
+        elapsed = time.perf_counter() - started
+        logger.info(
+            f"{report.source} | Rows: {report.rows} | Rows/s: {report.rows / elapsed if elapsed else 0:.0f}"
+        )
@@ -0,0 +1,113 @@
+from sqlalchemy import text
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+import logging
+from ..database.models import ARCHIVE_TABLE_PREFIX, interaction_archive_table
+
+logger = logging.getLogger(__name__)
+
+RETENTION_POLICIES = ("archive", "drop")
+
+def retention_cutoff(retention_days: int, now: Optional[datetime] = None) -> datetime:
+    """Midnight of the oldest day whose raw interactions stay in the hot table"""
+    now = now or datetime.utcnow()
+    return (now - timedelta(days=retention_days)).replace(hour=0, minute=0, second=0, microsecond=0)
+
+def archive_cutoff(retention_months: int, now: Optional[datetime] = None) -> datetime:
+    """First day of the oldest month whose archive partition and view rollups are kept"""
+    now = now or datetime.utcnow()
+    months = now.year * 12 + now.month - 1 - retention_months
+    return datetime(months // 12, months % 12 + 1, 1)
+
+def compact_interactions(
+    connection,
+    cutoff: datetime,
+    policy: str = "archive",
+    expire_before: Optional[datetime] = None
+) -> Dict[str, int]:
+    """
+    Move raw interactions older than `cutoff` out of user_interactions.
+
+    View events are rolled up into per-user/per-post daily counts in
+    user_interaction_daily under either policy, so views are the one lossy
+    type under "archive": their counts survive, their timestamps and ids do
+    not. Every other event is copied into its monthly archive partition
+    (policy "archive") or discarded (policy "drop"). Archive partitions and
+    rollup days before `expire_before` are then deleted, so both keep the
+    same months. Runs inside the caller's transaction so a failure leaves
+    nothing half-moved.
+    """
+    if policy not in RETENTION_POLICIES:
+        raise ValueError(f"Invalid retention policy. Must be one of: {list(RETENTION_POLICIES)}")
+
+    params = {'cutoff': cutoff}
+    stats = {'rolled_up_views': 0, 'archived': 0, 'dropped': 0, 'months': 0, 'expired_months': 0, 'expired_rollups': 0}
+
+    stats['rolled_up_views'] = connection.execute(text("""
+        SELECT COUNT(*) FROM user_interactions
+        WHERE interaction_type = 'view' AND created_at < :cutoff
+    """), params).scalar_one()
+    if stats['rolled_up_views']:
+        connection.execute(text("""
+            INSERT INTO user_interaction_daily (user_id, post_id, day, view_count)
+            SELECT user_id, post_id, date(created_at) || ' 00:00:00.000000', COUNT(*)
+            FROM user_interactions
+            WHERE interaction_type = 'view' AND created_at < :cutoff
+            GROUP BY user_id, post_id, date(created_at)
+            ON CONFLICT (user_id, post_id, day)
+            DO UPDATE SET view_count = user_interaction_daily.view_count + excluded.view_count
+        """), params)
+
+    if policy == "drop":
+        stats['dropped'] = connection.execute(text("""
+            SELECT COUNT(*) FROM user_interactions
+            WHERE interaction_type != 'view' AND created_at < :cutoff
+        """), params).scalar_one()
+    else:
+        months = connection.execute(text("""
+            SELECT DISTINCT strftime('%Y%m', created_at) FROM user_interactions
+            WHERE interaction_type != 'view' AND created_at < :cutoff
+        """), params).scalars().all()
+
+        for month in months:
+            table = interaction_archive_table(month)
+            table.create(connection, checkfirst=True)
+            result = connection.execute(text(f"""
+                INSERT INTO {table.name} (id, user_id, post_id, interaction_type, rating, created_at)
+                SELECT id, user_id, post_id, interaction_type, rating, created_at
+                FROM user_interactions
+                WHERE interaction_type != 'view' AND created_at < :cutoff
+                  AND strftime('%Y%m', created_at) = :month
+            """), {**params, 'month': month})
+            stats['archived'] += result.rowcount
+        stats['months'] = len(months)
+
+    connection.execute(text("DELETE FROM user_interactions WHERE created_at < :cutoff"), params)
+
+    if expire_before is not None:
+        stats['expired_months'], stats['expired_rollups'] = expire_partitions(connection, expire_before)
+
+    logger.info(
+        f"Compacted interactions before {cutoff.isoformat()} | "
+        f"Views rolled up: {stats['rolled_up_views']} | Archived: {stats['archived']} | "
+        f"Dropped: {stats['dropped']} | Archive months: {stats['months']} | "
+        f"Expired months: {stats['expired_months']} | Expired rollups: {stats['expired_rollups']}"
+    )
+    return stats
+
+def expire_partitions(connection, expire_before: datetime) -> Tuple[int, int]:
+    """Drop archive partitions and delete view rollups for months before `expire_before`"""
+    names = connection.execute(
+        text("SELECT name FROM sqlite_master WHERE type = 'table' AND name GLOB :pattern"),
+        {'pattern': f"{ARCHIVE_TABLE_PREFIX}[0-9][0-9][0-9][0-9][0-9][0-9]"}
+    ).scalars().all()
+    first_kept = expire_before.strftime('%Y%m')
+    expired = [name[len(ARCHIVE_TABLE_PREFIX):] for name in names if name[len(ARCHIVE_TABLE_PREFIX):] < first_kept]
+    for month in expired:
+        interaction_archive_table(month).drop(connection, checkfirst=True)
+
+    rollups = connection.execute(
+        text("DELETE FROM user_interaction_daily WHERE day < :expire_before"),
+        {'expire_before': expire_before}
+    ).rowcount
+    return len(expired), rollups
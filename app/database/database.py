@@ -1,141 +1,550 @@
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, delete, func, insert, literal, null, select, text, tuple_, union_all
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 import os
-from datetime import datetime
-from typing import List, Dict, Any
+import base64
+import binascii
+from datetime import datetime, timedelta
+from collections import Counter
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 import logging
 from pathlib import Path
-from ..database.models import Base, User, UserInteraction, UserPreference
+from ..core.config import settings
+from ..database.compaction import archive_cutoff, compact_interactions, retention_cutoff
+from ..database.identity import IdentityCache
+from ..database.migrations import migrate
+from ..database.models import (
+    ARCHIVE_TABLE_PREFIX, PendingPreferenceCredit, User, UserInteraction, UserInteractionDaily, UserPostAggregate, UserPreference,
+    interaction_archive_table
+)
+from ..database.storage import apply_sqlite_profile
+from ..services.metrics import metrics
+from ..core.interactions import local_interaction_weight
 
 logger = logging.getLogger(__name__)
 
-class DatabaseService:
-    def __init__(self):
-        # Create data directory if it doesn't exist
-        data_dir = Path("data")
-        data_dir.mkdir(exist_ok=True)
+VALID_INTERACTION_TYPES = ["view", "like", "rate", "inspire"]
+
+def validate_interaction(interaction_type: str, rating: float = None):
+    """Validate interaction data"""
+    if interaction_type not in VALID_INTERACTION_TYPES:
+        raise ValueError(f"Invalid interaction type. Must be one of: {VALID_INTERACTION_TYPES}")
         
+    if interaction_type == "rate":
+        if rating is None:
+            raise ValueError("Rating is required for rate interactions")
+        if not 0 <= rating <= 5:
+            raise ValueError("Rating must be between 0 and 5")
+
+def credits_preferences(interaction_type: str, rating: float = None) -> bool:
+    """Whether an interaction counts towards the user's category preferences"""
+    return interaction_type in ["like", "rate"] and (rating is None or rating > 3)
+
+def upsert_preferences_statement():
+    """INSERT ... ON CONFLICT DO UPDATE adding to the existing preference score"""
+    stmt = sqlite_insert(UserPreference)
+    return stmt.on_conflict_do_update(
+        index_elements=[UserPreference.user_id, UserPreference.category_id],
+        set_={
+            'preference_score': UserPreference.preference_score + stmt.excluded.preference_score,
+            'last_updated': stmt.excluded.last_updated
+        }
+    )
+
+def insert_missing_users_statement():
+    """INSERT ... ON CONFLICT DO NOTHING so concurrent writers can create the same user"""
+    return sqlite_insert(User).on_conflict_do_nothing(index_elements=[User.username])
+
+# Stay well under SQLite's bound-parameter limit for IN (...) lookups
+USER_LOOKUP_CHUNK_SIZE = 500
+
+def resolve_user_ids(connection, usernames, identity: IdentityCache) -> Dict[str, int]:
+    """
+    Map usernames to user ids, creating missing users with one
+    INSERT ... ON CONFLICT DO NOTHING and reading the ids back in bulk.
+    Ids are not remembered here; callers do that after their commit.
+    """
+    user_ids, missing = identity.lookup_users(usernames)
+    if missing:
+        now = datetime.utcnow()
+        connection.execute(insert_missing_users_statement(), [
+            {'username': username, 'created_at': now} for username in missing
+        ])
+        for start in range(0, len(missing), USER_LOOKUP_CHUNK_SIZE):
+            chunk = missing[start:start + USER_LOOKUP_CHUNK_SIZE]
+            user_ids.update(
+                connection.execute(select(User.username, User.id).where(User.username.in_(chunk))).all()
+            )
+
+    return user_ids
+
+def preference_credits(interactions, user_ids: Dict[str, int], identity: IdentityCache) -> Tuple[Counter, Counter]:
+    """
+    Fold preference credits per (user, category) for a batch of interactions.
+    Credits for posts whose category is not in the current snapshot (e.g.
+    before the first engine build) are returned per (user, post) instead, to
+    be kept as pending until the category is known.
+    """
+    credits, pending = Counter(), Counter()
+    for interaction in interactions:
+        if not credits_preferences(interaction['interaction_type'], interaction.get('rating')):
+            continue
+        user_id = user_ids[interaction['username']]
+        category_id = identity.category_for(interaction['post_id'])
+        if category_id is not None:
+            credits[(user_id, category_id)] += 1
+        else:
+            pending[(user_id, interaction['post_id'])] += 1
+    return credits, pending
+
+def upsert_pending_credits_statement():
+    """INSERT ... ON CONFLICT DO UPDATE adding to the credits already pending for a (user, post)"""
+    stmt = sqlite_insert(PendingPreferenceCredit)
+    return stmt.on_conflict_do_update(
+        index_elements=[PendingPreferenceCredit.user_id, PendingPreferenceCredit.post_id],
+        set_={'credits': PendingPreferenceCredit.credits + stmt.excluded.credits}
+    )
+
+def pending_credit_rows(pending: Counter, now: datetime) -> List[Dict[str, Any]]:
+    return [
+        {'user_id': user_id, 'post_id': post_id, 'credits': count, 'first_seen': now}
+        for (user_id, post_id), count in pending.items()
+    ]
+
+def write_preference_credits(connection, credits: Counter, pending: Counter, now: datetime) -> None:
+    """Upsert credited preferences and pending credits in the caller's transaction"""
+    if credits:
+        connection.execute(upsert_preferences_statement(), preference_rows(credits, now))
+    if pending:
+        connection.execute(upsert_pending_credits_statement(), pending_credit_rows(pending, now))
+
+def credit_pending_preferences(connection, identity: IdentityCache, now: datetime, max_age_days: int) -> int:
+    """
+    Move pending credits whose post category is now known into user
+    preferences and expire the ones still unknown after `max_age_days`.
+    Rows are claimed with DELETE ... RETURNING, so concurrent passes from
+    several workers never credit the same row twice.
+    """
+    pending = connection.execute(select(PendingPreferenceCredit.user_id, PendingPreferenceCredit.post_id)).all()
+    known = [(user_id, post_id) for user_id, post_id in pending if identity.category_for(post_id) is not None]
+
+    credits = Counter()
+    # Two bound parameters per (user, post) key
+    chunk_size = USER_LOOKUP_CHUNK_SIZE // 2
+    for start in range(0, len(known), chunk_size):
+        claimed = connection.execute(
+            delete(PendingPreferenceCredit)
+            .where(tuple_(PendingPreferenceCredit.user_id, PendingPreferenceCredit.post_id).in_(known[start:start + chunk_size]))
+            .returning(PendingPreferenceCredit.user_id, PendingPreferenceCredit.post_id, PendingPreferenceCredit.credits)
+        ).all()
+        for user_id, post_id, count in claimed:
+            credits[(user_id, identity.category_for(post_id))] += count
+    write_preference_credits(connection, credits, Counter(), now)
+
+    expired = connection.execute(
+        delete(PendingPreferenceCredit).where(PendingPreferenceCredit.first_seen < now - timedelta(days=max_age_days))
+    ).rowcount
+    if expired:
+        logger.warning(f"Expired pending preference credits for {expired} posts with no known category")
+    return sum(credits.values())
+
+def preference_rows(credits: Counter, now: datetime) -> List[Dict[str, Any]]:
+    return [
+        {
+            'user_id': user_id,
+            'category_id': category_id,
+            'preference_score': increment,
+            'last_updated': now
+        }
+        for (user_id, category_id), increment in credits.items()
+    ]
+
+AGGREGATE_COUNT_COLUMNS = {
+    'view': 'view_count',
+    'like': 'like_count',
+    'inspire': 'inspire_count',
+    'rate': 'rate_count'
+}
+
+def aggregate_rows(interactions, user_ids: Dict[str, int], now: datetime) -> List[Dict[str, Any]]:
+    """Fold a batch of interactions into one aggregate delta per (user, post)"""
+    deltas: Dict[Tuple[int, int], Dict[str, Any]] = {}
+    for interaction in interactions:
+        key = (user_ids[interaction['username']], interaction['post_id'])
+        delta = deltas.get(key)
+        if delta is None:
+            delta = deltas[key] = {
+                'user_id': key[0],
+                'post_id': key[1],
+                'score': 0.0,
+                'view_count': 0,
+                'like_count': 0,
+                'inspire_count': 0,
+                'rate_count': 0,
+                'last_seen': interaction.get('created_at') or now,
+                'updated_at': now
+            }
+        delta['score'] += local_interaction_weight(interaction['interaction_type'], interaction.get('rating'))
+        delta[AGGREGATE_COUNT_COLUMNS[interaction['interaction_type']]] += 1
+        delta['last_seen'] = max(delta['last_seen'], interaction.get('created_at') or now)
+    return list(deltas.values())
+
+def upsert_aggregates_statement():
+    """INSERT ... ON CONFLICT DO UPDATE adding a delta to the running aggregates"""
+    stmt = sqlite_insert(UserPostAggregate)
+    return stmt.on_conflict_do_update(
+        index_elements=[UserPostAggregate.user_id, UserPostAggregate.post_id],
+        set_={
+            'score': UserPostAggregate.score + stmt.excluded.score,
+            'view_count': UserPostAggregate.view_count + stmt.excluded.view_count,
+            'like_count': UserPostAggregate.like_count + stmt.excluded.like_count,
+            'inspire_count': UserPostAggregate.inspire_count + stmt.excluded.inspire_count,
+            'rate_count': UserPostAggregate.rate_count + stmt.excluded.rate_count,
+            'last_seen': func.max(UserPostAggregate.last_seen, stmt.excluded.last_seen),
+            'updated_at': stmt.excluded.updated_at
+        }
+    )
+
+def user_post_scores_query(since: Optional[datetime] = None):
+    """(username, post_id, score) rows for the engine's local profiles, optionally only those changed since a time"""
+    query = select(User.username, UserPostAggregate.post_id, UserPostAggregate.score)\
+        .join(User, User.id == UserPostAggregate.user_id)
+    if since is not None:
+        query = query.where(UserPostAggregate.updated_at >= since)
+    return query
+
+def empty_history() -> Dict[str, List[Dict]]:
+    return {
+        'views': [],
+        'likes': [],
+        'ratings': []
+    }
+
+# History row sources, each its own id space; archive partitions keep the raw interaction ids
+HISTORY_SOURCE_EVENTS = 0
+HISTORY_SOURCE_ROLLUPS = 1
+
+def encode_history_cursor(timestamp: str, source: int, row_id: int) -> str:
+    """Opaque keyset cursor for the (created_at, source, id) position of a history row"""
+    return base64.urlsafe_b64encode(f"{timestamp}|{source}|{row_id}".encode()).decode()
+
+def decode_history_cursor(cursor: str) -> Tuple[datetime, int, int]:
+    try:
+        parts = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        if len(parts) == 2:
+            # Cursors issued before rows carried a source always point at raw events
+            parts.insert(1, str(HISTORY_SOURCE_EVENTS))
+        timestamp, source, row_id = parts
+        return datetime.fromisoformat(timestamp), int(source), int(row_id)
+    except (ValueError, binascii.Error, UnicodeDecodeError) as e:
+        raise ValueError("Invalid history cursor") from e
+
+def _keyset_condition(created_at, row_id, source: int, keyset):
+    """
+    (created_at, source, id) < keyset for a branch whose source is constant,
+    written as a range on its (created_at, id) index
+    """
+    timestamp, cursor_source, cursor_id = keyset
+    if source < cursor_source:
+        return created_at <= timestamp
+    if source > cursor_source:
+        return created_at < timestamp
+    return tuple_(created_at, row_id) < tuple_(timestamp, cursor_id)
+
+def _raw_history_branch(table, user_id: int, keyset, interaction_types):
+    stmt = select(
+        table.c.id,
+        table.c.post_id,
+        table.c.interaction_type,
+        table.c.rating,
+        table.c.created_at,
+        literal(1).label('event_count'),
+        literal(HISTORY_SOURCE_EVENTS).label('source')
+    ).where(table.c.user_id == user_id)
+
+    if interaction_types:
+        stmt = stmt.where(table.c.interaction_type.in_(interaction_types))
+    if keyset:
+        stmt = stmt.where(_keyset_condition(table.c.created_at, table.c.id, HISTORY_SOURCE_EVENTS, keyset))
+    return stmt
+
+def _rollup_history_branch(user_id: int, keyset):
+    table = UserInteractionDaily.__table__
+    stmt = select(
+        table.c.id,
+        table.c.post_id,
+        literal('view').label('interaction_type'),
+        null().label('rating'),
+        table.c.day.label('created_at'),
+        table.c.view_count.label('event_count'),
+        literal(HISTORY_SOURCE_ROLLUPS).label('source')
+    ).where(table.c.user_id == user_id)
+
+    if keyset:
+        stmt = stmt.where(_keyset_condition(table.c.day, table.c.id, HISTORY_SOURCE_ROLLUPS, keyset))
+    return stmt
+
+def _archive_month_start(table) -> datetime:
+    return datetime.strptime(table.name[len(ARCHIVE_TABLE_PREFIX):], "%Y%m")
+
+def history_query(
+    user_id: int,
+    limit: Optional[int] = None,
+    before: Optional[str] = None,
+    interaction_types: Optional[List[str]] = None,
+    archive_tables=(),
+    include_rollups: bool = False
+):
+    """
+    Column-only history select, newest first, keyset-paginated on
+    (created_at, source, id) so every page is a bounded range scan of the
+    history index. The source keeps rollup rows, whose ids are their own,
+    apart from raw events at the same timestamp.
+
+    With archive partitions or rollups the branches are combined with UNION
+    ALL; each branch is an ordered index scan, so SQLite merges them and stops
+    at the limit instead of sorting the whole history. A page after a cursor
+    only reads the archive months that start before it.
+    """
+    keyset = decode_history_cursor(before) if before else None
+    if keyset:
+        archive_tables = [table for table in archive_tables if _archive_month_start(table) <= keyset[0]]
+
+    branches = [_raw_history_branch(UserInteraction.__table__, user_id, keyset, interaction_types)]
+    branches.extend(
+        _raw_history_branch(table, user_id, keyset, interaction_types) for table in archive_tables
+    )
+    if include_rollups and (not interaction_types or 'view' in interaction_types):
+        branches.append(_rollup_history_branch(user_id, keyset))
+
+    if len(branches) == 1:
+        # A single branch has one source, so (created_at, id) alone orders it along the index
+        stmt = branches[0].order_by(UserInteraction.created_at.desc(), UserInteraction.id.desc())
+    else:
+        stmt = union_all(*branches)
+        stmt = stmt.order_by(
+            stmt.selected_columns.created_at.desc(),
+            stmt.selected_columns.source.desc(),
+            stmt.selected_columns.id.desc()
+        )
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return stmt
+
+def archive_tables(connection) -> List[Any]:
+    """Monthly interaction archive partitions present in the database, newest first"""
+    names = connection.execute(
+        text("SELECT name FROM sqlite_master WHERE type = 'table' AND name GLOB :pattern ORDER BY name DESC"),
+        {'pattern': f"{ARCHIVE_TABLE_PREFIX}[0-9][0-9][0-9][0-9][0-9][0-9]"}
+    ).scalars().all()
+    return [interaction_archive_table(name[len(ARCHIVE_TABLE_PREFIX):]) for name in names]
+
+def history_item(interaction) -> Dict[str, Any]:
+    """Flat representation of one history row, used for streamed responses"""
+    item = {
+        'id': interaction.id,
+        'post_id': interaction.post_id,
+        'interaction_type': interaction.interaction_type,
+        'timestamp': interaction.created_at.isoformat()
+    }
+    if interaction.rating:
+        item['rating'] = interaction.rating
+    if interaction.event_count != 1:
+        item['count'] = interaction.event_count
+    return item
+
+def next_history_cursor(last, count: int, limit: Optional[int]) -> Optional[str]:
+    """Cursor for the page after a full page ending at `last`, else None"""
+    if last is None or limit is None or count < limit:
+        return None
+    return encode_history_cursor(last.created_at.isoformat(), last.source, last.id)
+
+def group_history(interactions) -> Dict[str, List[Dict]]:
+    """Group interaction rows into the history response shape"""
+    history = empty_history()
+
+    for interaction in interactions:
+        interaction_data = {
+            'post_id': interaction.post_id,
+            'timestamp': interaction.created_at.isoformat()
+        }
+        if interaction.rating:
+            interaction_data['rating'] = interaction.rating
+        if getattr(interaction, 'event_count', 1) != 1:
+            interaction_data['count'] = interaction.event_count
+        
+        if interaction.interaction_type == 'view':
+            history['views'].append(interaction_data)
+        elif interaction.interaction_type == 'like':
+            history['likes'].append(interaction_data)
+        elif interaction.interaction_type == 'rate':
+            history['ratings'].append(interaction_data)
+
+    return history
+
+class DatabaseService:
+    def __init__(self, database_url: Optional[str] = None, identity: Optional[IdentityCache] = None):
+        if database_url is None:
+            # Create data directory if it doesn't exist
+            data_dir = Path("data")
+            data_dir.mkdir(exist_ok=True)
+            database_url = f"sqlite:///{data_dir / 'recommendation_system.db'}"
+
         # Initialize database
-        self.database_path = data_dir / "recommendation_system.db"
-        self.database_url = f"sqlite:///{self.database_path}"
+        self.database_url = database_url
         logger.info(f"Initializing database at {self.database_url}")
         
         self.engine = create_engine(self.database_url)
-        Base.metadata.create_all(self.engine)
+        apply_sqlite_profile(self.engine)
+        with self.engine.begin() as connection:
+            migrate(connection)
         self.SessionLocal = sessionmaker(bind=self.engine)
+        self.identity = identity or IdentityCache(maxsize=settings.USER_ID_CACHE_SIZE)
         logger.info("Database initialized successfully")
 
     def validate_interaction(self, interaction_type: str, rating: float = None):
         """Validate interaction data"""
-        valid_types = ["view", "like", "rate", "inspire"]
-        if interaction_type not in valid_types:
-            raise ValueError(f"Invalid interaction type. Must be one of: {valid_types}")
-            
-        if interaction_type == "rate":
-            if rating is None:
-                raise ValueError("Rating is required for rate interactions")
-            if not 0 <= rating <= 5:
-                raise ValueError("Rating must be between 0 and 5")
+        validate_interaction(interaction_type, rating)
 
     def record_interaction(self, username: str, post_id: int, interaction_type: str, rating: float = None):
         """Record a user's interaction with a post"""
+        return self.record_interactions([{
+            'username': username,
+            'post_id': post_id,
+            'interaction_type': interaction_type,
+            'rating': rating
+        }]) == 1
+
+    @metrics.timed("db_record_interactions")
+    def record_interactions(self, interactions: List[Dict[str, Any]]) -> int:
+        """Record a batch of interactions in a single transaction"""
+        if not interactions:
+            return 0
+
         session = self.SessionLocal()
         try:
             # Validate input before starting database transaction
-            self.validate_interaction(interaction_type, rating)
-            
-            # Get or create user
-            user = session.query(User).filter_by(username=username).first()
-            if not user:
-                user = User(username=username)
-                session.add(user)
-                session.flush()
-
-            # Create interaction
-            interaction = UserInteraction(
-                user_id=user.id,
-                post_id=post_id,
-                interaction_type=interaction_type,
-                rating=rating,
-                created_at=datetime.utcnow()
-            )
-            session.add(interaction)
-            
-            # Update preferences
-            if interaction_type in ["like", "rate"] and (rating is None or rating > 3):
-                self._update_user_preferences(session, user.id, post_id)
+            for interaction in interactions:
+                self.validate_interaction(interaction['interaction_type'], interaction.get('rating'))
+
+            user_ids = self._resolve_user_ids(session, {i['username'] for i in interactions})
+            now = datetime.utcnow()
+
+            session.execute(insert(UserInteraction), [
+                {
+                    'user_id': user_ids[interaction['username']],
+                    'post_id': interaction['post_id'],
+                    'interaction_type': interaction['interaction_type'],
+                    'rating': interaction.get('rating'),
+                    'created_at': interaction.get('created_at') or now
+                }
+                for interaction in interactions
+            ])
+
+            session.execute(upsert_aggregates_statement(), aggregate_rows(interactions, user_ids, now))
+
+            # Fold preference credits so each (user, category) is upserted once per batch
+            credits, pending = preference_credits(interactions, user_ids, self.identity)
+            write_preference_credits(session, credits, pending, now)
 
             session.commit()
-            return True
-            
+            self.identity.remember_users(user_ids)
+            return len(interactions)
+
         except Exception as e:
-            logger.error(f"Error recording interaction: {str(e)}")
+            logger.error(f"Error recording interaction batch: {str(e)}")
             session.rollback()
             raise
         finally:
             session.close()
 
-    def _update_user_preferences(self, session, user_id: int, post_id: int):
-        """Update user's category preferences"""
+    def credit_pending_preferences(self) -> int:
+        """Credit preferences recorded before their post's category was known"""
         try:
-            pref = session.query(UserPreference)\
-                .filter_by(user_id=user_id, category_id=1)\
-                .first()
-            
-            if pref:
-                pref.preference_score += 1
-                pref.last_updated = datetime.utcnow()
-            else:
-                pref = UserPreference(
-                    user_id=user_id,
-                    category_id=1,
-                    preference_score=1
+            with self.engine.begin() as connection:
+                credited = credit_pending_preferences(
+                    connection, self.identity, datetime.utcnow(), settings.PREFERENCE_PENDING_MAX_AGE_DAYS
                 )
-                session.add(pref)
-                
+            if credited:
+                logger.info(f"Credited {credited} pending preference credits")
+            return credited
         except Exception as e:
-            logger.error(f"Error updating preferences: {str(e)}")
+            logger.error(f"Error crediting pending preferences: {str(e)}")
             raise
 
-    def get_user_history(self, username: str) -> Dict[str, List[Dict]]:
-        """Get user's interaction history"""
+    def _resolve_user_ids(self, session, usernames) -> Dict[str, int]:
+        """Resolve user ids from the identity cache, then in bulk from the database, creating missing users"""
+        return resolve_user_ids(session, usernames, self.identity)
+
+    def _get_user_id(self, session, username: str) -> Optional[int]:
+        """Look up an existing user's id, consulting the identity cache first"""
+        user_id = self.identity.get_user_id(username)
+        if user_id is None:
+            user_id = session.execute(select(User.id).where(User.username == username)).scalar()
+            if user_id is not None:
+                self.identity.remember_users({username: user_id})
+        return user_id
+
+    def compact_interactions(
+        self,
+        retention_days: Optional[int] = None,
+        policy: Optional[str] = None,
+        now: Optional[datetime] = None,
+        archive_retention_months: Optional[int] = None
+    ) -> Dict[str, int]:
+        """
+        Roll up and archive raw interactions older than the retention window,
+        then expire archives and rollups older than the archive retention
+        """
+        retention_days = settings.INTERACTION_RAW_RETENTION_DAYS if retention_days is None else retention_days
+        policy = policy or settings.INTERACTION_RETENTION_POLICY
+        if archive_retention_months is None:
+            archive_retention_months = settings.INTERACTION_ARCHIVE_RETENTION_MONTHS
+        try:
+            with self.engine.begin() as connection:
+                return compact_interactions(
+                    connection,
+                    retention_cutoff(retention_days, now),
+                    policy,
+                    expire_before=archive_cutoff(archive_retention_months, now)
+                )
+        except Exception as e:
+            logger.error(f"Error compacting interactions: {str(e)}")
+            raise
+
+    def iter_user_post_scores(self, chunk_size: int = 10000) -> Iterator[Tuple[str, int, float]]:
+        """Stream (username, post_id, score) aggregate rows for an engine build"""
         session = self.SessionLocal()
         try:
-            user = session.query(User).filter_by(username=username).first()
-            if not user:
-                return {
-                    'views': [],
-                    'likes': [],
-                    'ratings': []
-                }
+            result = session.execute(user_post_scores_query().execution_options(yield_per=chunk_size))
+            for row in result:
+                yield tuple(row)
+        finally:
+            session.close()
 
-            interactions = session.query(UserInteraction)\
-                .filter_by(user_id=user.id)\
-                .order_by(UserInteraction.created_at.desc())\
-                .all()
+    @metrics.timed("db_get_user_history")
+    def get_user_history(
+        self,
+        username: str,
+        limit: Optional[int] = None,
+        before: Optional[str] = None,
+        interaction_types: Optional[List[str]] = None
+    ) -> Dict[str, List[Dict]]:
+        """Get user's interaction history"""
+        session = self.SessionLocal()
+        try:
+            user_id = self._get_user_id(session, username)
+            if user_id is None:
+                return empty_history()
 
-            history = {
-                'views': [],
-                'likes': [],
-                'ratings': []
-            }
+            interactions = session.execute(
+                history_query(
+                    user_id, limit, before, interaction_types,
+                    archive_tables=archive_tables(session), include_rollups=True
+                )
+            ).all()
 
-            for interaction in interactions:
-                interaction_data = {
-                    'post_id': interaction.post_id,
-                    'timestamp': interaction.created_at.isoformat()
-                }
-                if interaction.rating:
-                    interaction_data['rating'] = interaction.rating
-                
-                if interaction.interaction_type == 'view':
-                    history['views'].append(interaction_data)
-                elif interaction.interaction_type == 'like':
-                    history['likes'].append(interaction_data)
-                elif interaction.interaction_type == 'rate':
-                    history['ratings'].append(interaction_data)
-
-            return history
+            return group_history(interactions)
 
         except Exception as e:
             logger.error(f"Error fetching user history: {str(e)}")
@@ -143,16 +552,17 @@ class DatabaseService:
         finally:
             session.close()
 
+    @metrics.timed("db_get_user_preferences")
     def get_user_preferences(self, username: str) -> Dict[int, float]:
         """Get user's category preferences"""
         session = self.SessionLocal()
         try:
-            user = session.query(User).filter_by(username=username).first()
-            if not user:
+            user_id = self._get_user_id(session, username)
+            if user_id is None:
                 return {}
 
             preferences = session.query(UserPreference)\
-                .filter_by(user_id=user.id)\
+                .filter_by(user_id=user_id)\
                 .all()
 
             return {
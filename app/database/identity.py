@@ -0,0 +1,51 @@
+import threading
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+from cachetools import LRUCache
+
+class IdentityCache:
+    """
+    In-process lookups that spare the database a round-trip per interaction:
+    an LRU-bounded username → user_id map and the post → category map of the
+    current engine snapshot.
+
+    Only committed user ids may be remembered; a user row created inside a
+    transaction that later rolls back must never reach this cache.
+    """
+
+    def __init__(self, maxsize: int = 100000):
+        self._user_ids = LRUCache(maxsize=maxsize)
+        self._post_categories: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def get_user_id(self, username: str) -> Optional[int]:
+        with self._lock:
+            return self._user_ids.get(username)
+
+    def lookup_users(self, usernames: Iterable[str]) -> Tuple[Dict[str, int], List[str]]:
+        """Split usernames into cached ids and names that still need a query"""
+        found, missing = {}, []
+        with self._lock:
+            for username in usernames:
+                user_id = self._user_ids.get(username)
+                if user_id is None:
+                    missing.append(username)
+                else:
+                    found[username] = user_id
+        return found, missing
+
+    def remember_users(self, user_ids: Mapping[str, int]) -> None:
+        with self._lock:
+            for username, user_id in user_ids.items():
+                self._user_ids[username] = user_id
+
+    def category_for(self, post_id: Any) -> Optional[int]:
+        return self._post_categories.get(post_id)
+
+    def update_post_categories(self, post_categories: Mapping[int, int]) -> None:
+        """Swap in the post → category map of a new engine snapshot"""
+        self._post_categories = dict(post_categories)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._user_ids.clear()
+        self._post_categories = {}
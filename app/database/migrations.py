@@ -0,0 +1,111 @@
+from sqlalchemy import text
+import logging
+from ..database.models import Base
+from ..core.interactions import INTERACTION_WEIGHTS, LOCAL_INTERACTION_TYPES, LOCAL_RATING_SCALE
+
+logger = logging.getLogger(__name__)
+
+def _collapse_duplicate_preferences(connection):
+    """Merge duplicate (user_id, category_id) preference rows before adding the unique index"""
+    connection.execute(text("""
+        UPDATE user_preferences
+        SET preference_score = (
+                SELECT SUM(p.preference_score) FROM user_preferences p
+                WHERE p.user_id = user_preferences.user_id
+                  AND p.category_id = user_preferences.category_id
+            ),
+            last_updated = (
+                SELECT MAX(p.last_updated) FROM user_preferences p
+                WHERE p.user_id = user_preferences.user_id
+                  AND p.category_id = user_preferences.category_id
+            )
+        WHERE id IN (
+            SELECT MIN(id) FROM user_preferences
+            GROUP BY user_id, category_id HAVING COUNT(*) > 1
+        )
+    """))
+    connection.execute(text("""
+        DELETE FROM user_preferences
+        WHERE id NOT IN (
+            SELECT MIN(id) FROM user_preferences GROUP BY user_id, category_id
+        )
+    """))
+
+def create_missing_indexes(connection):
+    """Create every index declared on the models that an older file lacks"""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
+
+def _rebuild_history_index(connection):
+    """Recreate the history index with id as the keyset tie-breaker"""
+    connection.execute(text("DROP INDEX IF EXISTS ix_user_interactions_user_created"))
+    create_missing_indexes(connection)
+
+def user_post_aggregates_select(where: str = "") -> str:
+    """
+    SELECT folding raw interactions into user_post_aggregates rows, weighted
+    like the engine's profiles. `where` optionally restricts the raw rows.
+    """
+    weight_cases = " ".join(
+        f"WHEN '{local_type}' THEN {INTERACTION_WEIGHTS[upstream_type]}"
+        for local_type, upstream_type in LOCAL_INTERACTION_TYPES.items()
+    )
+    return f"""
+        SELECT
+            user_id,
+            post_id,
+            SUM(
+                CASE interaction_type {weight_cases} ELSE 1.0 END
+                * CASE WHEN interaction_type = 'rate'
+                       THEN 1 + COALESCE(rating, 0) * {LOCAL_RATING_SCALE} / 100.0
+                       ELSE 1 END
+            ),
+            SUM(interaction_type = 'view'),
+            SUM(interaction_type = 'like'),
+            SUM(interaction_type = 'inspire'),
+            SUM(interaction_type = 'rate'),
+            MAX(created_at)
+        FROM user_interactions
+        {f"WHERE {where}" if where else ""}
+        GROUP BY user_id, post_id
+    """
+
+def _backfill_user_post_aggregates(connection):
+    """Build user_post_aggregates from the raw interactions recorded so far"""
+    connection.execute(text(f"""
+        INSERT OR REPLACE INTO user_post_aggregates
+            (user_id, post_id, score, view_count, like_count, inspire_count, rate_count, last_seen)
+        {user_post_aggregates_select()}
+    """))
+
+def _add_aggregate_updated_at(connection):
+    """Track when each aggregate row last changed, so engine loads can read only the changes"""
+    columns = {row[1] for row in connection.execute(text("PRAGMA table_info(user_post_aggregates)"))}
+    if 'updated_at' not in columns:
+        connection.execute(text("ALTER TABLE user_post_aggregates ADD COLUMN updated_at DATETIME"))
+    create_missing_indexes(connection)
+
+# Each migration brings the schema from version N-1 to N
+MIGRATIONS = [
+    _collapse_duplicate_preferences,
+    create_missing_indexes,
+    _rebuild_history_index,
+    _backfill_user_post_aggregates,
+    _add_aggregate_updated_at,
+]
+
+def migrate(connection) -> int:
+    """
+    Create missing tables and apply pending migrations, tracking progress in
+    SQLite's user_version. Safe to run on every startup.
+    """
+    Base.metadata.create_all(bind=connection)
+
+    version = connection.execute(text("PRAGMA user_version")).scalar() or 0
+    for target, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+        logger.info(f"Applying database migration {target}: {migration.__name__}")
+        migration(connection)
+        connection.execute(text(f"PRAGMA user_version={target}"))
+
+    return max(version, len(MIGRATIONS))
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, create_engine
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Index, MetaData, Table, Text, create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -29,6 +29,15 @@ class UserInteraction(Base):
     # Relationship
     user = relationship("User", back_populates="interactions")
 
+    __table_args__ = (
+        # Covers keyset-paginated history reads (newest first per user) without touching the table
+        Index(
+            "ix_user_interactions_user_created",
+            "user_id", created_at.desc(), id.desc(), "post_id", "interaction_type", "rating"
+        ),
+        Index("ix_user_interactions_post_type", "post_id", "interaction_type"),
+    )
+
 class UserPreference(Base):
     __tablename__ = "user_preferences"
 
@@ -41,6 +50,95 @@ class UserPreference(Base):
     # Relationship
     user = relationship("User", back_populates="preferences")
 
+    __table_args__ = (
+        # Conflict target for preference upserts
+        Index("uq_user_preferences_user_category", "user_id", "category_id", unique=True),
+    )
+
+class UserPostAggregate(Base):
+    """Running per-user/per-post interaction totals, maintained on every write"""
+    __tablename__ = "user_post_aggregates"
+
+    user_id = Column(Integer, ForeignKey('users.id'), primary_key=True)
+    post_id = Column(Integer, primary_key=True)
+    score = Column(Float, nullable=False, default=0.0)  # weighted as in RecommendationEngine profiles
+    view_count = Column(Integer, nullable=False, default=0)
+    like_count = Column(Integer, nullable=False, default=0)
+    inspire_count = Column(Integer, nullable=False, default=0)
+    rate_count = Column(Integer, nullable=False, default=0)
+    last_seen = Column(DateTime)
+    updated_at = Column(DateTime)  # when the row last changed, for incremental engine loads
+
+    __table_args__ = (
+        Index("ix_user_post_aggregates_updated", "updated_at"),
+        {'sqlite_with_rowid': False},
+    )
+
+class PendingPreferenceCredit(Base):
+    """Preference credits for posts whose category was not known yet when the interaction was recorded"""
+    __tablename__ = "pending_preference_credits"
+
+    user_id = Column(Integer, ForeignKey('users.id'), primary_key=True)
+    post_id = Column(Integer, primary_key=True)
+    credits = Column(Integer, nullable=False, default=0)
+    first_seen = Column(DateTime, nullable=False)
+
+    __table_args__ = {'sqlite_with_rowid': False}
+
+class UserInteractionDaily(Base):
+    """Daily view counts rolled up from compacted raw view events"""
+    __tablename__ = "user_interaction_daily"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
+    post_id = Column(Integer, nullable=False)
+    day = Column(DateTime, nullable=False)  # midnight UTC, sorts alongside created_at
+    view_count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        Index("uq_user_interaction_daily_user_post_day", "user_id", "post_id", "day", unique=True),
+        Index("ix_user_interaction_daily_user_day", "user_id", day.desc(), id.desc(), "post_id", "view_count"),
+    )
+
+class BackfillCheckpoint(Base):
+    """Resume position of a bulk backfill source, committed with each loaded chunk"""
+    __tablename__ = "backfill_checkpoints"
+
+    source = Column(String, primary_key=True)  # e.g. "jsonl:/path/dump.jsonl", "upstream:viewed"
+    position = Column(Text, nullable=False)  # byte offset or next page, as understood by the source
+    rows_loaded = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+ARCHIVE_TABLE_PREFIX = "user_interactions_"
+archive_metadata = MetaData()
+
+def interaction_archive_table(month: str) -> Table:
+    """
+    Monthly archive partition (e.g. user_interactions_202401) with the same
+    columns and history index as user_interactions. Archive tables live in
+    their own MetaData so create_all never creates them.
+    """
+    name = f"{ARCHIVE_TABLE_PREFIX}{month}"
+    if name in archive_metadata.tables:
+        return archive_metadata.tables[name]
+
+    table = Table(
+        name,
+        archive_metadata,
+        Column("id", Integer, primary_key=True),
+        Column("user_id", Integer, nullable=False),
+        Column("post_id", Integer, nullable=False),
+        Column("interaction_type", String, nullable=False),
+        Column("rating", Float, nullable=True),
+        Column("created_at", DateTime)
+    )
+    Index(
+        f"ix_{name}_user_created",
+        table.c.user_id, table.c.created_at.desc(), table.c.id.desc(),
+        table.c.post_id, table.c.interaction_type, table.c.rating
+    )
+    return table
+
 # Database initialization
 DATABASE_URL = "sqlite:///./recommendation_system.db"
 engine = create_engine(DATABASE_URL)
@@ -0,0 +1,40 @@
+from sqlalchemy import event
+import logging
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+def _sqlite_pragmas() -> dict:
+    return {
+        "journal_mode": settings.SQLITE_JOURNAL_MODE,
+        "synchronous": settings.SQLITE_SYNCHRONOUS,
+        "cache_size": -settings.SQLITE_CACHE_SIZE_KB,
+        "mmap_size": settings.SQLITE_MMAP_SIZE_BYTES,
+        "temp_store": "MEMORY",
+        "busy_timeout": settings.SQLITE_BUSY_TIMEOUT_MS
+    }
+
+def apply_sqlite_profile(engine) -> None:
+    """
+    Apply the SQLite performance profile to every new connection of an engine.
+
+    WAL lets readers run alongside the ingestion writer, synchronous=NORMAL is
+    durable under WAL without an fsync per commit, and the page cache/mmap
+    keep hot index pages in memory. Accepts sync engines or the sync_engine
+    of an AsyncEngine.
+    """
+    if engine.dialect.name != "sqlite":
+        return
+
+    pragmas = _sqlite_pragmas()
+
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+    logger.info(f"Applied SQLite profile: {pragmas}")
@@ -1,12 +1,23 @@
+import asyncio
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.responses import JSONResponse
-from .api.routes import router as recommendation_router
-from .api.interaction_routes import router as interaction_router
+from .api.routes import router as recommendation_router, compute_pool, feed_store, feed_warmer, loop_lag_monitor, request_profiler
+from .api.interaction_routes import router as interaction_router, interaction_ingestor, async_db_service
+from .core.config import settings
+from .core.logging import setup_logging
+from .services.profiler import ProfilingMiddleware
 import logging
 
 # Configure logging
-logging.basicConfig(level=logging.INFO)
+setup_logging(
+    level=settings.LOG_LEVEL,
+    json_format=settings.LOG_JSON,
+    log_file=settings.LOG_FILE,
+    queue_size=settings.LOG_QUEUE_SIZE,
+    sample_rates=settings.LOG_SAMPLE_RATES,
+    rate_limit_per_second=settings.LOG_RATE_LIMIT_PER_SECOND
+)
 logger = logging.getLogger(__name__)
 
 @asynccontextmanager
@@ -16,9 +27,18 @@ async def lifespan(app: FastAPI):
     """
     # Startup
     logger.info("Starting up the application")
+    loop_lag_monitor.start()
+    feed_warmer.schedule()
     yield
     # Shutdown
     logger.info("Shutting down the application")
+    await feed_warmer.stop()
+    await loop_lag_monitor.stop()
+    await asyncio.to_thread(compute_pool.shutdown)
+    if feed_store is not None:
+        feed_store.close()
+    await asyncio.to_thread(interaction_ingestor.stop)
+    await async_db_service.close()
 
 app = FastAPI(
     title="Video Recommendation API",
@@ -32,6 +52,10 @@ app = FastAPI(
 app.include_router(recommendation_router, tags=["recommendations"])
 app.include_router(interaction_router, prefix="/interactions", tags=["interactions"])
 
+# Installed only when profiling is configured, so unprofiled deployments pay nothing for it
+if request_profiler.enabled:
+    app.add_middleware(ProfilingMiddleware, profiler=request_profiler)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
@@ -0,0 +1,224 @@
+import asyncio
+import inspect
+import json
+import logging
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, List, NamedTuple, Optional, Tuple, Union
+from .events import EngineBuilt
+
+logger = logging.getLogger(__name__)
+
+class FeedShape(NamedTuple):
+    username: str
+    category_id: Optional[int] = None
+    mood: Optional[str] = None
+    limit: int = 10
+
+@dataclass
+class WarmingReport:
+    """Progress of the current (or last) warming run"""
+    planned: int = 0
+    warmed: int = 0
+    skipped: int = 0
+    failed: int = 0
+    total_requests: int = 0
+    covered_requests: int = 0
+    elapsed_seconds: float = 0.0
+    cpu_seconds: float = 0.0
+    running: bool = False
+    stopped_reason: Optional[str] = None
+
+    @property
+    def coverage(self) -> float:
+        """Share of logged requests whose shape is now warm"""
+        if not self.total_requests:
+            return 0.0
+        return self.covered_requests / self.total_requests
+
+    def as_dict(self) -> dict:
+        return {
+            "planned": self.planned,
+            "warmed": self.warmed,
+            "skipped": self.skipped,
+            "failed": self.failed,
+            "coverage": self.coverage,
+            "elapsed_seconds": self.elapsed_seconds,
+            "cpu_seconds": self.cpu_seconds,
+            "running": self.running,
+            "stopped_reason": self.stopped_reason
+        }
+
+def _parse_shape(record: Any) -> Optional[FeedShape]:
+    """Extract a feed query shape from one access-log record"""
+    if not isinstance(record, dict):
+        return None
+    params = record.get('params') or record.get('query') or record
+    if not isinstance(params, dict) or not params.get('username'):
+        return None
+    try:
+        category_id = params.get('category_id')
+        return FeedShape(
+            username=str(params['username']),
+            category_id=int(category_id) if category_id is not None else None,
+            mood=params.get('mood') or None,
+            limit=int(params.get('limit') or 10)
+        )
+    except (TypeError, ValueError):
+        return None
+
+def load_access_log(path: str, top_n: int) -> Tuple[List[Tuple[FeedShape, int]], int]:
+    """
+    Read a JSON-lines access log and return the top-N feed shapes with their
+    request counts, plus the total number of feed requests seen.
+    """
+    counts: Counter = Counter()
+    with open(path, "r", encoding="utf-8") as log_file:
+        for line in log_file:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                shape = _parse_shape(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+            if shape is not None:
+                counts[shape] += 1
+
+    return counts.most_common(top_n), sum(counts.values())
+
+class CacheWarmer:
+    """
+    Replays the most frequent feed shapes from an access log into the feed
+    cache. Runs as a background task that yields to the event loop between
+    shapes and stops once its wall-clock or CPU budget is spent. After an
+    engine swap it re-warms every shape from the new engine, replacing feeds
+    ranked by the old one.
+    """
+
+    def __init__(
+        self,
+        log_path: Optional[str],
+        load_context: Callable[[], Awaitable[Any]],
+        warm_one: Callable[[Any, FeedShape, bool], Union[bool, Awaitable[bool]]],
+        top_n: int = 200,
+        time_budget_seconds: float = 30.0,
+        cpu_budget_seconds: float = 10.0
+    ):
+        self.log_path = log_path
+        self.load_context = load_context
+        self.warm_one = warm_one
+        self.top_n = top_n
+        self.time_budget_seconds = time_budget_seconds
+        self.cpu_budget_seconds = cpu_budget_seconds
+        self.report = WarmingReport()
+        self._task: Optional[asyncio.Task] = None
+        self._refresh = False
+        self._loading_context = False
+
+    def schedule(self, context: Any = None, refresh: bool = False) -> Optional[asyncio.Task]:
+        """Start a warming run in the background, restarting any run in progress"""
+        if not self.log_path:
+            return None
+        if self._task is not None and not self._task.done():
+            if self._loading_context:
+                # The run is still loading the engine it will warm from
+                self._refresh = self._refresh or refresh
+                return self._task
+            self._task.cancel()
+        self._task = asyncio.get_running_loop().create_task(self.warm(context, refresh))
+        return self._task
+
+    def handle_engine_built(self, event: EngineBuilt) -> None:
+        """Re-warm from a newly built engine, overwriting feeds already cached"""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self.schedule(context=event.engine, refresh=True)
+
+    async def stop(self) -> None:
+        """Cancel a run in progress"""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def warm(self, context: Any = None, refresh: bool = False) -> WarmingReport:
+        """
+        Warm the cache with the top shapes from the access log, from the given
+        context or a freshly loaded one. With refresh, shapes already cached
+        are ranked again instead of skipped.
+        """
+        report = self.report = WarmingReport(running=True)
+        self._refresh = refresh
+        start_time = time.monotonic()
+        start_cpu = time.process_time()
+
+        def update_timers():
+            report.elapsed_seconds = time.monotonic() - start_time
+            report.cpu_seconds = time.process_time() - start_cpu
+
+        try:
+            shapes, report.total_requests = load_access_log(self.log_path, self.top_n)
+            report.planned = len(shapes)
+            logger.info(f"Warming feed cache with {len(shapes)} shapes from {self.log_path}")
+            if not shapes:
+                report.stopped_reason = "empty_log"
+                return report
+
+            if context is None:
+                self._loading_context = True
+                try:
+                    context = await self.load_context()
+                finally:
+                    self._loading_context = False
+
+            for shape, count in shapes:
+                update_timers()
+                if report.elapsed_seconds >= self.time_budget_seconds:
+                    report.stopped_reason = "time_budget"
+                    break
+                if report.cpu_seconds >= self.cpu_budget_seconds:
+                    report.stopped_reason = "cpu_budget"
+                    break
+
+                try:
+                    warmed = self.warm_one(context, shape, self._refresh)
+                    if inspect.isawaitable(warmed):
+                        warmed = await warmed
+                    if warmed:
+                        report.warmed += 1
+                    else:
+                        report.skipped += 1
+                    report.covered_requests += count
+                except Exception as e:
+                    report.failed += 1
+                    logger.error(f"Error warming feed for {shape}: {str(e)}")
+
+                # Let live requests run between shapes
+                await asyncio.sleep(0)
+            else:
+                report.stopped_reason = "completed"
+
+            return report
+
+        except asyncio.CancelledError:
+            report.stopped_reason = "cancelled"
+            raise
+        except Exception as e:
+            report.stopped_reason = "error"
+            logger.error(f"Error warming feed cache: {str(e)}")
+            return report
+        finally:
+            update_timers()
+            report.running = False
+            logger.info(
+                f"Feed cache warming {report.stopped_reason} | "
+                f"Warmed: {report.warmed}/{report.planned} | "
+                f"Coverage: {report.coverage:.1%} | "
+                f"Elapsed: {report.elapsed_seconds:.2f}s"
+            )
@@ -0,0 +1,276 @@
+import asyncio
+import contextvars
+import logging
+import threading
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from .metrics import metrics
+from .recommendation_engine import RecommendationEngine, reusable_indexes
+
+logger = logging.getLogger(__name__)
+
+# Weight of the newest sample in the moving averages below
+_EWMA_ALPHA = 0.2
+
+def _ewma(current: Optional[float], sample: float) -> float:
+    return sample if current is None else current + _EWMA_ALPHA * (sample - current)
+
+def _timed_call(fn: Callable[..., Any], *args: Any) -> Tuple[float, float, Any]:
+    """Run fn in a worker, returning its wall-clock start, CPU seconds and result"""
+    started = time.time()
+    cpu_start = time.thread_time()
+    result = fn(*args)
+    return started, time.thread_time() - cpu_start, result
+
+def build_engine(
+    data: Dict[str, Any],
+    local_scores: Optional[List[Tuple[str, int, float]]],
+    previous: Optional[RecommendationEngine] = None
+) -> RecommendationEngine:
+    """Build an engine in the calling thread"""
+    return RecommendationEngine(data, local_scores=local_scores, previous=previous)
+
+class PoolStats:
+    """Queue depth and wait/run times of one worker pool"""
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.submitted = 0
+        self.completed = 0
+        self.inline = 0
+        self.avg_wait_seconds: Optional[float] = None
+        self.max_wait_seconds = 0.0
+        self.avg_run_seconds: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def in_flight(self) -> int:
+        return self.submitted - self.completed
+
+    @property
+    def queue_depth(self) -> int:
+        """Submitted jobs still waiting for a free worker"""
+        return max(0, self.in_flight - self.workers)
+
+    def submit(self) -> float:
+        """Count a submitted job and return its submission time"""
+        with self._lock:
+            self.submitted += 1
+        return time.time()
+
+    def record(self, submitted_at: float, started_at: float) -> None:
+        """Record a finished job from its submission and worker start times"""
+        wait_seconds = max(0.0, started_at - submitted_at)
+        with self._lock:
+            self.completed += 1
+            self.avg_wait_seconds = _ewma(self.avg_wait_seconds, wait_seconds)
+            self.max_wait_seconds = max(self.max_wait_seconds, wait_seconds)
+            self.avg_run_seconds = _ewma(self.avg_run_seconds, time.time() - started_at)
+
+    def discard(self) -> None:
+        """Count a job that failed or was cancelled"""
+        with self._lock:
+            self.completed += 1
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            'workers': self.workers,
+            'queue_depth': self.queue_depth,
+            'in_flight': self.in_flight,
+            'submitted': self.submitted,
+            'completed': self.completed,
+            'inline': self.inline,
+            'avg_wait_seconds': self.avg_wait_seconds,
+            'max_wait_seconds': self.max_wait_seconds,
+            'avg_run_seconds': self.avg_run_seconds
+        }
+
+class ComputePool:
+    """
+    Keeps CPU-bound engine work off the event loop.
+
+    Engine builds run one at a time on a dedicated build thread, except for
+    inputs small enough to build inline. They are not sharded across
+    processes: forking a server that runs writer, driver and logging threads
+    can hand the child a held lock, and a spawned worker would have to
+    unpickle the whole snapshot, which costs more than the build. The build
+    thread still holds the GIL, but the interpreter hands it back to the loop
+    every switch interval, so a build lags the loop by milliseconds rather
+    than by its whole duration. Per-request scoring runs in a bounded thread
+    pool unless its measured cost per candidate post predicts it will finish
+    under the inline threshold.
+    """
+
+    def __init__(
+        self,
+        build_offload_min_items: int = 5000,
+        scoring_threads: int = 4,
+        scoring_inline_threshold_ms: float = 2.0
+    ):
+        self.build_offload_min_items = build_offload_min_items
+        self.scoring_threads = scoring_threads
+        self.scoring_inline_threshold_seconds = scoring_inline_threshold_ms / 1000.0
+
+        self.build_stats = PoolStats(1)
+        self.scoring_stats = PoolStats(scoring_threads)
+        # Measured CPU seconds of scoring per candidate post
+        self.scoring_cost_per_post: Optional[float] = None
+
+        self._thread_pool: Optional[ThreadPoolExecutor] = None
+        self._build_thread: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _threads(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._thread_pool is None:
+                self._thread_pool = ThreadPoolExecutor(
+                    max_workers=self.scoring_threads,
+                    thread_name_prefix="feed-scoring"
+                )
+            return self._thread_pool
+
+    def _builder(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._build_thread is None:
+                self._build_thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix="engine-build")
+            return self._build_thread
+
+    async def _submit(
+        self,
+        executor: Executor,
+        stats: PoolStats,
+        fn: Callable[..., Any],
+        *args: Any,
+        queue_stage: Optional[str] = None
+    ) -> Tuple[float, Any]:
+        """Run fn on an executor, returning its CPU seconds and result"""
+        submitted_at = stats.submit()
+        # The worker runs in a copy of this context, so stage timings reach the request
+        context = contextvars.copy_context()
+        try:
+            started, cpu_seconds, result = await asyncio.get_running_loop().run_in_executor(
+                executor, _timed_call, context.run, fn, *args
+            )
+        except BaseException:
+            stats.discard()
+            raise
+        stats.record(submitted_at, started)
+        if queue_stage is not None:
+            metrics.record(queue_stage, max(0.0, started - submitted_at))
+        return cpu_seconds, result
+
+    async def build_engine(
+        self,
+        data: Dict[str, Any],
+        local_scores: Optional[Iterable[Tuple[str, int, float]]] = None,
+        previous: Optional[RecommendationEngine] = None
+    ) -> RecommendationEngine:
+        """
+        Build a RecommendationEngine without blocking the event loop, rebuilding
+        only the index groups whose datasets differ from `previous`
+        """
+        local_scores = list(local_scores) if local_scores is not None else None
+        reuse_profiles, reuse_posts = reusable_indexes(data, previous)
+        items = len(local_scores or []) + (0 if reuse_posts else len(data.get('posts', [])))
+        if not reuse_profiles:
+            items += sum(len(i) for i in data.get('interactions', {}).values())
+
+        if items < self.build_offload_min_items:
+            self.build_stats.inline += 1
+            return build_engine(data, local_scores, previous)
+
+        started = time.perf_counter()
+        _, engine = await self._submit(self._builder(), self.build_stats, build_engine, data, local_scores, previous)
+        logger.info(f"Built engine from {items} items | Time: {time.perf_counter() - started:.2f}s")
+        return engine
+
+    async def score(self, engine: RecommendationEngine, fn: Callable[..., Any], *args: Any) -> Any:
+        """
+        Run a scoring function for one request: inline when its predicted cost
+        is under the threshold, otherwise on the scoring thread pool.
+        """
+        candidates = max(1, len(engine.post_lookup))
+        if self.scoring_cost_per_post is not None and \
+                self.scoring_cost_per_post * candidates < self.scoring_inline_threshold_seconds:
+            self.scoring_stats.inline += 1
+            cpu_start = time.thread_time()
+            result = fn(*args)
+            self._measure(time.thread_time() - cpu_start, candidates)
+            return result
+
+        cpu_seconds, result = await self._submit(
+            self._threads(), self.scoring_stats, fn, *args, queue_stage="scoring_queue"
+        )
+        self._measure(cpu_seconds, candidates)
+        return result
+
+    def _measure(self, cpu_seconds: float, candidates: int) -> None:
+        self.scoring_cost_per_post = _ewma(self.scoring_cost_per_post, cpu_seconds / candidates)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'engine_builds': {
+                **self.build_stats.as_dict(),
+                'offload_min_items': self.build_offload_min_items
+            },
+            'scoring': {
+                **self.scoring_stats.as_dict(),
+                'inline_threshold_seconds': self.scoring_inline_threshold_seconds,
+                'cost_per_post_seconds': self.scoring_cost_per_post
+            }
+        }
+
+    def shutdown(self) -> None:
+        """Stop the scoring pool and the build thread; they are recreated on next use"""
+        with self._lock:
+            executors = (self._thread_pool, self._build_thread)
+            self._thread_pool = self._build_thread = None
+        for executor in executors:
+            if executor is not None:
+                executor.shutdown(wait=True, cancel_futures=True)
+
+class LoopLagMonitor:
+    """Samples how late the event loop wakes up from a short sleep"""
+
+    def __init__(self, interval_seconds: float = 0.1):
+        self.interval_seconds = interval_seconds
+        self.last_lag_seconds = 0.0
+        self.avg_lag_seconds: Optional[float] = None
+        self.max_lag_seconds = 0.0
+        self.samples = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> asyncio.Task:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        return self._task
+
+    async def stop(self) -> None:
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            scheduled = loop.time()
+            await asyncio.sleep(self.interval_seconds)
+            self.record(max(0.0, loop.time() - scheduled - self.interval_seconds))
+
+    def record(self, lag_seconds: float) -> None:
+        self.samples += 1
+        self.last_lag_seconds = lag_seconds
+        self.avg_lag_seconds = _ewma(self.avg_lag_seconds, lag_seconds)
+        self.max_lag_seconds = max(self.max_lag_seconds, lag_seconds)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            'samples': self.samples,
+            'last_lag_seconds': self.last_lag_seconds,
+            'avg_lag_seconds': self.avg_lag_seconds,
+            'max_lag_seconds': self.max_lag_seconds
+        }
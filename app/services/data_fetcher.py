@@ -1,107 +1,282 @@
 import asyncio
+import hashlib
 import httpx
 import logging
-from typing import Optional, Dict, List, Any
+import random
+import time
+from typing import Optional, Dict, Iterable, List, Any, NamedTuple, Sequence
+from urllib.parse import urlsplit
 from ..core.config import settings
+from .json_stream import ItemStreamDecoder, project_fields
+from .metrics import metrics
+from .upstream import UpstreamEndpoint, UpstreamHTTPError, UpstreamRegistry, UpstreamUnavailable, is_retryable
 import json
 
 logger = logging.getLogger(__name__)
 
+# Upstream datasets, each served by the settings.ENDPOINTS entry of the same name
+INTERACTION_DATASETS = ('viewed', 'liked', 'inspired', 'rated')
+DATASETS = INTERACTION_DATASETS + ('posts', 'users')
+# Interaction fields the engine reads; the rest is dropped while decoding.
+# Posts are kept whole since they are served as recommendations.
+INTERACTION_FIELDS = ('id', 'username', 'post_id', 'rating')
+
+class UpstreamBody(NamedTuple):
+    """One upstream answer: decoded items (None for a 304) and the hash and size of the raw body"""
+    status_code: int
+    headers: Any
+    items: Optional[List[Dict]]
+    content_hash: Optional[str]
+    size: int
+
 class DataFetcher:
-    def __init__(self):
+    """
+    Fetches upstream datasets. Each request is retried with jittered backoff,
+    hedged with a duplicate once it outlives the endpoint's latency percentile,
+    and short-circuited while the endpoint's breaker is open. Failures fall
+    back to the endpoint's last good snapshot, which the registry keeps across
+    fetchers; a fetcher without a shared registry only remembers its own.
+
+    Requests are conditional: the ETag/Last-Modified validators of the last
+    good response are sent back, and a 304, or a 200 whose body hashes the
+    same as before, returns the previous list itself. Callers can tell an
+    unchanged dataset by that identity. Bodies are decoded item by item as
+    they stream in, never held whole.
+    """
+
+    def __init__(self, upstream: Optional[UpstreamRegistry] = None):
+        self.upstream = upstream or UpstreamRegistry(
+            max_retries=settings.UPSTREAM_MAX_RETRIES,
+            retry_backoff_seconds=settings.UPSTREAM_RETRY_BACKOFF_SECONDS,
+            hedge_percentile=settings.UPSTREAM_HEDGE_PERCENTILE,
+            hedge_min_samples=settings.UPSTREAM_HEDGE_MIN_SAMPLES,
+            breaker_failure_threshold=settings.UPSTREAM_BREAKER_FAILURE_THRESHOLD,
+            breaker_reset_seconds=settings.UPSTREAM_BREAKER_RESET_SECONDS
+        )
         self.client = httpx.AsyncClient(
-            timeout=30.0,
+            timeout=settings.UPSTREAM_TIMEOUT_SECONDS,
             headers=settings.HEADERS
         )
         logger.info("DataFetcher initialized")
 
-    async def fetch_data(self, endpoint: str, params: dict) -> List[Dict]:
-        """Generic method to fetch data from any endpoint"""
+    async def fetch_data(self, endpoint: str, params: dict, fields: Optional[Sequence[str]] = None) -> List[Dict]:
+        """Generic method to fetch data from any endpoint, optionally keeping only some fields of each item"""
+        result = await self._fetch(endpoint, params, fields)
+        return [] if result is None else result
+
+    async def _fetch(
+        self,
+        endpoint: str,
+        params: dict,
+        fields: Optional[Sequence[str]] = None
+    ) -> Optional[List[Dict]]:
+        """Fetch and decode an endpoint, or return its last good snapshot (None if there is none)"""
+        started = time.perf_counter()
         try:
-            logger.info(f"Fetching data from {endpoint}")
-            response = await self.client.get(endpoint, params=params)
-            response.raise_for_status()
-            
-            data = response.json()
-            logger.debug(f"Parsed data structure: {json.dumps(data, indent=2)[:1000]}")
-            
-            # Handle different response formats
-            if isinstance(data, dict):
-                if not data:  # Empty dictionary
-                    return []
-                if 'posts' in data:
-                    result = data['posts']
-                elif 'data' in data:
-                    result = data['data']
-                else:
-                    result = [data]
-            elif isinstance(data, list):
-                result = data
-            else:
-                result = [data] if data else []
-            
-            # Ensure result is a list of dictionaries
-            if isinstance(result, list):
-                result = [r for r in result if isinstance(r, dict)]
-            else:
-                result = []
-                
-            logger.info(f"Retrieved {len(result)} items from {endpoint}")
+            return await self._fetch_endpoint(endpoint, params, fields)
+        finally:
+            metrics.upstream_seconds.observe(time.perf_counter() - started, urlsplit(endpoint).path)
+
+    async def _fetch_endpoint(
+        self,
+        endpoint: str,
+        params: dict,
+        fields: Optional[Sequence[str]]
+    ) -> Optional[List[Dict]]:
+        state = self.upstream.endpoint(endpoint)
+        params_key = tuple(sorted(params.items()))
+        if not state.breaker.allow():
+            state.fast_failures += 1
+            logger.warning("Circuit open for %s, serving last good snapshot", endpoint)
+            return state.snapshot(params_key)
+
+        probe = state.breaker.probing
+        try:
+            logger.info("Fetching data from %s", endpoint)
+            cached = state.cached(params_key)
+            headers = cached.conditional_headers() if cached is not None else {}
+            body = await self._get_with_retries(state, endpoint, params, headers, fields)
+            state.breaker.record_success()
+
+            if body.status_code == 304:
+                if cached is None:
+                    raise UpstreamHTTPError(304, "Not modified, but nothing was cached")
+                state.not_modified += 1
+                state.bytes_saved += cached.size
+                cached.stored_at = time.time()
+                logger.info("%s not modified", endpoint)
+                return cached.result
+
+            state.bytes_received += body.size
+            validators = {
+                'etag': body.headers.get('etag'),
+                'last_modified': body.headers.get('last-modified'),
+                'content_hash': body.content_hash,
+                'size': body.size
+            }
+
+            if cached is not None and body.content_hash == cached.content_hash:
+                state.unchanged += 1
+                state.remember(params_key, cached.result, **validators)
+                logger.info("%s unchanged", endpoint)
+                return cached.result
+
+            result = body.items
+            state.remember(params_key, result, **validators)
+            if result and logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"Sample item from {endpoint}: {json.dumps(result[0])[:1000]}")
+            logger.info("Retrieved %d items from %s", len(result), endpoint)
             return result
-                
+
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
+            state.failures += 1
+            if is_retryable(e):
+                state.breaker.record_failure()
             logger.error(f"Error fetching data from {endpoint}: {str(e)}")
-            return []
+            return state.snapshot(params_key)
+        finally:
+            if probe:
+                state.breaker.release_probe()
 
-    async def get_all_data(self) -> Dict[str, Any]:
-        """Fetch all required data from endpoints"""
+    async def _get_with_retries(
+        self,
+        state: UpstreamEndpoint,
+        endpoint: str,
+        params: dict,
+        headers: dict,
+        fields: Optional[Sequence[str]]
+    ) -> UpstreamBody:
+        """Send a hedged request, retrying retryable failures with full-jitter backoff"""
+        for attempt in range(self.upstream.max_retries + 1):
+            try:
+                return await self._hedged_get(state, endpoint, params, headers, fields)
+            except Exception as e:
+                if attempt == self.upstream.max_retries or not is_retryable(e):
+                    raise
+                state.retries += 1
+                backoff = self.upstream.retry_backoff_seconds * (2 ** attempt)
+                logger.warning(f"Retrying {endpoint} after error: {str(e)}")
+                await asyncio.sleep(random.uniform(0, backoff))
+
+    async def _hedged_get(
+        self,
+        state: UpstreamEndpoint,
+        endpoint: str,
+        params: dict,
+        headers: dict,
+        fields: Optional[Sequence[str]]
+    ) -> UpstreamBody:
+        """Send a request and, if it outlives the hedge delay, a duplicate; the first success wins"""
+        primary = asyncio.ensure_future(self._get(state, endpoint, params, headers, fields))
+        delay = self.upstream.hedge_delay(state)
+        if delay is None:
+            return await primary
+
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done:
+            return primary.result()
+
+        state.hedges += 1
+        hedge = asyncio.ensure_future(self._get(state, endpoint, params, headers, fields))
+        pending = {primary, hedge}
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            state.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _get(
+        self,
+        state: UpstreamEndpoint,
+        endpoint: str,
+        params: dict,
+        headers: dict,
+        fields: Optional[Sequence[str]]
+    ) -> UpstreamBody:
+        """One request attempt, body included; records its latency on success"""
+        state.requests += 1
+        started = time.perf_counter()
+        request = self.client.build_request("GET", endpoint, params=params, headers=headers)
+        response = await self.client.send(request, stream=True)
+        try:
+            if response.status_code == 304:
+                body = UpstreamBody(304, response.headers, None, None, 0)
+            else:
+                try:
+                    response.raise_for_status()
+                except Exception as e:
+                    raise UpstreamHTTPError(response.status_code, str(e)) from e
+                body = await self._read(response, fields)
+        finally:
+            await response.aclose()
+        state.latency.record(time.perf_counter() - started)
+        return body
+
+    async def _read(self, response: Any, fields: Optional[Sequence[str]]) -> UpstreamBody:
+        """Decode the body as it streams in, hashing it on the way"""
+        decoder = ItemStreamDecoder(project_fields(fields) if fields else None)
+        digest = hashlib.sha256()
+        size = 0
+        async for chunk in response.aiter_bytes():
+            digest.update(chunk)
+            size += len(chunk)
+            decoder.feed(chunk)
+        return UpstreamBody(response.status_code, response.headers, decoder.close(), digest.hexdigest(), size)
+
+    async def get_all_data(self, datasets: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        """
+        Fetch the given upstream datasets (all of DATASETS by default) in
+        parallel. Datasets not requested come back empty.
+        """
         try:
-            # Define interaction endpoints
+            requested = [name for name in DATASETS if datasets is None or name in set(datasets)]
             interaction_params = {
                 "page_size": settings.DEFAULT_PAGE_SIZE,
                 "resonance_algorithm": settings.RESONANCE_ALGORITHM
             }
-            
+
             tasks = []
-            
-            # Fetch interactions
-            for endpoint in ['viewed', 'liked', 'inspired', 'rated']:
-                url = f"{settings.BASE_URL}{settings.ENDPOINTS[endpoint]}"
-                tasks.append(self.fetch_data(url, interaction_params))
-            
-            # Fetch posts and users
-            tasks.extend([
-                self.fetch_data(
-                    f"{settings.BASE_URL}{settings.ENDPOINTS['posts']}", 
-                    {"page_size": settings.DEFAULT_PAGE_SIZE}
-                ),
-                self.fetch_data(
-                    f"{settings.BASE_URL}{settings.ENDPOINTS['users']}", 
-                    {"page_size": settings.DEFAULT_PAGE_SIZE}
-                )
-            ])
-            
-            results = await asyncio.gather(*tasks)
-            
+            for name in requested:
+                url = f"{settings.BASE_URL}{settings.ENDPOINTS[name]}"
+                if name in INTERACTION_DATASETS:
+                    tasks.append(self.fetch_data(url, interaction_params, fields=INTERACTION_FIELDS))
+                elif name == 'posts':
+                    # Posts are required, so a failure is not masked as []
+                    tasks.append(self._fetch(url, {"page_size": settings.DEFAULT_PAGE_SIZE}))
+                else:
+                    tasks.append(self.fetch_data(url, {"page_size": settings.DEFAULT_PAGE_SIZE}))
+
+            results = dict(zip(requested, await asyncio.gather(*tasks)))
+            if 'posts' in results and results['posts'] is None:
+                raise UpstreamUnavailable("Posts could not be fetched and no snapshot is available")
+
             data = {
-                'interactions': {
-                    'viewed': results[0],
-                    'liked': results[1],
-                    'inspired': results[2],
-                    'rated': results[3]
-                },
-                'posts': results[4],
-                'users': results[5]
+                'interactions': {name: results.get(name, []) for name in INTERACTION_DATASETS},
+                'posts': results.get('posts', []),
+                'users': results.get('users', [])
             }
-            
-            logger.info("\nData Summary:")
+
+            logger.info(f"Fetched datasets: {', '.join(requested)}")
             logger.info(f"Posts: {len(data['posts'])}")
             logger.info(f"Users: {len(data['users'])}")
             for key, interactions in data['interactions'].items():
                 logger.info(f"{key.capitalize()} interactions: {len(interactions)}")
-            
+
             return data
-            
+
+        except UpstreamUnavailable:
+            raise
         except Exception as e:
             logger.error(f"Error in get_all_data: {str(e)}")
             return {
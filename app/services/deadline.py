@@ -0,0 +1,52 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+class DeadlineExceeded(Exception):
+    """Raised when a request's time budget runs out during a stage"""
+
+    def __init__(self, stage: str):
+        super().__init__(f"Deadline exceeded during {stage}")
+        self.stage = stage
+
+class Deadline:
+    """Time budget of one request, enforced around each stage that can block"""
+
+    def __init__(self, budget_seconds: float):
+        self.budget_seconds = budget_seconds
+        self._expires_at = time.monotonic() + budget_seconds
+
+    @classmethod
+    def from_header(cls, value: Optional[str], default_seconds: float) -> "Deadline":
+        """Budget from a milliseconds header value, or the default when absent or invalid"""
+        try:
+            budget_ms = float(value) if value is not None else None
+        except ValueError:
+            budget_ms = None
+        if budget_ms is None or budget_ms <= 0:
+            return cls(default_seconds)
+        return cls(budget_ms / 1000.0)
+
+    def remaining(self) -> float:
+        return max(0.0, self._expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self._expires_at
+
+    async def run(self, stage: str, awaitable: Awaitable[T]) -> T:
+        """Await a stage, cancelling it and raising DeadlineExceeded once the budget is spent"""
+        remaining = self.remaining()
+        if remaining <= 0:
+            if asyncio.iscoroutine(awaitable):
+                awaitable.close()
+            raise DeadlineExceeded(stage)
+        try:
+            return await asyncio.wait_for(awaitable, timeout=remaining)
+        except asyncio.TimeoutError:
+            raise DeadlineExceeded(stage)
@@ -0,0 +1,198 @@
+import asyncio
+import logging
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+from .recommendation_engine import ENGINE_DATASETS, PROFILE_DATASETS, RecommendationEngine
+
+logger = logging.getLogger(__name__)
+
+FetchDatasets = Callable[[List[str]], Awaitable[Dict[str, Any]]]
+LocalScores = List[Tuple[str, int, float]]
+LoadLocalScores = Callable[[Optional[datetime]], Awaitable[Optional[LocalScores]]]
+BuildEngine = Callable[
+    [Dict[str, Any], Optional[LocalScores], Optional[RecommendationEngine]],
+    Awaitable[RecommendationEngine]
+]
+
+class EngineSnapshot:
+    """
+    The current RecommendationEngine and the upstream datasets it was built
+    from.
+
+    Only the datasets the engine reads are fetched, and each is refetched on
+    its own cadence. A request that finds datasets due refetches just those
+    (one refresh at a time, shared by concurrent requests) and the engine
+    rebuilds only the structures derived from them. The fetcher hands back
+    the very same list for a dataset the upstream reports unchanged, and a
+    refresh where nothing changed keeps the current engine without building.
+    If a refresh fails the previous engine keeps being served.
+
+    Local aggregate scores are read in full once and afterwards only the rows
+    changed since the previous read (with an overlap for writes committed
+    late), merged into the scores kept here.
+    """
+
+    def __init__(
+        self,
+        fetch: FetchDatasets,
+        build: BuildEngine,
+        load_local_scores: LoadLocalScores,
+        cadences: Dict[str, float],
+        local_refresh_seconds: float = 60.0,
+        local_overlap_seconds: float = 30.0,
+        datasets: Sequence[str] = ENGINE_DATASETS,
+        default_cadence_seconds: float = 60.0
+    ):
+        self.fetch = fetch
+        self.build = build
+        self.load_local_scores = load_local_scores
+        self.cadences = cadences
+        self.local_refresh_seconds = local_refresh_seconds
+        self.local_overlap_seconds = local_overlap_seconds
+        self.datasets = tuple(datasets)
+        self.default_cadence_seconds = default_cadence_seconds
+
+        self.engine: Optional[RecommendationEngine] = None
+        self.rebuilds = 0
+        self.rebuilds_skipped = 0
+        self.failed_refreshes = 0
+        self.fetches: Counter = Counter()
+        self.unchanged: Counter = Counter()
+        self._data: Dict[str, List[Dict[str, Any]]] = {}
+        self._fetched_at: Dict[str, float] = {}
+        self._local_scores: Optional[Dict[Tuple[str, int], float]] = None
+        self._local_loaded_at: Optional[float] = None
+        self._local_since: Optional[datetime] = None
+        self._refresh: Optional[asyncio.Task] = None
+
+    def due(self, now: Optional[float] = None) -> List[str]:
+        """Datasets never fetched or older than their cadence"""
+        now = time.monotonic() if now is None else now
+        return [
+            name for name in self.datasets
+            if name not in self._fetched_at
+            or now - self._fetched_at[name] >= self.cadences.get(name, self.default_cadence_seconds)
+        ]
+
+    def _local_due(self, now: float) -> bool:
+        return self._local_loaded_at is None or now - self._local_loaded_at >= self.local_refresh_seconds
+
+    async def get(self) -> RecommendationEngine:
+        """Return the current engine, refreshing due datasets first"""
+        now = time.monotonic()
+        if self.engine is not None and not self.due(now) and not self._local_due(now):
+            return self.engine
+
+        refresh = self._refresh
+        # A refresh left over from another event loop (e.g. a finished test client) is abandoned
+        if refresh is None or refresh.done() or refresh.get_loop() is not asyncio.get_running_loop():
+            refresh = self._refresh = asyncio.ensure_future(self._rebuild())
+            refresh.add_done_callback(lambda task: task.cancelled() or task.exception())
+        # Shielded so a caller giving up (e.g. on its deadline) does not cancel it for everyone else
+        return await asyncio.shield(refresh)
+
+    async def _rebuild(self) -> RecommendationEngine:
+        now = time.monotonic()
+        due, local_due = self.due(now), self._local_due(now)
+        changed, local_changed = [], False
+        try:
+            if due:
+                fetched = await self.fetch(due)
+                for name in due:
+                    result = fetched['posts'] if name == 'posts' else fetched['interactions'][name]
+                    if name in self._data and result is self._data[name]:
+                        self.unchanged[name] += 1
+                    else:
+                        changed.append(name)
+                    self._data[name] = result
+                    self._fetched_at[name] = now
+                    self.fetches[name] += 1
+            if local_due:
+                local_changed = await self._load_local(now)
+
+            if self.engine is not None and not changed and not local_changed:
+                self.rebuilds_skipped += 1
+                logger.info(f"Engine unchanged | Datasets: {', '.join(due) or 'none'}")
+                return self.engine
+
+            # Unchanged local scores are left out; the engine keeps its previous counts
+            engine = await self.build(
+                self.data(),
+                self.local_scores() if local_changed else None,
+                self.engine
+            )
+        except Exception as e:
+            self.failed_refreshes += 1
+            if self.engine is None:
+                raise
+            logger.error(f"Error refreshing engine, serving the previous one: {str(e)}")
+            return self.engine
+
+        self.engine = engine
+        self.rebuilds += 1
+        logger.info(f"Engine refreshed | Datasets: {', '.join(changed) or 'none'} | Local scores: {local_changed}")
+        return engine
+
+    async def _load_local(self, now: float) -> bool:
+        """Merge local scores changed since the last read; True if any score changed"""
+        started = datetime.utcnow()
+        rows = await self.load_local_scores(self._local_since)
+        changed = self._local_loaded_at is None
+        self._local_loaded_at = now
+        if rows is None:
+            return changed
+
+        scores = self._local_scores
+        if scores is None:
+            scores, changed = {}, True
+        # Rows carry running totals, so a row read again just overwrites the same value
+        for username, post_id, score in rows:
+            if scores.get((username, post_id)) != score:
+                scores[(username, post_id)] = score
+                changed = True
+        self._local_scores = scores
+        self._local_since = started - timedelta(seconds=self.local_overlap_seconds)
+        return changed
+
+    def local_scores(self) -> Optional[LocalScores]:
+        """All local (username, post_id, score) rows read so far, or None if none could be read"""
+        if self._local_scores is None:
+            return None
+        return [(username, post_id, score) for (username, post_id), score in self._local_scores.items()]
+
+    def data(self) -> Dict[str, Any]:
+        """Engine input assembled from the current dataset lists"""
+        return {
+            'posts': self._data.get('posts', []),
+            'interactions': {name: self._data.get(name, []) for name in PROFILE_DATASETS},
+            'users': []
+        }
+
+    def clear(self) -> None:
+        """Forget every dataset and the engine, so the next request refetches everything"""
+        self.engine = None
+        self._data.clear()
+        self._fetched_at.clear()
+        self._local_scores = None
+        self._local_loaded_at = None
+        self._local_since = None
+        self._refresh = None
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            'rebuilds': self.rebuilds,
+            'rebuilds_skipped': self.rebuilds_skipped,
+            'failed_refreshes': self.failed_refreshes,
+            'datasets': {
+                name: {
+                    'age_seconds': now - self._fetched_at[name] if name in self._fetched_at else None,
+                    'cadence_seconds': self.cadences.get(name, self.default_cadence_seconds),
+                    'fetches': self.fetches[name],
+                    'unchanged': self.unchanged[name]
+                }
+                for name in self.datasets
+            }
+        }
@@ -0,0 +1,46 @@
+import logging
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Type
+
+logger = logging.getLogger(__name__)
+
+@dataclass(frozen=True)
+class InteractionRecorded:
+    """Published once a user interaction has been accepted"""
+    username: str
+    post_id: int
+    interaction_type: str
+    rating: Optional[float] = None
+
+@dataclass(frozen=True)
+class EngineBuilt:
+    """Published after a RecommendationEngine is built from fresh upstream data"""
+    engine: Any
+
+class EventBus:
+    """Minimal in-process publish/subscribe bus keyed by event type"""
+
+    def __init__(self):
+        self._subscribers: Dict[Type, List[Callable[[Any], None]]] = defaultdict(list)
+
+    def subscribe(self, event_type: Type, handler: Callable[[Any], None]) -> None:
+        """Register a handler for events of the given type"""
+        if handler not in self._subscribers[event_type]:
+            self._subscribers[event_type].append(handler)
+
+    def unsubscribe(self, event_type: Type, handler: Callable[[Any], None]) -> None:
+        """Remove a previously registered handler"""
+        handlers = self._subscribers.get(event_type, [])
+        if handler in handlers:
+            handlers.remove(handler)
+
+    def publish(self, event: Any) -> None:
+        """Deliver an event to every subscriber of its type"""
+        for handler in list(self._subscribers.get(type(event), [])):
+            try:
+                handler(event)
+            except Exception as e:
+                logger.error(f"Error handling {type(event).__name__} event: {str(e)}")
+
+event_bus = EventBus()
@@ -0,0 +1,135 @@
+import logging
+import threading
+from typing import Any, Dict, Iterable, List, Set, Tuple
+from cachetools import LRUCache, TTLCache
+from .events import InteractionRecorded
+
+logger = logging.getLogger(__name__)
+
+def feed_cache_key(username: str, category_id: Any, mood: Any, limit: int) -> str:
+    return f"{username}:{category_id}:{mood}:{limit}"
+
+def user_tag(username: str) -> str:
+    return f"user:{username}"
+
+def post_tag(post_id: Any) -> str:
+    return f"post:{post_id}"
+
+class _TaggedTTLCache(TTLCache):
+    """TTLCache that reports every key it drops on its own"""
+
+    def __init__(self, maxsize: int, ttl: float, on_evict):
+        super().__init__(maxsize=maxsize, ttl=ttl)
+        self._on_evict = on_evict
+
+    def popitem(self):
+        key, value = super().popitem()
+        self._on_evict(key)
+        return key, value
+
+    def expire(self, time=None):
+        expired = super().expire(time) or []
+        for key, _ in expired:
+            self._on_evict(key)
+        return expired
+
+class FeedCache:
+    """
+    TTL cache for feed responses with tag-based invalidation.
+
+    Every entry carries a set of tags (the requesting user and the posts it
+    contains), so an interaction only evicts the entries it can affect
+    instead of forcing a short TTL on the whole cache.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, popularity_threshold: int = 50):
+        self.popularity_threshold = popularity_threshold
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.RLock()
+        self._tags: Dict[str, Set[str]] = {}
+        self._key_tags: Dict[str, Tuple[str, ...]] = {}
+        self._popularity = LRUCache(maxsize=max(maxsize * 10, 1))
+        self._cache = _TaggedTTLCache(maxsize, ttl, on_evict=self._forget)
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return key in self._cache
+
+    def __getitem__(self, key: str) -> Any:
+        with self._lock:
+            return self._cache[key]
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        self.set(key, value)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._cache)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Look up a value, counting the hit or miss"""
+        with self._lock:
+            value = self._cache.get(key, self._cache)
+            if value is self._cache:
+                self.misses += 1
+                return default
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: Any, tags: Iterable[str] = ()) -> None:
+        """Store a value and index it under the given tags"""
+        with self._lock:
+            if key in self._key_tags:
+                self._forget(key)
+            self._cache[key] = value
+            tags = tuple(dict.fromkeys(tags))
+            self._key_tags[key] = tags
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+
+    def invalidate_tag(self, tag: str) -> int:
+        """Evict every entry indexed under a tag, returning how many were dropped"""
+        with self._lock:
+            keys = list(self._tags.get(tag, ()))
+            for key in keys:
+                self._cache.pop(key, None)
+                self._forget(key)
+            return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+            self._tags.clear()
+            self._key_tags.clear()
+            self._popularity.clear()
+
+    def handle_interaction(self, event: InteractionRecorded) -> None:
+        """Evict entries made stale by a recorded interaction"""
+        with self._lock:
+            evicted = self.invalidate_tag(user_tag(event.username))
+
+            count = self._popularity.get(event.post_id, 0) + 1
+            if count >= self.popularity_threshold:
+                evicted += self.invalidate_tag(post_tag(event.post_id))
+                count = 0
+            self._popularity[event.post_id] = count
+
+        if evicted:
+            logger.debug(f"Invalidated {evicted} feed entries after interaction by {event.username}")
+
+    def _forget(self, key: str) -> None:
+        """Drop a key from the tag index"""
+        for tag in self._key_tags.pop(key, ()):
+            keys = self._tags.get(tag)
+            if keys is None:
+                continue
+            keys.discard(key)
+            if not keys:
+                del self._tags[tag]
+
+def feed_tags(username: str, recommendations: List[Dict[str, Any]]) -> List[str]:
+    """Tags for a feed response: its user plus every post it ranks"""
+    tags = [user_tag(username)]
+    tags.extend(post_tag(post.get('id')) for post in recommendations if post.get('id') is not None)
+    return tags
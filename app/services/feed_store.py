@@ -0,0 +1,224 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from collections import Counter
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from cachetools import TTLCache
+from .events import InteractionRecorded
+from .recommendation_engine import RecommendationEngine
+
+logger = logging.getLogger(__name__)
+
+Shape = Tuple[Optional[int], Optional[str]]
+# username, shape, ranked post ids, is_personalized
+FeedRow = Tuple[str, Shape, List[int], bool]
+
+SCHEMA = (
+    "CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)",
+    "CREATE TABLE posts (id INTEGER PRIMARY KEY, payload TEXT NOT NULL)",
+    "CREATE TABLE feeds (username TEXT NOT NULL, shape TEXT NOT NULL, post_ids BLOB NOT NULL, "
+    "is_personalized INTEGER NOT NULL, PRIMARY KEY (username, shape)) WITHOUT ROWID",
+)
+
+def shape_key(category_id: Optional[int], mood: Optional[str]) -> str:
+    return f"{category_id}:{mood}"
+
+def pack_post_ids(post_ids: List[int]) -> bytes:
+    return array('q', post_ids).tobytes()
+
+def unpack_post_ids(blob: bytes) -> List[int]:
+    post_ids = array('q')
+    post_ids.frombytes(blob)
+    return post_ids.tolist()
+
+def most_active_users(engine: RecommendationEngine, top_n: int) -> List[str]:
+    """Usernames with the most upstream interactions and local aggregate rows"""
+    counts: Counter = Counter()
+    for interactions in engine.data.get('interactions', {}).values():
+        counts.update(i['username'] for i in interactions if i.get('username'))
+    counts.update(engine.local_activity)
+    return [username for username, _ in counts.most_common(top_n)]
+
+def precompute_feeds(
+    engine: RecommendationEngine,
+    user_shapes: Dict[str, Iterable[Shape]],
+    top_n: int
+) -> Iterator[FeedRow]:
+    """
+    Rank the top-N posts for every user and shape. Rankings do not depend on
+    the user, so each shape is ranked once and shared by its users.
+    """
+    rankings: Dict[Shape, List[int]] = {}
+    for username, shapes in user_shapes.items():
+        is_personalized = engine.is_personalized(username)
+        for shape in dict.fromkeys(shapes):
+            if shape not in rankings:
+                rankings[shape] = [int(post['id']) for post in engine.rank_posts(*shape, limit=top_n)]
+            yield username, shape, rankings[shape], is_personalized
+
+def write_feed_store(
+    path: str,
+    engine: RecommendationEngine,
+    rows: Iterable[FeedRow],
+    top_n: int,
+    built_at: Optional[float] = None
+) -> Dict[str, int]:
+    """
+    Write precomputed feeds to a fresh store file and atomically swap it in,
+    so readers never see a half-written store.
+    """
+    built_at = time.time() if built_at is None else built_at
+    tmp_path = f"{path}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    connection = sqlite3.connect(tmp_path)
+    try:
+        connection.execute("PRAGMA journal_mode = OFF")
+        connection.execute("PRAGMA synchronous = OFF")
+        for statement in SCHEMA:
+            connection.execute(statement)
+
+        feeds, post_ids = 0, set()
+        with connection:
+            for username, shape, ranked, is_personalized in rows:
+                connection.execute(
+                    "INSERT OR REPLACE INTO feeds VALUES (?, ?, ?, ?)",
+                    (username, shape_key(*shape), pack_post_ids(ranked), int(is_personalized))
+                )
+                post_ids.update(ranked)
+                feeds += 1
+
+            connection.executemany(
+                "INSERT INTO posts VALUES (?, ?)",
+                ((post_id, json.dumps(engine.post_lookup[str(post_id)])) for post_id in post_ids)
+            )
+            connection.executemany(
+                "INSERT INTO meta VALUES (?, ?)",
+                [("built_at", repr(built_at)), ("top_n", str(top_n))]
+            )
+    finally:
+        connection.close()
+
+    os.replace(tmp_path, path)
+    logger.info(f"Wrote {feeds} precomputed feeds over {len(post_ids)} posts to {path}")
+    return {"feeds": feeds, "posts": len(post_ids)}
+
+class FeedStore:
+    """
+    Read side of the precomputed feed store.
+
+    A lookup is one primary-key read of packed post ids plus one read of the
+    post payloads. Stored feeds are served only while the store is younger
+    than max_age_seconds, the request fits in the stored top-N, and the user
+    has not interacted since the store was built; anything else is a miss
+    and the caller ranks online.
+    """
+
+    def __init__(self, path: str, max_age_seconds: float = 3600.0, touched_maxsize: int = 100000):
+        self.path = path
+        self.max_age_seconds = max_age_seconds
+        self.hits = 0
+        self.misses = 0
+        # Users who interacted recently, with the time of their last interaction
+        self._touched = TTLCache(maxsize=touched_maxsize, ttl=max_age_seconds)
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+        self._identity: Optional[Tuple[int, int]] = None
+        self._built_at = 0.0
+        self._top_n = 0
+
+    def _open(self) -> Optional[sqlite3.Connection]:
+        """Return a connection to the current store file, reopening after a swap"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        identity = (stat.st_ino, stat.st_mtime_ns)
+        if identity != self._identity:
+            if self._connection is not None:
+                self._connection.close()
+            self._connection = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+            meta = dict(self._connection.execute("SELECT key, value FROM meta"))
+            self._built_at = float(meta["built_at"])
+            self._top_n = int(meta["top_n"])
+            self._identity = identity
+        return self._connection
+
+    def get(
+        self,
+        username: str,
+        category_id: Optional[int],
+        mood: Optional[str],
+        limit: int
+    ) -> Optional[Tuple[List[Dict[str, Any]], bool]]:
+        """Return (recommendations, is_personalized) for a fresh stored feed, else None"""
+        stored = self.get_payloads(username, category_id, mood, limit)
+        if stored is None:
+            return None
+        payloads, is_personalized = stored
+        return [json.loads(payload) for payload in payloads], is_personalized
+
+    def get_payloads(
+        self,
+        username: str,
+        category_id: Optional[int],
+        mood: Optional[str],
+        limit: int
+    ) -> Optional[Tuple[List[str], bool]]:
+        """Like get, but returns each post as its stored JSON text, undecoded"""
+        try:
+            with self._lock:
+                connection = self._open()
+                if connection is None or not self._is_fresh(username, limit):
+                    self.misses += 1
+                    return None
+                row = connection.execute(
+                    "SELECT post_ids, is_personalized FROM feeds WHERE username = ? AND shape = ?",
+                    (username, shape_key(category_id, mood))
+                ).fetchone()
+                if row is None:
+                    self.misses += 1
+                    return None
+                post_ids = unpack_post_ids(row[0])[:limit]
+                payloads = dict(connection.execute(
+                    f"SELECT id, payload FROM posts WHERE id IN ({','.join('?' * len(post_ids))})",
+                    post_ids
+                )) if post_ids else {}
+                self.hits += 1
+            return [payloads[post_id] for post_id in post_ids], bool(row[1])
+        except Exception as e:
+            logger.error(f"Error reading precomputed feed for {username}: {str(e)}")
+            return None
+
+    def _is_fresh(self, username: str, limit: int) -> bool:
+        if limit > self._top_n or time.time() - self._built_at > self.max_age_seconds:
+            return False
+        touched_at = self._touched.get(username)
+        return touched_at is None or touched_at < self._built_at
+
+    def handle_interaction(self, event: InteractionRecorded) -> None:
+        """Mark the user's stored feeds stale"""
+        with self._lock:
+            self._touched[event.username] = time.time()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._open()
+            return {
+                "path": self.path,
+                "built_at": self._built_at or None,
+                "top_n": self._top_n,
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+            self._connection, self._identity = None, None
@@ -0,0 +1,239 @@
+import asyncio
+import atexit
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DURABILITY_MODES = ("enqueue", "commit")
+
+_STOP = object()
+
+class IngestionBackpressure(Exception):
+    """Raised when the ingestion queue stays full past the enqueue timeout"""
+
+class BulkWrite(NamedTuple):
+    """Interactions from one bulk request, written in a transaction of their own"""
+    interactions: List[Dict[str, Any]]
+    future: Future
+
+class InteractionIngestor:
+    """
+    Write-behind queue for interactions.
+
+    Requests enqueue interactions and return immediately; a background writer
+    thread groups them into micro-batches (by size or age) and hands each batch
+    to `write_batch` as a single transaction. With durability "commit" callers
+    wait until their batch is committed, with "enqueue" they are acknowledged
+    as soon as the interaction is queued. Bulk requests go through the same
+    writer thread, so there is only ever one writer, and together hold at
+    most `bulk_queue_share` of the queue so single writes keep flowing.
+    """
+
+    def __init__(
+        self,
+        write_batch: Callable[[List[Dict[str, Any]]], Any],
+        batch_size: int = 500,
+        max_delay_seconds: float = 0.05,
+        max_queue_size: int = 10000,
+        durability: str = "commit",
+        enqueue_timeout_seconds: float = 1.0,
+        bulk_queue_share: float = 0.5
+    ):
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"Invalid durability mode. Must be one of: {list(DURABILITY_MODES)}")
+
+        self.write_batch = write_batch
+        self.batch_size = batch_size
+        self.max_delay_seconds = max_delay_seconds
+        self.durability = durability
+        self.enqueue_timeout_seconds = enqueue_timeout_seconds
+        self.max_queue_size = max_queue_size
+        self.max_bulk_reserved = max(1, int(max_queue_size * bulk_queue_share))
+
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=max_queue_size)
+        # Queue slots held by bulk requests, one queue entry each, until written
+        self.reserved = 0
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._atexit_registered = False
+
+        self.written = 0
+        self.failed = 0
+        self.batches = 0
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def start(self) -> None:
+        """Start the writer thread if it is not already running"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(
+                target=self._run,
+                name="interaction-ingestor",
+                daemon=True
+            )
+            self._thread.start()
+            if not self._atexit_registered:
+                atexit.register(self.stop)
+                self._atexit_registered = True
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Flush everything queued so far and stop the writer thread"""
+        with self._lock:
+            thread = self._thread
+            if thread is None or not thread.is_alive():
+                return
+            self._queue.put(_STOP)
+            thread.join(timeout)
+            self._thread = None
+        logger.info(f"Interaction ingestor stopped | Written: {self.written} | Failed: {self.failed}")
+
+    def submit_nowait(self, interaction: Dict[str, Any]) -> Future:
+        """Queue an interaction without waiting; raises queue.Full when saturated"""
+        if self.reserved and self._queue.qsize() + self.reserved >= self.max_queue_size:
+            raise queue.Full
+        self.start()
+        future: Future = Future()
+        self._queue.put_nowait((interaction, future))
+        return future
+
+    async def submit(self, interaction: Dict[str, Any]) -> None:
+        """Queue an interaction, honouring backpressure and the durability mode"""
+        deadline = time.monotonic() + self.enqueue_timeout_seconds
+        delay = 0.001
+        while True:
+            try:
+                future = self.submit_nowait(interaction)
+                break
+            except queue.Full:
+                if time.monotonic() >= deadline:
+                    raise IngestionBackpressure("Interaction queue is full, retry later")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 0.05)
+
+        if self.durability == "commit":
+            await asyncio.wrap_future(future)
+
+    async def submit_many(self, interactions: List[Dict[str, Any]]) -> Any:
+        """
+        Queue interactions to be written together in one transaction by the
+        writer thread and wait until they are committed, holding queue slots
+        for them meanwhile. Returns what `write_batch` returned.
+        """
+        async with self.reserve(len(interactions)):
+            self.start()
+            future: Future = Future()
+            self._queue.put_nowait(BulkWrite(interactions, future))
+            return await asyncio.wrap_future(future)
+
+    @asynccontextmanager
+    async def reserve(self, count: int) -> AsyncIterator[None]:
+        """
+        Hold `count` queue slots (capped so that all reservations together
+        stay within `max_bulk_reserved`), waiting for room like submit() and
+        raising IngestionBackpressure once the enqueue timeout passes.
+        """
+        count = min(count, self.max_bulk_reserved)
+        deadline = time.monotonic() + self.enqueue_timeout_seconds
+        delay = 0.001
+        while (self.reserved + count > self.max_bulk_reserved
+               or self._queue.qsize() + self.reserved + count > self.max_queue_size):
+            if time.monotonic() >= deadline:
+                raise IngestionBackpressure("Interaction queue is full, retry later")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.05)
+
+        self.reserved += count
+        try:
+            yield
+        finally:
+            self.reserved -= count
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            if isinstance(item, BulkWrite):
+                self._write_bulk(item)
+                continue
+
+            batch = [item]
+            bulk = None
+            deadline = time.monotonic() + self.max_delay_seconds
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                if isinstance(item, BulkWrite):
+                    bulk = item
+                    break
+                batch.append(item)
+
+            self._write(batch)
+            if bulk is not None:
+                self._write_bulk(bulk)
+
+        # Drain anything that raced in behind the stop marker
+        leftovers = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(item, BulkWrite):
+                self._write_bulk(item)
+            elif item is not _STOP:
+                leftovers.append(item)
+        for start in range(0, len(leftovers), self.batch_size):
+            self._write(leftovers[start:start + self.batch_size])
+
+    def _write_bulk(self, bulk: BulkWrite) -> None:
+        """Write one bulk request as a single transaction; a failure fails the whole request"""
+        try:
+            result = self.write_batch(bulk.interactions)
+        except Exception as e:
+            self.failed += len(bulk.interactions)
+            logger.error(f"Error writing bulk of {len(bulk.interactions)} interactions: {str(e)}")
+            bulk.future.set_exception(e)
+            return
+        self.batches += 1
+        self.written += len(bulk.interactions)
+        bulk.future.set_result(result)
+
+    def _write(self, batch: List[Tuple[Dict[str, Any], Future]]) -> None:
+        """Write one batch, falling back to row-by-row writes to isolate bad rows"""
+        try:
+            self.write_batch([interaction for interaction, _ in batch])
+            self.batches += 1
+            self.written += len(batch)
+            for _, future in batch:
+                future.set_result(True)
+            return
+        except Exception as e:
+            if len(batch) == 1:
+                self.failed += 1
+                logger.error(f"Error writing interaction: {str(e)}")
+                batch[0][1].set_exception(e)
+                return
+            logger.warning(f"Batch of {len(batch)} interactions failed, retrying individually: {str(e)}")
+
+        for item in batch:
+            self._write([item])
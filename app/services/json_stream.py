@@ -0,0 +1,202 @@
+import codecs
+import json
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+Projection = Callable[[Dict[str, Any]], Dict[str, Any]]
+
+# Consumed text is dropped from the buffer once this much has piled up
+_TRIM_CHARS = 1 << 16
+_WHITESPACE = ' \t\n\r'
+
+class _Incomplete(Exception):
+    """The value at the cursor continues in a chunk not received yet"""
+
+def project_fields(fields: Sequence[str]) -> Projection:
+    """Keep only the given keys of a decoded item"""
+    def project(item: Dict[str, Any]) -> Dict[str, Any]:
+        return {field: item[field] for field in fields if field in item}
+    return project
+
+class ItemStreamDecoder:
+    """
+    Incremental decoder for upstream list responses, fed the body chunk by
+    chunk. Only the items are kept, one at a time as they complete (after
+    projection), so memory stays near the size of the final list rather than
+    the raw body plus its full object tree.
+
+    The result matches what the upstream formats mean: a top-level array, the
+    `posts` (else `data`) array of a top-level object, or the object itself
+    when it has neither. Non-dict items are dropped.
+    """
+
+    def __init__(self, project: Optional[Projection] = None, keys: Sequence[str] = ('posts', 'data')):
+        self.project = project
+        self.keys = tuple(keys)
+        self._text = codecs.getincrementaldecoder('utf-8')()
+        self._json = json.JSONDecoder()
+        self._buffer = ''
+        self._pos = 0
+        self._eof = False
+        self._state = 'start'
+        self._in_object = False
+        self._key: Optional[str] = None
+        self._items: List[Dict[str, Any]] = []
+        self._arrays: Dict[Optional[str], List[Dict[str, Any]]] = {}
+        self._fields: Dict[str, Any] = {}
+        self._keys: Dict[str, str] = {}
+
+    def feed(self, chunk: bytes) -> None:
+        self._buffer += self._text.decode(chunk)
+        self._advance()
+        if self._pos >= _TRIM_CHARS:
+            self._buffer, self._pos = self._buffer[self._pos:], 0
+
+    def close(self) -> List[Dict[str, Any]]:
+        """Finish decoding and return the items"""
+        self._buffer += self._text.decode(b'', final=True)
+        self._eof = True
+        self._advance()
+        if self._state != 'done':
+            raise ValueError(f"Truncated JSON body (while reading {self._state})")
+
+        if None in self._arrays:
+            return self._arrays[None]
+        for key in self.keys:
+            if key in self._arrays:
+                return self._arrays[key]
+        if self._fields:
+            return [self._project(self._fields)]
+        return []
+
+    def _project(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        return self.project(item) if self.project else self._share_keys(item)
+
+    def _share_keys(self, value: Any) -> Any:
+        """
+        Items decoded one by one each get their own copies of their keys
+        (json.loads shares them across the whole document); reuse one copy.
+        """
+        if isinstance(value, dict):
+            keys = self._keys
+            return {keys.setdefault(key, key): self._share_keys(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [self._share_keys(item) for item in value]
+        return value
+
+    def _peek(self) -> Optional[str]:
+        """Next non-whitespace character, or None until more input arrives"""
+        buffer, pos = self._buffer, self._pos
+        while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+            pos += 1
+        self._pos = pos
+        if pos < len(buffer):
+            return buffer[pos]
+        if self._eof and self._state != 'done':
+            raise ValueError(f"Truncated JSON body (while reading {self._state})")
+        return None
+
+    def _value(self) -> Any:
+        """Decode the complete value at the cursor; raises _Incomplete until it is complete"""
+        try:
+            value, end = self._json.raw_decode(self._buffer, self._pos)
+        except json.JSONDecodeError:
+            if self._eof:
+                raise
+            raise _Incomplete
+        # A number or literal running to the end of the buffer may continue in the next chunk
+        if end == len(self._buffer) and not self._eof:
+            raise _Incomplete
+        self._pos = end
+        return value
+
+    def _expect(self, char: Optional[str], *allowed: str) -> None:
+        if char not in allowed:
+            raise ValueError(f"Invalid JSON body: expected {' or '.join(allowed)} at {self._pos}, got {char!r}")
+        self._pos += 1
+
+    def _advance(self) -> None:
+        try:
+            while True:
+                char = self._peek()
+                if char is None:
+                    return
+                state = self._state
+
+                if state == 'start':
+                    if char == '[':
+                        self._pos += 1
+                        self._items = self._arrays[None] = []
+                        self._state = 'item_or_end'
+                    elif char == '{':
+                        self._pos += 1
+                        self._in_object = True
+                        self._state = 'key_or_end'
+                    else:
+                        self._value()
+                        self._state = 'done'
+
+                elif state == 'key_or_end':
+                    if char == '}':
+                        self._pos += 1
+                        self._state = 'done'
+                    else:
+                        self._state = 'key'
+
+                elif state == 'key':
+                    if char != '"':
+                        self._expect(char, '"')
+                    self._key = self._value()
+                    self._state = 'colon'
+
+                elif state == 'colon':
+                    self._expect(char, ':')
+                    self._state = 'value'
+
+                elif state == 'value':
+                    if self._key in self.keys and char == '[':
+                        self._pos += 1
+                        self._items = self._arrays[self._key] = []
+                        self._state = 'item_or_end'
+                    else:
+                        value = self._value()
+                        if self._key in self.keys:
+                            # posts/data that is not an array holds no items
+                            self._arrays[self._key] = []
+                        elif not self._arrays:
+                            # Kept only in case the object turns out to be the single item
+                            self._fields[self._key] = value
+                        self._state = 'member_end'
+
+                elif state == 'member_end':
+                    self._expect(char, ',', '}')
+                    self._state = 'key' if char == ',' else 'done'
+
+                elif state == 'item_or_end':
+                    if char == ']':
+                        self._end_array()
+                    else:
+                        self._state = 'item'
+
+                elif state == 'item':
+                    item = self._value()
+                    if isinstance(item, dict):
+                        self._items.append(self._project(item))
+                    self._state = 'item_end'
+
+                elif state == 'item_end':
+                    self._expect(char, ',', ']')
+                    if char == ',':
+                        self._state = 'item'
+                    else:
+                        self._pos -= 1
+                        self._end_array()
+
+                else:
+                    raise ValueError(f"Invalid JSON body: extra data at {self._pos}")
+        except _Incomplete:
+            return
+
+    def _end_array(self) -> None:
+        self._pos += 1
+        self._fields.clear()
+        self._state = 'member_end' if self._in_object else 'done'
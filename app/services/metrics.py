@@ -0,0 +1,179 @@
+import asyncio
+import functools
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+METRIC_PREFIX = "recommender_"
+# Upper bounds in seconds, from half a millisecond to ten seconds
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Stage timings of the request being handled, if any. Tasks and scoring
+# threads started by the request share the same dict.
+_request_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_timings", default=None)
+
+class Sample(NamedTuple):
+    """One gauge or counter value reported by a collector"""
+    name: str
+    kind: str
+    help: str
+    labels: Dict[str, str]
+    value: float
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def _labels(names: Iterable[str], values: Iterable[Any], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+class Histogram:
+    """Bucketed latency histogram per label set, cumulative when rendered as Prometheus expects"""
+
+    def __init__(self, name: str, help: str, label_names: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = label_names
+        self.buckets = buckets
+        # label values -> [per-bucket counts (last one is +Inf), sum]
+        self._series: Dict[Tuple[str, ...], List[Any]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float, *label_values: str) -> None:
+        index = bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += seconds
+
+    def count(self, *label_values: str) -> int:
+        with self._lock:
+            series = self._series.get(label_values)
+            return sum(series[0]) if series else 0
+
+    def render(self) -> List[str]:
+        with self._lock:
+            series = {labels: (list(counts), total) for labels, (counts, total) in self._series.items()}
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for label_values, (counts, total) in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, label_values, le)} {cumulative}")
+            labels = _labels(self.label_names, label_values)
+            lines.append(f"{self.name}_sum{labels} {_number(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+class Metrics:
+    """
+    Process-wide stage timers and the collectors behind /metrics.
+
+    Every timed stage lands in one histogram labelled by stage and, when it
+    runs on behalf of a request that called start_request, in that request's
+    own timings too.
+    """
+
+    def __init__(self):
+        self.stage_seconds = Histogram(
+            f"{METRIC_PREFIX}stage_duration_seconds",
+            "Time spent in each stage of request handling",
+            ("stage",)
+        )
+        self.upstream_seconds = Histogram(
+            f"{METRIC_PREFIX}upstream_request_duration_seconds",
+            "Time to fetch and decode one upstream endpoint, retries and hedges included",
+            ("endpoint",)
+        )
+        self._collectors: List[Callable[[], Iterable[Sample]]] = []
+
+    def start_request(self) -> Dict[str, float]:
+        """Begin collecting stage timings for the current request"""
+        timings: Dict[str, float] = {}
+        _request_timings.set(timings)
+        return timings
+
+    def request_timings(self) -> Dict[str, float]:
+        """Stage timings recorded so far for the current request (empty outside one)"""
+        return _request_timings.get() or {}
+
+    def record(self, stage: str, seconds: float) -> None:
+        self.stage_seconds.observe(seconds, stage)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0.0) + seconds
+
+    def untracked(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Call fn without billing its stages to the current request, e.g. background work it triggered"""
+        token = _request_timings.set(None)
+        try:
+            return fn(*args)
+        finally:
+            _request_timings.reset(token)
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def timed(self, name: str) -> Callable:
+        """Decorator timing every call of a function or coroutine function as a stage"""
+        def decorate(fn: Callable) -> Callable:
+            if asyncio.iscoroutinefunction(fn):
+                @functools.wraps(fn)
+                async def timed_coroutine(*args, **kwargs):
+                    with self.stage(name):
+                        return await fn(*args, **kwargs)
+                return timed_coroutine
+
+            @functools.wraps(fn)
+            def timed_function(*args, **kwargs):
+                with self.stage(name):
+                    return fn(*args, **kwargs)
+            return timed_function
+        return decorate
+
+    def register(self, collector: Callable[[], Iterable[Sample]]) -> None:
+        """Add a callable reporting gauges and counters at scrape time"""
+        if collector not in self._collectors:
+            self._collectors.append(collector)
+
+    def render(self) -> str:
+        """Everything in the Prometheus text exposition format"""
+        lines = self.stage_seconds.render() + self.upstream_seconds.render()
+        # Samples of one metric must be contiguous, whichever collector reported them
+        families: Dict[str, Tuple[str, str, List[str]]] = {}
+        for collector in list(self._collectors):
+            try:
+                samples = list(collector())
+            except Exception as e:
+                logger.error(f"Error collecting metrics: {str(e)}")
+                continue
+            for sample in samples:
+                name = f"{METRIC_PREFIX}{sample.name}"
+                family = families.setdefault(name, (sample.kind, sample.help, []))
+                family[2].append(f"{name}{_labels(sample.labels.keys(), sample.labels.values())} {_number(sample.value)}")
+        for name, (kind, help, samples) in families.items():
+            lines.extend([f"# HELP {name} {help}", f"# TYPE {name} {kind}", *samples])
+        return "\n".join(lines) + "\n"
+
+metrics = Metrics()
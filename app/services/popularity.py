@@ -0,0 +1,67 @@
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional, Set
+from .events import EngineBuilt
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+class PopularityFeed:
+    """
+    Global and per-category popularity rankings taken from the latest engine
+    build. They need no upstream call or scoring, so they are the fallback
+    served when a request runs out of time.
+    """
+
+    def __init__(self, top_n: int = 50):
+        self.top_n = top_n
+        self.built_at: Optional[float] = None
+        self.served = 0
+        self._global: List[Dict[str, Any]] = []
+        self._categories: Dict[int, List[Dict[str, Any]]] = {}
+        self._refreshes: Set[asyncio.Future] = set()
+
+    def refresh(self, engine) -> None:
+        """Rank the most popular posts overall and per category"""
+        try:
+            overall = engine.rank_posts(limit=self.top_n)
+            categories = {
+                category_id: engine.rank_posts(category_id=category_id, limit=self.top_n)
+                for category_id in engine.category_posts
+            }
+            self._global, self._categories = overall, categories
+            self.built_at = time.time()
+            logger.info(f"Refreshed popularity feeds for {len(categories)} categories")
+        except Exception as e:
+            logger.error(f"Error refreshing popularity feeds: {str(e)}")
+
+    def handle_engine_built(self, event: EngineBuilt) -> None:
+        """Refresh from a new engine on a worker thread, or inline outside an event loop"""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            self.refresh(event.engine)
+            return
+        future = asyncio.ensure_future(asyncio.to_thread(metrics.untracked, self.refresh, event.engine))
+        self._refreshes.add(future)
+        future.add_done_callback(self._refreshes.discard)
+
+    @property
+    def ready(self) -> bool:
+        """Whether any engine build has produced the rankings yet"""
+        return self.built_at is not None
+
+    def get(self, category_id: Optional[int], limit: int) -> List[Dict[str, Any]]:
+        self.served += 1
+        if category_id is not None:
+            return self._categories.get(category_id, [])[:limit]
+        return self._global[:limit]
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "built_at": self.built_at,
+            "top_n": self.top_n,
+            "categories": len(self._categories),
+            "served": self.served
+        }
@@ -0,0 +1,301 @@
+import asyncio
+import cProfile
+import hmac
+import io
+import json
+import logging
+import os
+import pstats
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs
+
+logger = logging.getLogger(__name__)
+
+PROFILE_MODES = ("sampling", "deterministic")
+# Hard caps, whatever the settings say
+MAX_SAMPLE_RATE = 0.05
+MIN_INTERVAL_SECONDS = 0.0005
+MAX_SAMPLES = 100000
+TOP_FUNCTIONS = 25
+
+_PROFILE_ID = re.compile(r"^[A-Za-z0-9_-]+$")
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+class StackSampler:
+    """
+    Samples the stacks of every other thread at a fixed interval and counts
+    them in the collapsed format flamegraph tools read
+    (`thread;outer;...;inner count`).
+    """
+
+    def __init__(self, interval_seconds: float, max_samples: int = MAX_SAMPLES):
+        self.interval_seconds = max(interval_seconds, MIN_INTERVAL_SECONDS)
+        self.max_samples = max_samples
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval_seconds) and self.samples < self.max_samples:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_name(frame))
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def top_functions(self, limit: int = TOP_FUNCTIONS) -> Dict[str, List[Dict[str, Any]]]:
+        """Functions by samples on top of the stack (self) and anywhere in it (total)"""
+        own: Counter = Counter()
+        total: Counter = Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")[1:]
+            if not frames:
+                continue
+            own[frames[-1]] += count
+            for name in set(frames):
+                total[name] += count
+
+        def rows(counter: Counter) -> List[Dict[str, Any]]:
+            return [
+                {"function": name, "samples": count, "seconds": count * self.interval_seconds}
+                for name, count in counter.most_common(limit)
+            ]
+        return {"self": rows(own), "total": rows(total)}
+
+class RequestProfiler:
+    """
+    Profiles single requests on demand or at a capped sample rate.
+
+    On-demand profiling needs the admin token (X-Admin-Token) plus `?profile=1`
+    or an `X-Profile` header; `deterministic` instead of `1` adds cProfile's
+    exact call counts to the sampled stacks. At most one request is profiled
+    at a time, so concurrent requests show up in its stacks but never pile
+    profilers on top of each other. Each profile is written to `directory` as
+    `<id>.collapsed` and `<id>.json`, keeping only the newest `max_profiles`.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        admin_token: Optional[str] = None,
+        sample_rate: float = 0.0,
+        interval_seconds: float = 0.005,
+        max_profiles: int = 50
+    ):
+        self.directory = directory
+        self.admin_token = admin_token
+        self.sample_rate = min(max(sample_rate, 0.0), MAX_SAMPLE_RATE)
+        self.interval_seconds = max(interval_seconds, MIN_INTERVAL_SECONDS)
+        self.max_profiles = max(1, max_profiles)
+        self.profiles_written = 0
+        self.skipped_busy = 0
+        self._busy = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        """Whether any request can be profiled; if not, the middleware is not installed at all"""
+        return bool(self.admin_token) or self.sample_rate > 0
+
+    def is_admin(self, token: Optional[str]) -> bool:
+        return bool(self.admin_token) and token is not None and hmac.compare_digest(token, self.admin_token)
+
+    def requested_mode(self, query_string: bytes, headers: Dict[str, str]) -> Optional[str]:
+        """Profiling mode for a request, or None to run it unprofiled"""
+        switch = headers.get("x-profile")
+        if switch is None:
+            values = parse_qs(query_string.decode("latin-1")).get("profile")
+            switch = values[0] if values else None
+        if switch and switch != "0" and self.is_admin(headers.get("x-admin-token")):
+            return switch if switch in PROFILE_MODES else "sampling"
+        if self.sample_rate and random.random() < self.sample_rate:
+            return "sampling"
+        return None
+
+    def start(self, mode: str, path: str, query: str) -> Optional["ProfileSession"]:
+        """Begin a profile unless another one is running"""
+        if not self._busy.acquire(blocking=False):
+            self.skipped_busy += 1
+            return None
+        slug = re.sub(r"[^A-Za-z0-9]+", "-", path).strip("-") or "root"
+        profile_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{slug}-{uuid.uuid4().hex[:8]}"
+        return ProfileSession(self, profile_id, mode, path, query)
+
+    def _finish(self, session: "ProfileSession", summary: Dict[str, Any], collapsed: str) -> None:
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            base = os.path.join(self.directory, session.profile_id)
+            with open(f"{base}.collapsed", "w") as f:
+                f.write(collapsed)
+            with open(f"{base}.json", "w") as f:
+                json.dump(summary, f, indent=2)
+            self.profiles_written += 1
+            self._prune()
+            logger.info(f"Wrote profile {session.profile_id} ({summary['duration_seconds']:.3f}s, {summary['samples']} samples)")
+        except Exception as e:
+            logger.error(f"Error writing profile {session.profile_id}: {str(e)}")
+        finally:
+            self._busy.release()
+
+    def _prune(self) -> None:
+        """Delete the oldest profiles beyond max_profiles"""
+        summaries = sorted(
+            (entry for entry in os.scandir(self.directory) if entry.name.endswith(".json")),
+            key=lambda entry: entry.stat().st_mtime
+        )
+        for entry in summaries[:max(0, len(summaries) - self.max_profiles)]:
+            base = entry.path[:-len(".json")]
+            for path in (entry.path, f"{base}.collapsed"):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def load(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        """Summary of a stored profile"""
+        if not _PROFILE_ID.match(profile_id):
+            return None
+        path = os.path.join(self.directory, f"{profile_id}.json")
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "sample_rate": self.sample_rate,
+            "interval_seconds": self.interval_seconds,
+            "profiles_written": self.profiles_written,
+            "skipped_busy": self.skipped_busy
+        }
+
+class ProfileSession:
+    """One running profile: the stack sampler plus cProfile in deterministic mode"""
+
+    def __init__(self, profiler: RequestProfiler, profile_id: str, mode: str, path: str, query: str):
+        self.profiler = profiler
+        self.profile_id = profile_id
+        self.mode = mode
+        self.path = path
+        self.query = query
+        self.started_at = time.time()
+        self._started = time.perf_counter()
+        self.sampler = StackSampler(profiler.interval_seconds)
+        self.cprofile = cProfile.Profile() if mode == "deterministic" else None
+        self.sampler.start()
+        if self.cprofile is not None:
+            # cProfile only sees the thread it is enabled on: the event loop
+            try:
+                self.cprofile.enable()
+            except ValueError as e:
+                logger.warning(f"cProfile unavailable, sampling only: {str(e)}")
+                self.cprofile = None
+
+    def disable(self) -> None:
+        """Stop cProfile; must run on the thread that enabled it"""
+        if self.cprofile is not None:
+            self.cprofile.disable()
+
+    def finish(self, status_code: Optional[int]) -> None:
+        """Stop sampling and write the profile"""
+        self.disable()
+        self.sampler.stop()
+        summary = {
+            "id": self.profile_id,
+            "path": self.path,
+            "query": self.query,
+            "mode": self.mode,
+            "status_code": status_code,
+            "started_at": self.started_at,
+            "duration_seconds": time.perf_counter() - self._started,
+            "interval_seconds": self.sampler.interval_seconds,
+            "samples": self.sampler.samples,
+            "top_functions": self.sampler.top_functions()
+        }
+        if self.cprofile is not None:
+            summary["cprofile"] = _cprofile_summary(self.cprofile)
+        self.profiler._finish(self, summary, self.sampler.collapsed())
+
+def _cprofile_summary(profile: cProfile.Profile, limit: int = TOP_FUNCTIONS) -> List[Dict[str, Any]]:
+    """Functions by cumulative time with exact call counts"""
+    stats = pstats.Stats(profile, stream=io.StringIO())
+    rows: List[Tuple[float, Dict[str, Any]]] = []
+    for (filename, line, name), (_, calls, own_time, cumulative, _) in stats.stats.items():
+        rows.append((cumulative, {
+            "function": f"{name} ({os.path.basename(filename)}:{line})",
+            "calls": calls,
+            "self_seconds": own_time,
+            "cumulative_seconds": cumulative
+        }))
+    rows.sort(key=lambda row: row[0], reverse=True)
+    return [row for _, row in rows[:limit]]
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware profiling requests under the given path prefixes. The
+    profile covers the whole response, streamed bodies included, and its id
+    is returned in the X-Profile-Id header.
+    """
+
+    def __init__(self, app, profiler: RequestProfiler, paths: Tuple[str, ...] = ("/feed", "/interactions")):
+        self.app = app
+        self.profiler = profiler
+        self.paths = paths
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.paths):
+            await self.app(scope, receive, send)
+            return
+
+        headers = {key.decode("latin-1"): value.decode("latin-1") for key, value in scope["headers"]}
+        mode = self.profiler.requested_mode(scope.get("query_string", b""), headers)
+        session = self.profiler.start(mode, scope["path"], scope.get("query_string", b"").decode("latin-1")) if mode else None
+        if session is None:
+            await self.app(scope, receive, send)
+            return
+
+        status_code: Optional[int] = None
+
+        async def send_with_profile_id(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message = {
+                    **message,
+                    "headers": list(message.get("headers", [])) + [(b"x-profile-id", session.profile_id.encode())]
+                }
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            session.disable()
+            await asyncio.to_thread(session.finish, status_code)
@@ -1,25 +1,153 @@
 import logging
-from typing import Dict, List, Optional, Any
-from datetime import datetime
+import math
+import time
+import numpy as np
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Any, Set, Tuple
+from ..core.interactions import INTERACTION_WEIGHTS, interaction_weight
+from .metrics import metrics
 
 logger = logging.getLogger(__name__)
 
+# Engagement weight per post counter
+ENGAGEMENT_WEIGHTS = {
+    'view_count': 0.1,
+    'upvote_count': 1.5,
+    'share_count': 2.0,
+    'average_rating': 0.5
+}
+
+# Posts younger than this many days get a score boost, shrinking linearly with age
+RECENCY_WINDOW_DAYS = 30.0
+
+def engagement_score(post: Dict[str, Any]) -> float:
+    """Weighted engagement of one post, before mood and recency"""
+    return sum(float(post.get(field, 0)) * weight for field, weight in ENGAGEMENT_WEIGHTS.items())
+
+# Upstream datasets each group of derived structures is built from; nothing reads 'users'
+PROFILE_DATASETS = tuple(INTERACTION_WEIGHTS)
+POST_DATASETS = ('posts',)
+ENGINE_DATASETS = POST_DATASETS + PROFILE_DATASETS
+
+Profiles = Dict[str, Dict[str, float]]  # username -> post id -> weight
+
+@dataclass
+class EngineIndexes:
+    """Lookup structures derived from one upstream snapshot"""
+    user_profiles: Profiles
+    interacting_users: Set[str]  # usernames with upstream interactions
+    post_lookup: Dict[str, Dict[str, Any]]
+    post_categories: Dict[int, int]
+    category_posts: Dict[int, List[int]]  # category id -> positions in data['posts']
+
+def build_profiles(data: Dict[str, Any]) -> Tuple[Profiles, Set[str]]:
+    """
+    Weighted per-user post profiles and the usernames with interactions,
+    keyed by username.
+    """
+    profiles: Profiles = {}
+    usernames: Set[str] = set()
+    try:
+        for interaction_type, interactions in data['interactions'].items():
+            for interaction in interactions:
+                username = interaction.get('username')
+                if not username:
+                    continue
+                usernames.add(username)
+
+                post_id = str(interaction.get('post_id', ''))
+                if not post_id:
+                    continue
+
+                profile = profiles.setdefault(username, {})
+                weight = interaction_weight(interaction_type, interaction.get('rating'))
+                profile[post_id] = profile.get(post_id, 0) + weight
+    except Exception as e:
+        logger.error(f"Error building user profiles: {str(e)}")
+        return {}, usernames
+    return profiles, usernames
+
+def build_engine_indexes(data: Dict[str, Any], profiles: bool = True, posts: bool = True) -> EngineIndexes:
+    """Build the requested engine index groups; the others are left empty"""
+    indexes = EngineIndexes({}, set(), {}, {}, {})
+    if profiles:
+        indexes.user_profiles, indexes.interacting_users = build_profiles(data)
+    if posts:
+        for position, post in enumerate(data['posts']):
+            indexes.post_lookup[str(post['id'])] = post
+            category_id = (post.get('category') or {}).get('id')
+            if post.get('id') is not None and category_id is not None:
+                indexes.post_categories[int(post['id'])] = int(category_id)
+                indexes.category_posts.setdefault(int(category_id), []).append(position)
+    return indexes
+
+def reusable_indexes(data: Dict[str, Any], previous: Optional["RecommendationEngine"]) -> Tuple[bool, bool]:
+    """
+    Whether a previous engine's (profiles, posts) index groups can be reused:
+    they were built from the very same dataset lists.
+    """
+    if previous is None:
+        return False, False
+    interactions = data.get('interactions', {})
+    previous_interactions = previous.data.get('interactions', {})
+    profiles = interactions.keys() == previous_interactions.keys() and all(
+        interactions[interaction_type] is previous_interactions[interaction_type] for interaction_type in interactions
+    )
+    return profiles, data.get('posts') is previous.data.get('posts')
+
 class RecommendationEngine:
-    def __init__(self, data: Dict[str, Any]):
+    def __init__(
+        self,
+        data: Dict[str, Any],
+        local_scores: Optional[Iterable[Tuple[str, int, float]]] = None,
+        indexes: Optional[EngineIndexes] = None,
+        previous: Optional["RecommendationEngine"] = None
+    ):
+        """
+        Build an engine from an upstream snapshot. Given the previous engine,
+        index groups whose input datasets are unchanged are taken over from
+        it instead of being rebuilt; `indexes` then only needs the others.
+        Local scores only count towards personalization; without them the
+        previous engine's counts are kept.
+        """
         self.data = data
         logger.info("Initializing recommendation engine")
-        self.user_profiles = self._build_user_profiles()
-        self.post_lookup = {str(post['id']): post for post in self.data['posts']}
-        logger.info(f"Built lookup for {len(self.post_lookup)} posts")
+        reuse_profiles, reuse_posts = reusable_indexes(data, previous)
+        indexes = indexes or build_engine_indexes(data, profiles=not reuse_profiles, posts=not reuse_posts)
+
+        if reuse_profiles:
+            self.user_profiles = previous.user_profiles
+            self.interacting_users = previous.interacting_users
+            logger.info(f"Reused profiles for {len(self.user_profiles)} users")
+        else:
+            self.user_profiles = indexes.user_profiles
+            self.interacting_users = indexes.interacting_users
+            logger.info(f"Built profiles for {len(self.user_profiles)} users")
+
+        if local_scores is not None:
+            self.local_activity = self._count_local_scores(local_scores)
+        else:
+            self.local_activity = previous.local_activity if previous is not None else {}
+
+        if reuse_posts:
+            self.post_lookup = previous.post_lookup
+            self.post_categories = previous.post_categories
+            self.category_posts = previous.category_posts
+            self._score_features = previous._score_features
+            self._mood_scores = previous._mood_scores
+            logger.info(f"Reused lookup for {len(self.post_lookup)} posts")
+        else:
+            self.post_lookup = indexes.post_lookup
+            self.post_categories = indexes.post_categories
+            self.category_posts = indexes.category_posts
+            logger.info(f"Built lookup for {len(self.post_lookup)} posts")
+            # Vectorized scoring inputs, built on first use by rank_posts
+            self._score_features: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None
+            self._mood_scores: Dict[str, np.ndarray] = {}
 
     def is_personalized(self, username: str) -> bool:
         """Check if recommendations are personalized for the user"""
-        # Check if user has any interaction history
-        for interaction_type in self.data['interactions'].values():
-            for interaction in interaction_type:
-                if interaction.get('username') == username:
-                    return True
-        return False
+        return username in self.local_activity or username in self.interacting_users
 
     def get_recommendation_quality(self, recommendations: List[Dict]) -> float:
         """Calculate recommendation quality score"""
@@ -46,46 +174,81 @@ class RecommendationEngine:
             logger.error(f"Error calculating recommendation quality: {str(e)}")
             return 0.0
 
-    def _build_user_profiles(self) -> Dict[str, Dict[str, float]]:
-        """Build user profiles based on their interactions"""
-        user_profiles = {}
-        interaction_weights = {
-            'viewed': 1.0,
-            'liked': 3.0,
-            'inspired': 4.0,
-            'rated': 2.0
-        }
-
+    def _count_local_scores(self, local_scores: Iterable[Tuple[str, int, float]]) -> Dict[str, int]:
+        """
+        Count pre-aggregated local (username, post_id, score) rows per user.
+        Ranking does not read user profiles, so the scores are not merged
+        into them.
+        """
+        activity: Dict[str, int] = {}
         try:
-            for interaction_type, interactions in self.data['interactions'].items():
-                base_weight = interaction_weights.get(interaction_type, 1.0)
-                
-                for interaction in interactions:
-                    user_id = str(interaction.get('id', ''))
-                    post_id = str(interaction.get('post_id', ''))
-                    
-                    if not user_id or not post_id:
-                        continue
-                    
-                    if user_id not in user_profiles:
-                        user_profiles[user_id] = {}
-                    
-                    weight = base_weight
-                    if interaction_type == 'rated':
-                        rating = float(interaction.get('rating', 0)) / 100.0
-                        weight *= (1 + rating)
-                    
-                    if post_id not in user_profiles[user_id]:
-                        user_profiles[user_id][post_id] = 0
-                    
-                    user_profiles[user_id][post_id] += weight
-
-            logger.info(f"Built profiles for {len(user_profiles)} users")
-            return user_profiles
-            
+            for username, _, _ in local_scores:
+                activity[username] = activity.get(username, 0) + 1
+            logger.info(f"Counted {sum(activity.values())} local scores for {len(activity)} users")
         except Exception as e:
-            logger.error(f"Error building user profiles: {str(e)}")
-            return {}
+            logger.error(f"Error counting local scores: {str(e)}")
+        return activity
+
+    def _features(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Per-post engagement score, creation time (ms, NaN if unknown) and validity"""
+        if self._score_features is None:
+            posts = self.data['posts']
+            base = np.zeros(len(posts))
+            created = np.full(len(posts), np.nan)
+            valid = np.ones(len(posts), dtype=bool)
+            for position, post in enumerate(posts):
+                try:
+                    base[position] = engagement_score(post)
+                    if post.get('created_at'):
+                        created[position] = float(post['created_at'])
+                except Exception:
+                    # _calculate_post_score scores such posts 0.0
+                    valid[position] = False
+            self._score_features = (base, created, valid)
+        return self._score_features
+
+    def _mood_vector(self, mood: str) -> np.ndarray:
+        if mood not in self._mood_scores:
+            self._mood_scores[mood] = np.array(
+                [self._calculate_mood_score(post, mood) for post in self.data['posts']]
+            )
+        return self._mood_scores[mood]
+
+    def rank_posts(
+        self,
+        category_id: Optional[int] = None,
+        mood: Optional[str] = None,
+        limit: int = 10
+    ) -> List[Dict[str, Any]]:
+        """
+        Rank posts by _calculate_post_score, vectorized over the catalog. Post
+        scores do not depend on the user, so one ranking serves every user
+        asking for the same category and mood.
+        """
+        posts = self.data['posts']
+        if category_id is None:
+            positions = np.arange(len(posts))
+        else:
+            positions = np.asarray(self.category_posts.get(category_id, []), dtype=np.int64)
+        if not len(positions):
+            return []
+
+        with metrics.stage("scoring"):
+            base, created, valid = self._features()
+            scores = base[positions]
+            if mood:
+                scores = scores * (1 + self._mood_vector(mood)[positions])
+
+            created = created[positions]
+            dated = ~np.isnan(created)
+            days_old = np.floor((time.time() - created[dated] / 1000.0) / 86400.0)
+            scores[dated] *= 1 + np.maximum(0, RECENCY_WINDOW_DAYS - days_old) / RECENCY_WINDOW_DAYS
+            scores[~valid[positions]] = 0.0
+
+        with metrics.stage("top_k"):
+            # Stable sort keeps catalog order between equal scores, as sorted() does
+            top = np.argsort(-scores, kind="stable")[:limit]
+            return [posts[position] for position in positions[top]]
 
     def get_recommendations(
         self,
@@ -96,30 +259,12 @@ class RecommendationEngine:
     ) -> List[Dict[str, Any]]:
         """Get personalized recommendations for a user"""
         try:
-            available_posts = self.data['posts']
-            if not available_posts:
+            if not self.data['posts']:
                 logger.warning("No posts available for recommendations")
                 return []
 
-            # Filter by category if specified
-            if category_id is not None:
-                available_posts = [
-                    post for post in available_posts
-                    if post.get('category', {}).get('id') == category_id
-                ]
-                logger.info(f"Filtered to {len(available_posts)} posts for category {category_id}")
-
-            # Calculate scores
-            post_scores = []
-            for post in available_posts:
-                score = self._calculate_post_score(post, mood)
-                post_scores.append((post, score))
-
-            # Sort by score and return top recommendations
-            recommendations = sorted(post_scores, key=lambda x: x[1], reverse=True)
-            result = [post for post, _ in recommendations[:limit]]
-            
-            logger.info(f"Generated {len(result)} recommendations")
+            result = self.rank_posts(category_id=category_id, mood=mood, limit=limit)
+            logger.info("Generated %d recommendations", len(result))
             return result
 
         except Exception as e:
@@ -129,13 +274,8 @@ class RecommendationEngine:
     def _calculate_post_score(self, post: Dict[str, Any], mood: Optional[str] = None) -> float:
         """Calculate overall score for a post"""
         try:
-            base_score = (
-                float(post.get('view_count', 0)) * 0.1 +
-                float(post.get('upvote_count', 0)) * 1.5 +
-                float(post.get('share_count', 0)) * 2.0 +
-                float(post.get('average_rating', 0)) * 0.5
-            )
-            
+            base_score = engagement_score(post)
+
             # Apply mood modifier if specified
             if mood:
                 mood_score = self._calculate_mood_score(post, mood)
@@ -144,14 +284,13 @@ class RecommendationEngine:
             # Apply recency boost
             created_at = post.get('created_at')
             if created_at:
-                days_old = (datetime.now() - datetime.fromtimestamp(created_at / 1000.0)).days
-                recency_boost = max(0, (30 - days_old)) / 30.0
-                base_score *= (1 + recency_boost)
-            
+                days_old = math.floor((time.time() - created_at / 1000.0) / 86400.0)
+                base_score *= 1 + max(0, RECENCY_WINDOW_DAYS - days_old) / RECENCY_WINDOW_DAYS
+
             return base_score
             
         except Exception as e:
-            logger.error(f"Error calculating post score: {str(e)}")
+            logger.error("Error calculating post score: %s", e)
             return 0.0
 
     def _calculate_mood_score(self, post: Dict[str, Any], mood: str) -> float:
@@ -178,5 +317,5 @@ class RecommendationEngine:
             return mood_value
             
         except Exception as e:
-            logger.error(f"Error calculating mood score: {str(e)}")
+            logger.error("Error calculating mood score: %s", e)
             return 0.5
\ No newline at end of file
@@ -0,0 +1,231 @@
+import logging
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+BREAKER_STATES = ("closed", "open", "half_open")
+
+class UpstreamUnavailable(Exception):
+    """Raised when required upstream data cannot be fetched and no snapshot exists"""
+
+class UpstreamHTTPError(Exception):
+    """Non-2xx upstream response; only 5xx and 429 are worth retrying"""
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(message)
+        self.status_code = status_code
+
+    @property
+    def retryable(self) -> bool:
+        return self.status_code >= 500 or self.status_code == 429
+
+def is_retryable(error: BaseException) -> bool:
+    """Transport failures and server-side statuses are retried, client errors are not"""
+    if isinstance(error, UpstreamHTTPError):
+        return error.retryable
+    return isinstance(error, Exception)
+
+@dataclass
+class CachedResult:
+    """Last good parsed result of one endpoint and page, with the validators it was served with"""
+    result: List[Dict]
+    stored_at: float
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    content_hash: Optional[str] = None
+    size: int = 0
+
+    def conditional_headers(self) -> Dict[str, str]:
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+class LatencyTracker:
+    """Recent successful request latencies of one endpoint"""
+
+    def __init__(self, window: int = 200):
+        self._samples: deque = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, percent: float) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        index = min(len(samples) - 1, int(round(percent / 100.0 * (len(samples) - 1))))
+        return samples[index]
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures and fails fast until
+    `reset_seconds` have passed, then lets a single probe through (half-open):
+    its success closes the breaker, its failure opens it again.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_seconds: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self.times_opened = 0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Whether a request may be sent now"""
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_seconds:
+                self.state = "half_open"
+                self._probing = False
+            if self.state == "half_open" and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    @property
+    def probing(self) -> bool:
+        """Whether the request just allowed is the half-open probe"""
+        return self.state == "half_open" and self._probing
+
+    def release_probe(self) -> None:
+        """
+        End a probe that neither succeeded nor failed (cancelled, or a client
+        error) so the next request probes again instead of the breaker
+        waiting forever for its outcome.
+        """
+        with self._lock:
+            if self.state == "half_open":
+                self._probing = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != "closed":
+                logger.info("Upstream circuit closed")
+            self.state = "closed"
+            self.consecutive_failures = 0
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+                if self.state != "open":
+                    self.times_opened += 1
+                    logger.warning(f"Upstream circuit opened after {self.consecutive_failures} failures")
+                self.state = "open"
+                self.opened_at = time.monotonic()
+                self._probing = False
+
+class UpstreamEndpoint:
+    """Latency, breaker, last good snapshots and counters of one upstream endpoint"""
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.latency = LatencyTracker()
+        self.breaker = CircuitBreaker(failure_threshold, reset_seconds)
+        self.snapshots: Dict[Tuple, CachedResult] = {}
+        self.requests = 0
+        self.failures = 0
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.fast_failures = 0
+        self.snapshots_served = 0
+        self.not_modified = 0
+        self.unchanged = 0
+        self.bytes_received = 0
+        self.bytes_saved = 0
+
+    def remember(self, params_key: Tuple, result: List[Dict], **validators: Any) -> None:
+        self.snapshots[params_key] = CachedResult(result, time.time(), **validators)
+
+    def cached(self, params_key: Tuple) -> Optional[CachedResult]:
+        return self.snapshots.get(params_key)
+
+    def snapshot(self, params_key: Tuple) -> Optional[List[Dict]]:
+        """Last good result for these params, if any, served in place of a failed fetch"""
+        stored = self.snapshots.get(params_key)
+        if stored is None:
+            return None
+        self.snapshots_served += 1
+        return stored.result
+
+    def as_dict(self) -> Dict[str, Any]:
+        snapshot_times = [stored.stored_at for stored in self.snapshots.values()]
+        return {
+            'breaker_state': self.breaker.state,
+            'consecutive_failures': self.breaker.consecutive_failures,
+            'times_opened': self.breaker.times_opened,
+            'requests': self.requests,
+            'failures': self.failures,
+            'retries': self.retries,
+            'hedges': self.hedges,
+            'hedge_wins': self.hedge_wins,
+            'fast_failures': self.fast_failures,
+            'snapshots_served': self.snapshots_served,
+            'not_modified': self.not_modified,
+            'unchanged': self.unchanged,
+            'bytes_received': self.bytes_received,
+            'bytes_saved': self.bytes_saved,
+            'latency_samples': len(self.latency),
+            'p50_seconds': self.latency.percentile(50),
+            'p95_seconds': self.latency.percentile(95),
+            'snapshot_age_seconds': time.time() - max(snapshot_times) if snapshot_times else None
+        }
+
+class UpstreamRegistry:
+    """
+    Upstream health shared by every DataFetcher that is given it, so latency
+    history, breaker state and last good snapshots outlive a single request.
+    """
+
+    def __init__(
+        self,
+        max_retries: int = 2,
+        retry_backoff_seconds: float = 0.2,
+        hedge_percentile: float = 95.0,
+        hedge_min_samples: int = 20,
+        breaker_failure_threshold: int = 5,
+        breaker_reset_seconds: float = 30.0
+    ):
+        self.max_retries = max_retries
+        self.retry_backoff_seconds = retry_backoff_seconds
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.breaker_failure_threshold = breaker_failure_threshold
+        self.breaker_reset_seconds = breaker_reset_seconds
+        self._endpoints: Dict[str, UpstreamEndpoint] = {}
+        self._lock = threading.Lock()
+
+    def endpoint(self, url: str) -> UpstreamEndpoint:
+        with self._lock:
+            if url not in self._endpoints:
+                self._endpoints[url] = UpstreamEndpoint(self.breaker_failure_threshold, self.breaker_reset_seconds)
+            return self._endpoints[url]
+
+    def hedge_delay(self, endpoint: UpstreamEndpoint) -> Optional[float]:
+        """Seconds to wait before sending a duplicate request, once enough latencies are known"""
+        if len(endpoint.latency) < self.hedge_min_samples:
+            return None
+        return endpoint.latency.percentile(self.hedge_percentile)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            endpoints = dict(self._endpoints)
+        return {url: endpoint.as_dict() for url, endpoint in endpoints.items()}
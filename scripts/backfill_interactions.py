@@ -0,0 +1,69 @@
+import argparse
+import logging
+import os
+import httpx
+from sqlalchemy import create_engine
+from app.core.config import settings
+from app.database.backfill import InteractionBackfill, jsonl_batches, upstream_batches
+from app.database.migrations import migrate
+from app.database.storage import apply_sqlite_profile
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+UPSTREAM_TYPES = ['viewed', 'liked', 'inspired', 'rated']
+
+def backfill(database_url: str, jsonl_paths, upstream_types, chunk_size: int, defer_indexes: bool):
+    """Stream interactions from dumps and/or upstream pages into the local database"""
+    try:
+        engine = create_engine(database_url)
+        apply_sqlite_profile(engine)
+        with engine.begin() as connection:
+            migrate(connection)
+
+        loader = InteractionBackfill(engine, chunk_size=chunk_size)
+        sources = [(f"jsonl:{os.path.abspath(path)}", jsonl_batches(path)) for path in jsonl_paths]
+
+        client = httpx.Client(timeout=30.0, headers=settings.HEADERS) if upstream_types else None
+        sources.extend(
+            (f"upstream:{interaction_type}", upstream_batches(client, interaction_type))
+            for interaction_type in upstream_types
+        )
+
+        reports = []
+        try:
+            if defer_indexes:
+                with loader.deferred_indexes():
+                    reports = [loader.load(source, batches) for source, batches in sources]
+            else:
+                reports = [loader.load(source, batches) for source, batches in sources]
+        finally:
+            if client is not None:
+                client.close()
+
+        total_rows = sum(report.rows for report in reports)
+        total_seconds = sum(report.seconds for report in reports)
+        for report in reports:
+            logger.info(f"Backfill report: {report.as_dict()}")
+        logger.info(
+            f"Backfill completed | Rows: {total_rows} | "
+            f"Rows/s: {total_rows / total_seconds if total_seconds else 0:.0f}"
+        )
+
+    except Exception as e:
+        logger.error(f"Error backfilling interactions: {str(e)}")
+        raise
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk load historical interactions into the local database")
+    parser.add_argument("--jsonl", nargs="*", default=[], help="JSON-lines dumps, one interaction per line")
+    parser.add_argument("--upstream", nargs="*", choices=UPSTREAM_TYPES, default=[],
+                        help="Upstream interaction endpoints to page through")
+    parser.add_argument("--database-url", default="sqlite:///./data/recommendation_system.db")
+    parser.add_argument("--chunk-size", type=int, default=settings.BACKFILL_CHUNK_SIZE)
+    parser.add_argument("--keep-indexes", action="store_true",
+                        help="Maintain history indexes during the load instead of rebuilding them at the end")
+    args = parser.parse_args()
+    if not args.jsonl and not args.upstream:
+        parser.error("Nothing to load: pass --jsonl and/or --upstream")
+    backfill(args.database_url, args.jsonl, args.upstream, args.chunk_size, not args.keep_indexes)
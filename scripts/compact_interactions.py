@@ -0,0 +1,31 @@
+import argparse
+import logging
+from app.core.config import settings
+from app.database.compaction import RETENTION_POLICIES
+from app.database.database import DatabaseService
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def compact(retention_days: int, policy: str, archive_retention_months: int):
+    """Roll up old views, archive or drop old raw interactions and expire old archives"""
+    try:
+        db_service = DatabaseService()
+        stats = db_service.compact_interactions(
+            retention_days=retention_days,
+            policy=policy,
+            archive_retention_months=archive_retention_months
+        )
+        logger.info(f"Compaction completed successfully: {stats}")
+
+    except Exception as e:
+        logger.error(f"Error compacting interactions: {str(e)}")
+        raise
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compact raw interactions older than the retention window")
+    parser.add_argument("--retention-days", type=int, default=settings.INTERACTION_RAW_RETENTION_DAYS)
+    parser.add_argument("--policy", choices=RETENTION_POLICIES, default=settings.INTERACTION_RETENTION_POLICY)
+    parser.add_argument("--archive-retention-months", type=int, default=settings.INTERACTION_ARCHIVE_RETENTION_MONTHS)
+    args = parser.parse_args()
+    compact(args.retention_days, args.policy, args.archive_retention_months)
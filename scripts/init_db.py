@@ -1,6 +1,7 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker
-from app.database.models import Base
+from app.database.migrations import migrate
+from app.database.storage import apply_sqlite_profile
 import logging
 
 logging.basicConfig(level=logging.INFO)
@@ -12,17 +13,20 @@ def init_database():
         # Create database engine
         SQLALCHEMY_DATABASE_URL = "sqlite:///./data/recommendation_system.db"
         engine = create_engine(SQLALCHEMY_DATABASE_URL)
+        apply_sqlite_profile(engine)
         
-        # Create all tables
+        # Create all tables and bring older files up to the current schema
         logger.info("Creating database tables...")
-        Base.metadata.create_all(bind=engine)
+        with engine.begin() as connection:
+            version = migrate(connection)
+        logger.info(f"Database schema at version {version}")
         
         # Create session factory
         SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
         
         # Test database connection
         with SessionLocal() as session:
-            session.execute("SELECT 1")
+            session.execute(text("SELECT 1"))
             logger.info("Database connection test successful")
         
         logger.info("Database initialization completed successfully")
@@ -0,0 +1,68 @@
+import argparse
+import asyncio
+import logging
+from typing import Dict, List, Optional
+from app.core.config import settings
+from app.database.database import DatabaseService
+from app.services.cache_warmer import load_access_log
+from app.services.data_fetcher import DataFetcher
+from app.services.feed_store import Shape, most_active_users, precompute_feeds, write_feed_store
+from app.services.recommendation_engine import ENGINE_DATASETS, RecommendationEngine
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+async def fetch_data():
+    data_fetcher = DataFetcher()
+    try:
+        return await data_fetcher.get_all_data(datasets=ENGINE_DATASETS)
+    finally:
+        await data_fetcher.close()
+
+def plan_shapes(
+    engine: RecommendationEngine,
+    users: List[str],
+    heavy_users: int,
+    access_log: Optional[str]
+) -> Dict[str, List[Shape]]:
+    """
+    Every active user gets the unfiltered feed. The heaviest users also get
+    one feed per category plus every shape they requested in the access log.
+    """
+    logged: Dict[str, List[Shape]] = {}
+    if access_log:
+        shapes, _ = load_access_log(access_log, top_n=None)
+        for shape, _ in shapes:
+            logged.setdefault(shape.username, []).append((shape.category_id, shape.mood))
+
+    categories = [(category_id, None) for category_id in sorted(engine.category_posts)]
+    return {
+        username: [(None, None)] + (categories + logged.get(username, []) if rank < heavy_users else [])
+        for rank, username in enumerate(users)
+    }
+
+def precompute(path: str, users: int, heavy_users: int, top_n: int, access_log: Optional[str]):
+    """Rank feeds for the most active users and write them to the feed store"""
+    try:
+        data = asyncio.run(fetch_data())
+        local_scores = DatabaseService().iter_user_post_scores() if settings.ENGINE_LOCAL_SIGNALS else None
+        engine = RecommendationEngine(data, local_scores=local_scores)
+
+        user_shapes = plan_shapes(engine, most_active_users(engine, users), heavy_users, access_log)
+        stats = write_feed_store(path, engine, precompute_feeds(engine, user_shapes, top_n), top_n)
+        logger.info(f"Precomputed feeds for {len(user_shapes)} users: {stats}")
+
+    except Exception as e:
+        logger.error(f"Error precomputing feeds: {str(e)}")
+        raise
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute feeds for the most active users")
+    parser.add_argument("--path", default=settings.FEED_STORE_PATH or "./data/precomputed_feeds.db")
+    parser.add_argument("--users", type=int, default=settings.FEED_PRECOMPUTE_USERS)
+    parser.add_argument("--heavy-users", type=int, default=settings.FEED_PRECOMPUTE_HEAVY_USERS)
+    parser.add_argument("--top-n", type=int, default=settings.FEED_PRECOMPUTE_TOP_N)
+    parser.add_argument("--access-log", default=settings.CACHE_WARM_LOG_PATH,
+                        help="JSON-lines access log of feed requests, for heavy users' shapes")
+    args = parser.parse_args()
+    precompute(args.path, args.users, args.heavy_users, args.top_n, args.access_log)
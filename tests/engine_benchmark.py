@@ -0,0 +1,306 @@
+"""
+Benchmarks of RecommendationEngine at production scale on seeded synthetic
+data shaped like the upstream posts and interactions.
+
+    python -m tests.engine_benchmark                       # 1k and 100k posts
+    python -m tests.engine_benchmark --scales 1m           # 1M posts, 10M interactions (~10 GB RAM)
+    python -m tests.engine_benchmark --compare data/benchmarks/engine-old.json data/benchmarks/engine-new.json
+
+Each case is timed `--repeats` times; one more run under tracemalloc records
+its peak memory. Results go to a JSON file named after the current commit.
+"""
+import argparse
+import gc
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import numpy as np
+from app.services.metrics import metrics
+from app.core.interactions import INTERACTION_WEIGHTS
+from app.services.recommendation_engine import EngineIndexes, RecommendationEngine
+
+# name -> (posts, users, interactions)
+SCALES: Dict[str, Tuple[int, int, int]] = {
+    '1k': (1_000, 1_000, 50_000),
+    '100k': (100_000, 50_000, 1_000_000),
+    '1m': (1_000_000, 500_000, 10_000_000)
+}
+DEFAULT_SCALES = ('1k', '100k')
+
+CATEGORIES = [
+    (1, 'Funny'), (2, 'Vible'), (3, 'Motivation'), (4, 'Music'), (5, 'Travel'),
+    (6, 'Food'), (7, 'Tech'), (8, 'Sports'), (9, 'Education'), (10, 'Art')
+]
+EMOTIONS = ('happy', 'inspired', 'calm', 'focused', 'energetic', 'sad', 'excited', 'anxious')
+# Share of interactions per upstream type
+INTERACTION_MIX = {'viewed': 0.7, 'liked': 0.2, 'inspired': 0.05, 'rated': 0.05}
+# Category and mood used by the filtered scoring cases
+BENCH_CATEGORY = 2
+BENCH_MOOD = 'happy'
+DAY_MS = 86_400_000
+
+def _skewed(rng: np.random.Generator, size: int, upper: int, power: float = 3.0) -> np.ndarray:
+    """Integers in [0, upper), heavily skewed towards 0 like popularity and activity"""
+    return (rng.random(size) ** power * upper).astype(np.int64)
+
+def synthetic_engine_data(
+    posts: int,
+    users: int,
+    interactions: int,
+    seed: int = 42,
+    now_ms: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Engine input in the shape DataFetcher.get_all_data returns. Posts carry
+    the upstream summary fields (category, counters, post_summary.emotions,
+    created_at in ms over the last 60 days); interactions carry the fields
+    the fetcher keeps (id, username, post_id, rating). Low post ids are the
+    popular ones and low user ids the most active, so the same seed always
+    gives the same data apart from created_at following `now_ms`.
+    """
+    rng = np.random.default_rng(seed)
+    now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+
+    view_counts = (rng.pareto(1.2, posts) * 50).astype(np.int64)
+    upvotes = (view_counts * rng.random(posts) * 0.2).astype(np.int64)
+    shares = (upvotes * rng.random(posts) * 0.1).astype(np.int64)
+    rating_counts = (upvotes * rng.random(posts) * 0.3).astype(np.int64)
+    ratings = np.round(rng.uniform(1.0, 5.0, posts), 1)
+    created = now_ms - rng.integers(0, 60 * DAY_MS, posts)
+    categories = rng.integers(0, len(CATEGORIES), posts)
+    emotion_counts = rng.integers(0, 4, posts)
+    emotion_picks = rng.integers(0, len(EMOTIONS), (posts, 3))
+
+    category_objects = [{'id': category_id, 'name': name} for category_id, name in CATEGORIES]
+    post_list = []
+    for i, (views, up, share, rated, rating, created_at, category, emotion_count) in enumerate(zip(
+        view_counts.tolist(), upvotes.tolist(), shares.tolist(), rating_counts.tolist(),
+        ratings.tolist(), created.tolist(), categories.tolist(), emotion_counts.tolist()
+    )):
+        post_list.append({
+            'id': i + 1,
+            'title': f"Post {i + 1}",
+            'category': category_objects[category],
+            'view_count': views,
+            'upvote_count': up,
+            'share_count': share,
+            'rating_count': rated,
+            'average_rating': rating,
+            'created_at': created_at,
+            'post_summary': {'emotions': [EMOTIONS[e] for e in emotion_picks[i, :emotion_count].tolist()]}
+        })
+
+    usernames = [f"user_{i}" for i in range(users)]
+    data: Dict[str, Any] = {
+        'posts': post_list,
+        'users': [{'id': i, 'username': username} for i, username in enumerate(usernames)],
+        'interactions': {}
+    }
+    remaining = interactions
+    for n, interaction_type in enumerate(INTERACTION_WEIGHTS):
+        count = remaining if n == len(INTERACTION_WEIGHTS) - 1 else int(interactions * INTERACTION_MIX[interaction_type])
+        remaining -= count
+        user_ids = _skewed(rng, count, users).tolist()
+        post_ids = (_skewed(rng, count, posts) + 1).tolist()
+        if interaction_type == 'rated':
+            records = [
+                {'id': user_id, 'username': usernames[user_id], 'post_id': post_id, 'rating': rating}
+                for user_id, post_id, rating in zip(user_ids, post_ids, rng.integers(0, 101, count).tolist())
+            ]
+        else:
+            records = [
+                {'id': user_id, 'username': usernames[user_id], 'post_id': post_id}
+                for user_id, post_id in zip(user_ids, post_ids)
+            ]
+        data['interactions'][interaction_type] = records
+    return data
+
+def _measure(fn: Callable[[], Any], repeats: int, memory: bool) -> Tuple[Dict[str, Any], Any]:
+    """Time fn `repeats` times, then once more under tracemalloc; returns the stats and the last result"""
+    seconds: List[float] = []
+    stages: Dict[str, List[float]] = {}
+    result = None
+    for _ in range(repeats):
+        result = None
+        gc.collect()
+        timings = metrics.start_request()
+        started = time.perf_counter()
+        result = fn()
+        seconds.append(time.perf_counter() - started)
+        for stage, value in timings.items():
+            stages.setdefault(stage, []).append(value)
+
+    stats: Dict[str, Any] = {
+        'repeats': repeats,
+        'seconds': statistics.median(seconds),
+        'min_seconds': min(seconds),
+        'max_seconds': max(seconds)
+    }
+    if stages:
+        stats['stages'] = {stage: statistics.median(values) for stage, values in stages.items()}
+    if memory:
+        result = None
+        gc.collect()
+        tracemalloc.start()
+        try:
+            result = fn()
+            current, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        stats['peak_bytes'] = peak
+        stats['retained_bytes'] = current
+    return stats, result
+
+def benchmark_scale(
+    posts: int,
+    users: int,
+    interactions: int,
+    repeats: int = 3,
+    memory: bool = True,
+    seed: int = 42,
+    lookups: int = 100_000
+) -> Dict[str, Any]:
+    """Run every engine case at one scale"""
+    cases: Dict[str, Dict[str, Any]] = {}
+    cases['generate'], data = _measure(lambda: synthetic_engine_data(posts, users, interactions, seed), 1, memory)
+    cases['engine_build'], engine = _measure(lambda: RecommendationEngine(data), repeats, memory)
+
+    # The first ranking builds the per-post score features and the mood vector
+    cases['rank_posts_cold'], _ = _measure(
+        lambda: RecommendationEngine(data, indexes=_indexes_of(engine)).rank_posts(mood=BENCH_MOOD),
+        repeats, memory
+    )
+    shapes = {
+        'all': (None, None),
+        'category': (BENCH_CATEGORY, None),
+        'mood': (None, BENCH_MOOD),
+        'category_mood': (BENCH_CATEGORY, BENCH_MOOD)
+    }
+    for name, (category_id, mood) in shapes.items():
+        cases[f"rank_posts_{name}"], _ = _measure(
+            lambda: engine.rank_posts(category_id=category_id, mood=mood, limit=50), repeats, memory
+        )
+    for name, (category_id, mood) in shapes.items():
+        cases[f"get_recommendations_{name}"], _ = _measure(
+            lambda: engine.get_recommendations("user_0", category_id=category_id, mood=mood, limit=50), repeats, memory
+        )
+
+    # Half the names have interactions, half are unknown
+    names = [f"user_{i}" if i % 2 == 0 else f"unknown_{i}" for i in range(lookups)]
+    cases['is_personalized'], personalized = _measure(
+        lambda: sum(1 for name in names if engine.is_personalized(name)), repeats, False
+    )
+    cases['is_personalized'].update({'lookups': lookups, 'personalized': personalized,
+                                     'seconds_per_lookup': cases['is_personalized']['seconds'] / lookups})
+
+    return {
+        'posts': posts,
+        'users': users,
+        'interactions': interactions,
+        'personalized_users': len(engine.interacting_users),
+        'cases': cases
+    }
+
+def _indexes_of(engine: RecommendationEngine) -> EngineIndexes:
+    """An engine's indexes, so a fresh engine can be made without rebuilding them"""
+    return EngineIndexes(engine.user_profiles, engine.interacting_users, engine.post_lookup,
+                         engine.post_categories, engine.category_posts)
+
+def current_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip() or None
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_benchmarks(
+    scales: Dict[str, Tuple[int, int, int]],
+    repeats: int = 3,
+    memory: bool = True,
+    seed: int = 42
+) -> Dict[str, Any]:
+    """Benchmark every scale; the result is what gets written to the results file"""
+    results: Dict[str, Any] = {
+        'commit': current_commit(),
+        'started_at': time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'seed': seed,
+        'repeats': repeats,
+        'scales': {}
+    }
+    for name, (posts, users, interactions) in scales.items():
+        started = time.perf_counter()
+        results['scales'][name] = benchmark_scale(posts, users, interactions, repeats, memory, seed)
+        print(f"{name}: {posts} posts, {interactions} interactions in {time.perf_counter() - started:.1f}s",
+              file=sys.stderr)
+    return results
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Per scale and case: median seconds and peak memory of both runs, with their ratios"""
+    rows = []
+    for scale, result in current['scales'].items():
+        before = baseline['scales'].get(scale, {}).get('cases', {})
+        for case, stats in result['cases'].items():
+            old = before.get(case)
+            if old is None:
+                continue
+            row = {'scale': scale, 'case': case, 'seconds': stats['seconds'], 'baseline_seconds': old['seconds'],
+                   'ratio': stats['seconds'] / old['seconds'] if old['seconds'] else None}
+            if 'peak_bytes' in stats and 'peak_bytes' in old:
+                row['peak_bytes'] = stats['peak_bytes']
+                row['baseline_peak_bytes'] = old['peak_bytes']
+            rows.append(row)
+    return rows
+
+def _print_comparison(rows: List[Dict[str, Any]], baseline: str, current: str) -> None:
+    print(f"{'scale':<6} {'case':<32} {baseline[:12]:>12} {current[:12]:>12} {'ratio':>7}")
+    for row in rows:
+        ratio = f"{row['ratio']:.2f}x" if row['ratio'] is not None else "-"
+        print(f"{row['scale']:<6} {row['case']:<32} {row['baseline_seconds']:>11.4f}s {row['seconds']:>11.4f}s {ratio:>7}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark RecommendationEngine on synthetic data")
+    parser.add_argument("--scales", nargs="+", choices=sorted(SCALES), default=list(DEFAULT_SCALES))
+    parser.add_argument("--posts", type=int, help="custom scale instead of --scales")
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--interactions", type=int, default=100_000)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc runs")
+    parser.add_argument("--output", help="results file (default data/benchmarks/engine-<commit>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CURRENT"), help="compare two results files")
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0]) as f:
+            baseline = json.load(f)
+        with open(args.compare[1]) as f:
+            current = json.load(f)
+        _print_comparison(compare(baseline, current), baseline.get('commit') or 'baseline',
+                          current.get('commit') or 'current')
+        sys.exit(0)
+
+    # The engine logs every build and ranking at INFO
+    logging.basicConfig(level=logging.WARNING)
+    if args.posts:
+        scales = {'custom': (args.posts, args.users, args.interactions)}
+    else:
+        scales = {name: SCALES[name] for name in args.scales}
+    results = run_benchmarks(scales, repeats=args.repeats, memory=not args.no_memory, seed=args.seed)
+
+    output = args.output or os.path.join("data", "benchmarks", f"engine-{results['commit'] or 'local'}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Wrote {output}", file=sys.stderr)
@@ -4,6 +4,8 @@ from unittest.mock import patch
 from app.main import app
 import httpx
 import asyncio
+import json
+import uuid
 import logging
 from .test_fixtures import get_mock_data
 
@@ -90,4 +92,131 @@ def test_api_documentation(test_client):
     response = test_client.get("/openapi.json")
     assert response.status_code == 200
     schema = response.json()
-    assert "paths" in schema
\ No newline at end of file
+    assert "paths" in schema
+
+def read_ndjson(response):
+    return [json.loads(line) for line in response.text.splitlines() if line]
+
+def test_batch_feed_streams_ndjson(test_client):
+    """Test batch recommendations with shared and per-user filters"""
+    response = test_client.post("/feed/batch", json={
+        "users": ["test_user", "new_test_user", {"username": "test_user", "category_id": 2, "limit": 1}],
+        "limit": 5
+    })
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+
+    lines = read_ndjson(response)
+    feeds, summary = lines[:-1], lines[-1]["summary"]
+    assert len(feeds) == 3
+    assert (summary["users"], summary["shapes"], summary["errors"]) == (3, 2, 0)
+
+    personalized = {f["username"]: f["is_personalized"] for f in feeds}
+    assert personalized == {"test_user": True, "new_test_user": False}
+    filtered = [f for f in feeds if f["total_count"] == 1]
+    assert len(filtered) == 1
+    assert all(r["category"]["id"] == 2 for r in filtered[0]["recommendations"])
+
+    single = test_client.get("/feed", params={"username": "new_test_user", "limit": 5}).json()
+    unfiltered = next(f for f in feeds if f["username"] == "new_test_user")
+    assert unfiltered["recommendations"] == single["recommendations"]
+
+def test_batch_feed_isolates_user_errors(test_client):
+    """Test that one invalid user does not fail the rest of the batch"""
+    response = test_client.post("/feed/batch", json={
+        "users": [{"username": "bad_limit", "limit": 500}, "test_user"]
+    })
+    assert response.status_code == 200
+    lines = read_ndjson(response)
+    assert lines[0] == {"username": "bad_limit", "error": "limit must be between 1 and 50"}
+    assert lines[1]["username"] == "test_user"
+    assert "recommendations" in lines[1]
+    assert lines[-1]["summary"]["errors"] == 1
+
+    assert test_client.post("/feed/batch", json={"users": []}).status_code == 400
+
+def test_feed_streams_ndjson(test_client):
+    """Test the streaming feed mode: metadata first, then one post per line"""
+    params = {"username": "stream_user", "limit": 3}
+    headers = {"Accept": "application/x-ndjson"}
+    response = test_client.get("/feed", params=params, headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+
+    lines = read_ndjson(response)
+    metadata, posts, trailer = lines[0]["metadata"], lines[1:-1], lines[-1]
+    assert metadata["source"] == "online"
+    assert metadata["total_count"] == len(posts)
+    assert "processing_time_seconds" in trailer["performance_metrics"]
+    assert posts == test_client.get("/feed", params=params).json()["recommendations"]
+
+    cached = read_ndjson(test_client.get("/feed", params=params, headers=headers))
+    assert cached[0]["metadata"]["source"] == "cache"
+    assert cached[1:-1] == posts
+
+def test_bulk_interactions_json_array(test_client):
+    """Test bulk ingestion of a JSON array with per-item errors"""
+    username = f"bulk_{uuid.uuid4().hex[:8]}"
+    response = test_client.post("/interactions/bulk", json=[
+        {"username": username, "post_id": 1, "interaction_type": "view"},
+        {"username": username, "post_id": "2", "interaction_type": "rate", "rating": 4},
+        {"username": username, "post_id": 3, "interaction_type": "rate"},
+        {"username": username, "post_id": 4, "interaction_type": "shared"},
+        "not an object"
+    ])
+    assert response.status_code == 200
+    data = response.json()
+    assert (data["status"], data["accepted"], data["rejected"]) == ("partial", 2, 3)
+    assert [error["index"] for error in data["errors"]] == [2, 3, 4]
+    assert data["errors"][0]["message"] == "Rating is required for rate interactions"
+
+    history = test_client.get(f"/interactions/{username}").json()["history"]
+    assert sum(len(items) for items in history.values()) == 2
+
+def test_bulk_interactions_ndjson_stream(test_client):
+    """Test bulk ingestion of a streamed NDJSON body"""
+    username = f"bulk_{uuid.uuid4().hex[:8]}"
+    lines = [json.dumps({"username": username, "post_id": i, "interaction_type": "like"}) for i in range(50)]
+    payload = ("\n".join(lines[:25]) + "\n\n{broken\n" + "\n".join(lines[25:])).encode()
+    response = test_client.post(
+        "/interactions/bulk",
+        # 64-byte chunks split lines mid-record
+        content=iter([payload[i:i + 64] for i in range(0, len(payload), 64)]),
+        headers={"Content-Type": "application/x-ndjson"}
+    )
+    data = response.json()
+    assert (data["accepted"], data["rejected"]) == (50, 1)
+    assert data["errors"] == [{"index": 25, "message": "Invalid JSON"}]
+
+    assert test_client.post("/interactions/bulk", json={"username": username}).status_code == 400
+
+def test_bulk_interactions_reject_oversized_bodies(test_client):
+    """Test that bodies over the byte cap are refused, whether or not they declare a length"""
+    username = f"bulk_{uuid.uuid4().hex[:8]}"
+    records = [{"username": username, "post_id": i, "interaction_type": "view"} for i in range(20)]
+    payload = "\n".join(json.dumps(record) for record in records).encode()
+
+    with patch('app.api.interaction_routes.settings.INTERACTION_BULK_MAX_BYTES', 256):
+        declared = test_client.post("/interactions/bulk", json=records)
+        streamed = test_client.post(
+            "/interactions/bulk",
+            content=iter([payload[i:i + 64] for i in range(0, len(payload), 64)]),
+            headers={"Content-Type": "application/x-ndjson"}
+        )
+
+    assert declared.status_code == 413
+    assert streamed.status_code == 413
+    assert test_client.get(f"/interactions/{username}").json()["history"]["views"] == []
+
+def test_bulk_interactions_answer_503_when_ingestion_is_saturated(test_client):
+    """Test that bulk writes wait for the same queue capacity as single interactions"""
+    from app.api.interaction_routes import interaction_ingestor
+    username = f"bulk_{uuid.uuid4().hex[:8]}"
+
+    with patch.object(interaction_ingestor, 'reserved', interaction_ingestor.max_queue_size), \
+            patch.object(interaction_ingestor, 'enqueue_timeout_seconds', 0.01):
+        response = test_client.post("/interactions/bulk", json=[
+            {"username": username, "post_id": 1, "interaction_type": "view"}
+        ])
+
+    assert response.status_code == 503
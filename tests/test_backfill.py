@@ -0,0 +1,117 @@
+import json
+import httpx
+import pytest
+from sqlalchemy import create_engine, text
+from app.core.config import settings
+from app.database.backfill import InteractionBackfill, jsonl_batches, normalize_interaction, upstream_batches
+from app.database.migrations import migrate
+from app.core.interactions import INTERACTION_WEIGHTS
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'backfill.db'}")
+    with engine.begin() as connection:
+        migrate(connection)
+    yield engine
+    engine.dispose()
+
+def write_dump(path, records):
+    with open(path, "a") as dump:
+        for record in records:
+            dump.write(json.dumps(record) + "\n")
+
+def scalar(engine, sql):
+    with engine.connect() as connection:
+        return connection.execute(text(sql)).scalar()
+
+def test_normalize_upstream_interaction():
+    """Test that upstream type names and ratings are mapped to local ones"""
+    interaction = normalize_interaction({
+        "username": "u1", "post_id": "7", "interaction_type": "rated",
+        "rating": 80, "created_at": 1700000000000
+    })
+    assert interaction["interaction_type"] == "rate"
+    assert interaction["rating"] == 4.0
+    assert interaction["post_id"] == 7
+    assert interaction["created_at"].year == 2023
+
+    with pytest.raises(ValueError):
+        normalize_interaction({"username": "u1", "post_id": 7, "interaction_type": "shared"})
+
+def test_jsonl_backfill_and_resume(engine, tmp_path):
+    """Test loading a dump in chunks, then resuming only the lines appended since"""
+    dump = tmp_path / "interactions.jsonl"
+    write_dump(dump, [
+        {"username": f"user_{i % 3}", "post_id": i % 4, "interaction_type": "view"} for i in range(10)
+    ] + [
+        {"username": "user_0", "post_id": 0, "interaction_type": "like"},
+        {"username": "user_0", "post_id": 1, "interaction_type": "rate"}  # missing rating
+    ])
+
+    loader = InteractionBackfill(engine, chunk_size=4)
+    report = loader.load("dump", jsonl_batches(str(dump), batch_lines=2))
+    assert (report.rows, report.skipped, report.chunks) == (11, 1, 3)
+    assert report.rows_per_second > 0
+    assert scalar(engine, "SELECT COUNT(*) FROM users") == 3
+    assert scalar(engine, "SELECT score FROM user_post_aggregates WHERE post_id = 0 AND user_id = "
+                          "(SELECT id FROM users WHERE username = 'user_0')") == \
+        INTERACTION_WEIGHTS['viewed'] + INTERACTION_WEIGHTS['liked']
+
+    write_dump(dump, [{"username": "user_9", "post_id": 1, "interaction_type": "inspire"}])
+    resumed = InteractionBackfill(engine, chunk_size=4).load("dump", jsonl_batches(str(dump)))
+    assert resumed.resumed_from is not None
+    assert resumed.rows == 1
+    assert scalar(engine, "SELECT COUNT(*) FROM user_interactions") == 12
+    assert scalar(engine, "SELECT rows_loaded FROM backfill_checkpoints WHERE source = 'dump'") == 12
+
+def test_backfill_resumes_after_failure(engine):
+    """Test that a failed chunk rolls back and a rerun loads it exactly once"""
+    pages = [
+        [{"username": "user_a", "post_id": 1, "interaction_type": "view"}] * 3,
+        [{"username": "user_b", "post_id": 2, "interaction_type": "view"}] * 3
+    ]
+
+    def flaky_batches(position):
+        for page in range(int(position or 0), len(pages)):
+            if page == 1 and not flaky_batches.recovered:
+                raise ConnectionError("upstream went away")
+            yield pages[page], str(page + 1)
+    flaky_batches.recovered = False
+
+    loader = InteractionBackfill(engine, chunk_size=3)
+    with pytest.raises(ConnectionError):
+        loader.load("flaky", flaky_batches)
+    assert scalar(engine, "SELECT COUNT(*) FROM user_interactions") == 3
+
+    flaky_batches.recovered = True
+    report = loader.load("flaky", flaky_batches)
+    assert (report.resumed_from, report.rows) == ("1", 3)
+    assert scalar(engine, "SELECT SUM(view_count) FROM user_post_aggregates") == 6
+
+def test_deferred_indexes_are_rebuilt(engine):
+    """Test that history indexes are dropped for the load and rebuilt afterwards"""
+    def index_names():
+        with engine.connect() as connection:
+            return set(connection.execute(text(
+                "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'user_interactions'"
+            )).scalars())
+
+    loader = InteractionBackfill(engine)
+    with loader.deferred_indexes():
+        assert "ix_user_interactions_user_created" not in index_names()
+    assert {"ix_user_interactions_user_created", "ix_user_interactions_post_type"} <= index_names()
+
+def test_upstream_pages(engine):
+    """Test paging through an upstream endpoint until a short page"""
+    def handler(request):
+        page = int(request.url.params["page"])
+        records = [{"username": f"up_{page}_{i}", "post_id": i} for i in range(2 if page < 3 else 1)]
+        return httpx.Response(200, json={"posts": records})
+
+    client = httpx.Client(transport=httpx.MockTransport(handler), headers=settings.HEADERS)
+    report = InteractionBackfill(engine).load("upstream:liked", upstream_batches(client, "liked", page_size=2))
+    client.close()
+
+    assert report.rows == 5
+    assert scalar(engine, "SELECT position FROM backfill_checkpoints") == "4"
+    assert scalar(engine, "SELECT COUNT(*) FROM user_interactions WHERE interaction_type = 'like'") == 5
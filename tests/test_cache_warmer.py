@@ -0,0 +1,89 @@
+import json
+import pytest
+from unittest.mock import patch
+from app.api.routes import feed_warmer, posts_cache
+from app.services.cache_warmer import CacheWarmer, FeedShape, load_access_log
+from app.services.events import EngineBuilt, event_bus
+from app.services.feed_cache import feed_cache_key
+from app.services.recommendation_engine import RecommendationEngine
+from .test_fixtures import get_mock_data
+
+@pytest.fixture
+def access_log(tmp_path):
+    """Write a small access log in JSON-lines format"""
+    records = (
+        [{"username": "heavy_user"}] * 5
+        + [{"username": "heavy_user", "category_id": 2, "mood": "happy", "limit": 5}] * 3
+        + [{"params": {"username": "light_user"}}]
+        + [{"request_id": "not-a-feed-request"}]
+    )
+    path = tmp_path / "access.jsonl"
+    path.write_text("\n".join(json.dumps(r) for r in records) + "\nnot json\n")
+    return str(path)
+
+def test_load_access_log_ranks_shapes(access_log):
+    """Test that shapes are counted and ranked by frequency"""
+    shapes, total = load_access_log(access_log, top_n=2)
+
+    assert total == 9
+    assert shapes == [
+        (FeedShape("heavy_user"), 5),
+        (FeedShape("heavy_user", 2, "happy", 5), 3)
+    ]
+
+@pytest.mark.asyncio
+async def test_warm_reports_coverage(access_log):
+    """Test that warming reports progress and coverage"""
+    warmed = []
+
+    async def load_context():
+        return "engine"
+
+    warmer = CacheWarmer(access_log, load_context, lambda ctx, shape, refresh: warmed.append(shape) or True, top_n=2)
+    report = await warmer.warm()
+
+    assert report.stopped_reason == "completed"
+    assert report.warmed == 2
+    assert report.coverage == pytest.approx(8 / 9)
+    assert not report.running
+
+@pytest.mark.asyncio
+async def test_warm_stops_at_time_budget(access_log):
+    """Test that warming stops once its budget is spent"""
+    async def load_context():
+        return None
+
+    warmer = CacheWarmer(access_log, load_context, lambda ctx, shape, refresh: True, time_budget_seconds=0)
+    report = await warmer.warm()
+
+    assert report.stopped_reason == "time_budget"
+    assert report.warmed == 0
+
+@pytest.mark.asyncio
+async def test_feed_warmer_populates_feed_cache(access_log):
+    """Test warming the real feed cache from an access log"""
+    posts_cache.clear()
+    with patch('app.services.data_fetcher.DataFetcher.get_all_data') as mock_get_data, \
+            patch.object(feed_warmer, 'log_path', access_log):
+        mock_get_data.return_value = get_mock_data()
+        report = await feed_warmer.schedule()
+
+    assert report.warmed == 3
+    assert feed_cache_key("heavy_user", None, None, 10) in posts_cache
+    assert feed_cache_key("heavy_user", 2, "happy", 5) in posts_cache
+
+@pytest.mark.asyncio
+async def test_engine_built_refreshes_cached_feeds(access_log):
+    """Test that publishing EngineBuilt re-ranks feeds already in the cache"""
+    posts_cache.clear()
+    stale_key = feed_cache_key("heavy_user", None, None, 10)
+    posts_cache[stale_key] = {"recommendations": [], "stale": True}
+    engine = RecommendationEngine(get_mock_data())
+
+    with patch.object(feed_warmer, 'log_path', access_log):
+        event_bus.publish(EngineBuilt(engine=engine))
+        report = await feed_warmer._task
+
+    assert report.warmed == 3
+    assert "stale" not in posts_cache[stale_key]
+    assert posts_cache[stale_key]["recommendations"]
@@ -0,0 +1,155 @@
+import asyncio
+import threading
+import time
+import pytest
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services.compute_pool import ComputePool, LoopLagMonitor
+from app.services.recommendation_engine import RecommendationEngine
+from .test_fixtures import get_mock_data
+
+def synthetic_data(posts: int, users: int, interactions: int):
+    """Snapshot with several categories and users interacting across types"""
+    types = ['viewed', 'liked', 'inspired', 'rated']
+    return {
+        'posts': [{'id': i, 'category': {'id': i % 5}, 'view_count': i} for i in range(posts)],
+        'users': [],
+        'interactions': {
+            interaction_type: [
+                {'id': (i * 7 + t) % users, 'username': f"user_{(i * 7 + t) % users}",
+                 'post_id': (i * 13) % posts, 'rating': 50}
+                for i in range(t, interactions, len(types))
+            ]
+            for t, interaction_type in enumerate(types)
+        }
+    }
+
+def busy(seconds: float) -> float:
+    """Pure-Python CPU work for the given wall-clock time"""
+    end = time.perf_counter() + seconds
+    spins = 0
+    while time.perf_counter() < end:
+        spins += 1
+    return spins
+
+@pytest.mark.asyncio
+async def test_small_builds_stay_in_process():
+    """Test that tiny engine builds run inline"""
+    pool = ComputePool(build_offload_min_items=1000)
+    engine = await pool.build_engine(get_mock_data())
+    assert engine.post_lookup
+    assert pool.build_stats.inline == 1
+    assert pool.build_stats.submitted == 0
+
+@pytest.mark.asyncio
+async def test_engine_build_on_build_thread():
+    """Test that a large build runs on the build thread and matches an inline build"""
+    data = synthetic_data(posts=50, users=40, interactions=400)
+    pool = ComputePool(build_offload_min_items=0)
+    build_threads = []
+    original = RecommendationEngine.__init__
+
+    def recording_init(self, *args, **kwargs):
+        build_threads.append(threading.current_thread().name)
+        original(self, *args, **kwargs)
+
+    try:
+        with patch.object(RecommendationEngine, '__init__', recording_init):
+            engine = await pool.build_engine(data, local_scores=[("local_user", 1, 2.0)])
+    finally:
+        pool.shutdown()
+
+    expected = RecommendationEngine(data, local_scores=[("local_user", 1, 2.0)])
+    assert engine.user_profiles == expected.user_profiles
+    assert engine.local_activity == expected.local_activity
+    assert engine.post_lookup == expected.post_lookup
+    assert engine.category_posts == expected.category_posts
+    assert engine.is_personalized("local_user")
+    assert build_threads[0].startswith("engine-build")
+    assert pool.build_stats.completed == 1
+    assert pool.build_stats.avg_wait_seconds is not None
+
+@pytest.mark.asyncio
+async def test_cheap_scoring_runs_inline_once_measured():
+    """Test that scoring moves inline once it is measured under the threshold"""
+    pool = ComputePool(scoring_inline_threshold_ms=50.0)
+    engine = await pool.build_engine(get_mock_data())
+
+    first = await pool.score(engine, lambda: threading.current_thread().name)
+    second = await pool.score(engine, lambda: threading.current_thread().name)
+    pool.shutdown()
+
+    assert first.startswith("feed-scoring")
+    assert second == threading.current_thread().name
+    assert (pool.scoring_stats.completed, pool.scoring_stats.inline) == (1, 1)
+
+@pytest.mark.asyncio
+async def test_scoring_queue_depth_and_wait_time():
+    """Test that jobs beyond the worker count are reported as queued"""
+    pool = ComputePool(scoring_threads=1, scoring_inline_threshold_ms=0.0)
+    engine = await pool.build_engine(get_mock_data())
+    release = threading.Event()
+
+    jobs = [asyncio.ensure_future(pool.score(engine, release.wait)) for _ in range(3)]
+    await asyncio.sleep(0.05)
+    assert pool.stats()["scoring"]["queue_depth"] == 2
+
+    release.set()
+    await asyncio.gather(*jobs)
+    pool.shutdown()
+    stats = pool.stats()["scoring"]
+    assert stats["queue_depth"] == 0
+    assert stats["completed"] == 3
+    assert stats["max_wait_seconds"] >= 0.04
+
+@pytest.mark.asyncio
+async def test_offloaded_scoring_keeps_event_loop_responsive():
+    """Test that expensive scoring does not stall the event loop"""
+    pool = ComputePool(scoring_inline_threshold_ms=0.0)
+    engine = await pool.build_engine(get_mock_data())
+    monitor = LoopLagMonitor(interval_seconds=0.005)
+    monitor.start()
+
+    await pool.score(engine, busy, 0.3)
+    await monitor.stop()
+    pool.shutdown()
+
+    assert monitor.samples > 10
+    assert monitor.max_lag_seconds < 0.1
+
+@pytest.mark.asyncio
+async def test_build_thread_keeps_event_loop_responsive():
+    """Test that an engine build on the build thread lags the loop far less than the same build inline"""
+    data = synthetic_data(posts=50000, users=2000, interactions=150000)
+
+    async def max_lag_during_build(pool):
+        monitor = LoopLagMonitor(interval_seconds=0.005)
+        monitor.start()
+        await asyncio.sleep(0.02)
+        started = time.perf_counter()
+        await pool.build_engine(data)
+        elapsed = time.perf_counter() - started
+        # Let the monitor record its overdue wake-up before stopping it
+        await asyncio.sleep(0.02)
+        await monitor.stop()
+        pool.shutdown()
+        return monitor.max_lag_seconds, elapsed
+
+    inline_lag, inline_seconds = await max_lag_during_build(ComputePool(build_offload_min_items=10 ** 9))
+    offloaded_lag, _ = await max_lag_during_build(ComputePool(build_offload_min_items=0))
+
+    # Inline, the loop waits out the whole build; on the build thread only a GIL switch interval or so
+    assert inline_lag >= inline_seconds / 2
+    assert offloaded_lag < inline_lag / 3
+
+def test_compute_stats_endpoint():
+    """Test the worker pool and event-loop lag statistics endpoint"""
+    with TestClient(app) as client:
+        response = client.get("/compute/stats")
+
+    assert response.status_code == 200
+    data = response.json()
+    assert {"engine_builds", "scoring", "event_loop_lag"} <= set(data)
+    assert "queue_depth" in data["scoring"]
+    assert "avg_wait_seconds" in data["engine_builds"]
@@ -1,18 +1,30 @@
+import asyncio
+import json
+import time
 import pytest
 import httpx
 from unittest.mock import Mock, patch
 from app.services.data_fetcher import DataFetcher
+from app.services.upstream import UpstreamRegistry, UpstreamUnavailable
 from app.core.config import settings
+from .upstream_stub import UpstreamStub, measure, stub_fetcher
 
 class MockResponse:
     def __init__(self, data, status_code=200):
         self.data = data
         self.status_code = status_code
         self.text = str(data)
+        self.headers = {}
 
     def json(self):
         return self.data
 
+    async def aiter_bytes(self):
+        yield json.dumps(self.data).encode()
+
+    async def aclose(self):
+        pass
+
     def raise_for_status(self):
         if self.status_code >= 400:
             raise httpx.HTTPError(f"HTTP Error: {self.status_code}")
@@ -21,7 +33,7 @@ class MockResponse:
 async def test_fetch_posts_data():
     """Test fetching posts data"""
     mock_data = {"posts": [{"id": 1}, {"id": 2}]}
-    with patch('httpx.AsyncClient.get') as mock_get:
+    with patch('httpx.AsyncClient.send') as mock_get:
         mock_get.return_value = MockResponse(mock_data)
         
         data_fetcher = DataFetcher()
@@ -36,7 +48,7 @@ async def test_fetch_posts_data():
 async def test_get_all_data():
     """Test getting all data types"""
     mock_data = {"data": [{"id": 1}]}
-    with patch('httpx.AsyncClient.get') as mock_get:
+    with patch('httpx.AsyncClient.send') as mock_get:
         mock_get.return_value = MockResponse(mock_data)
         
         data_fetcher = DataFetcher()
@@ -51,7 +63,7 @@ async def test_get_all_data():
 @pytest.mark.asyncio
 async def test_error_handling():
     """Test error handling when fetching data"""
-    with patch('httpx.AsyncClient.get') as mock_get:
+    with patch('httpx.AsyncClient.send') as mock_get:
         mock_get.side_effect = Exception("API Error")
         
         data_fetcher = DataFetcher()
@@ -69,7 +81,7 @@ async def test_pagination_handling():
         MockResponse({"data": []})
     ]
     
-    with patch('httpx.AsyncClient.get') as mock_get:
+    with patch('httpx.AsyncClient.send') as mock_get:
         mock_get.side_effect = mock_responses
         
         data_fetcher = DataFetcher()
@@ -90,7 +102,7 @@ async def test_response_processing():
     """Test processing of different response formats"""
     # Test list response
     mock_data = [{"id": 1}, {"id": 2}]
-    with patch('httpx.AsyncClient.get') as mock_get:
+    with patch('httpx.AsyncClient.send') as mock_get:
         mock_get.return_value = MockResponse(mock_data)
         
         data_fetcher = DataFetcher()
@@ -124,7 +136,7 @@ async def test_response_formats():
     params = {"page_size": 1000}
     
     for response_data, expected_length in test_cases:
-        with patch('httpx.AsyncClient.get') as mock_get:
+        with patch('httpx.AsyncClient.send') as mock_get:
             mock_get.return_value = MockResponse(response_data)
             data = await data_fetcher.fetch_data("/test/endpoint", params)
             assert len(data) == expected_length
@@ -138,8 +150,214 @@ async def test_error_response_codes():
     params = {"page_size": 1000}
     
     for code in error_codes:
-        with patch('httpx.AsyncClient.get') as mock_get:
+        with patch('httpx.AsyncClient.send') as mock_get:
             mock_get.return_value = MockResponse({"error": "Test error"}, status_code=code)
             data = await data_fetcher.fetch_data("/test/endpoint", params)
             assert isinstance(data, list)
-            assert len(data) == 0
\ No newline at end of file
+            assert len(data) == 0
+
+def fetcher_with(handler, **registry_options):
+    """DataFetcher whose requests go to an in-process handler"""
+    options = {'retry_backoff_seconds': 0.001, **registry_options}
+    data_fetcher = DataFetcher(upstream=UpstreamRegistry(**options))
+    data_fetcher.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return data_fetcher
+
+@pytest.mark.asyncio
+async def test_transient_errors_are_retried():
+    """Test that a 503 is retried and the retry's result returned"""
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        if len(calls) == 1:
+            return httpx.Response(503)
+        return httpx.Response(200, json={"data": [{"id": 1}]})
+
+    data_fetcher = fetcher_with(handler)
+    data = await data_fetcher.fetch_data("http://upstream/test", {})
+    await data_fetcher.close()
+
+    assert data == [{"id": 1}]
+    stats = data_fetcher.upstream.stats()["http://upstream/test"]
+    assert (stats["retries"], stats["failures"], stats["breaker_state"]) == (1, 0, "closed")
+
+@pytest.mark.asyncio
+async def test_client_errors_are_not_retried():
+    """Test that a 404 fails immediately without counting against the breaker"""
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(404)
+
+    data_fetcher = fetcher_with(handler, breaker_failure_threshold=1)
+    assert await data_fetcher.fetch_data("http://upstream/test", {}) == []
+    await data_fetcher.close()
+
+    assert len(calls) == 1
+    assert data_fetcher.upstream.endpoint("http://upstream/test").breaker.state == "closed"
+
+@pytest.mark.asyncio
+async def test_circuit_breaker_serves_last_good_snapshot():
+    """Test failing fast with the last good result while the upstream is down"""
+    healthy = True
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        if healthy:
+            return httpx.Response(200, json={"data": [{"id": 7}]})
+        return httpx.Response(500)
+
+    data_fetcher = fetcher_with(handler, max_retries=0, breaker_failure_threshold=2, breaker_reset_seconds=0.05)
+    assert await data_fetcher.fetch_data("http://upstream/test", {}) == [{"id": 7}]
+
+    healthy = False
+    for _ in range(2):
+        assert await data_fetcher.fetch_data("http://upstream/test", {}) == [{"id": 7}]
+    endpoint = data_fetcher.upstream.endpoint("http://upstream/test")
+    assert endpoint.breaker.state == "open"
+
+    sent = len(calls)
+    assert await data_fetcher.fetch_data("http://upstream/test", {}) == [{"id": 7}]
+    assert len(calls) == sent
+    assert endpoint.fast_failures == 1
+
+    healthy = True
+    await asyncio.sleep(0.06)
+    assert await data_fetcher.fetch_data("http://upstream/test", {}) == [{"id": 7}]
+    assert endpoint.breaker.state == "closed"
+    await data_fetcher.close()
+
+@pytest.mark.asyncio
+async def test_cancelled_or_rejected_probe_releases_the_breaker():
+    """Test that a half-open probe that is cancelled or gets a 4xx lets the next request probe"""
+    mode = "down"
+    calls = []
+
+    async def handler(request):
+        calls.append(request)
+        if mode == "slow":
+            await asyncio.sleep(1.0)
+        if mode == "down":
+            return httpx.Response(500)
+        if mode == "rejected":
+            return httpx.Response(404)
+        return httpx.Response(200, json={"data": [{"id": 7}]})
+
+    data_fetcher = fetcher_with(handler, max_retries=0, breaker_failure_threshold=1, breaker_reset_seconds=0.01)
+    endpoint = data_fetcher.upstream.endpoint("http://upstream/test")
+    await data_fetcher.fetch_data("http://upstream/test", {})
+    assert endpoint.breaker.state == "open"
+
+    mode = "slow"
+    await asyncio.sleep(0.02)
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(data_fetcher.fetch_data("http://upstream/test", {}), timeout=0.05)
+    assert (endpoint.breaker.state, endpoint.breaker.probing) == ("half_open", False)
+
+    mode = "rejected"
+    assert await data_fetcher.fetch_data("http://upstream/test", {}) == []
+    assert (endpoint.breaker.state, endpoint.breaker.probing) == ("half_open", False)
+
+    mode = "healthy"
+    sent = len(calls)
+    assert await data_fetcher.fetch_data("http://upstream/test", {}) == [{"id": 7}]
+    assert len(calls) == sent + 1
+    assert endpoint.breaker.state == "closed"
+    await data_fetcher.close()
+
+@pytest.mark.asyncio
+async def test_slow_request_is_hedged():
+    """Test that a duplicate request is sent past the latency percentile and wins"""
+    calls = []
+
+    async def handler(request):
+        calls.append(request)
+        if len(calls) == 1:
+            await asyncio.sleep(1.0)
+            return httpx.Response(200, json={"data": [{"id": "slow"}]})
+        return httpx.Response(200, json={"data": [{"id": "hedge"}]})
+
+    data_fetcher = fetcher_with(handler, hedge_min_samples=3)
+    endpoint = data_fetcher.upstream.endpoint("http://upstream/test")
+    for _ in range(3):
+        endpoint.latency.record(0.01)
+
+    started = time.perf_counter()
+    data = await data_fetcher.fetch_data("http://upstream/test", {})
+    elapsed = time.perf_counter() - started
+    await data_fetcher.close()
+
+    assert data == [{"id": "hedge"}]
+    assert (endpoint.hedges, endpoint.hedge_wins) == (1, 1)
+    assert elapsed < 0.5
+
+@pytest.mark.asyncio
+async def test_missing_posts_raise_instead_of_empty_data():
+    """Test that get_all_data does not return an empty catalog when posts are unavailable"""
+    data_fetcher = fetcher_with(lambda request: httpx.Response(502), max_retries=0)
+    with pytest.raises(UpstreamUnavailable):
+        await data_fetcher.get_all_data()
+    await data_fetcher.close()
+
+@pytest.mark.asyncio
+async def test_not_modified_returns_previous_result():
+    """Test that a 304 answer to the sent validators returns the previous list unparsed"""
+    stub = UpstreamStub({'posts': [{"id": 1}, {"id": 2}]})
+    data_fetcher = stub_fetcher(stub)
+    url = f"{settings.BASE_URL}{settings.ENDPOINTS['posts']}"
+
+    first = await data_fetcher.fetch_data(url, {"page": 1})
+    with patch('app.services.data_fetcher.ItemStreamDecoder.feed', side_effect=AssertionError("decoded a 304")):
+        second = await data_fetcher.fetch_data(url, {"page": 1})
+    stub.update('posts', [{"id": 3}])
+    third = await data_fetcher.fetch_data(url, {"page": 1})
+    await data_fetcher.close()
+
+    endpoint = data_fetcher.upstream.endpoint(url)
+    assert second is first
+    assert third == [{"id": 3}]
+    assert stub.not_modified['posts'] == endpoint.not_modified == 1
+    assert endpoint.bytes_saved > 0
+
+@pytest.mark.asyncio
+async def test_unchanged_body_without_validators_is_not_reparsed():
+    """Test that an upstream without validators is recognised by the body hash"""
+    stub = UpstreamStub({'posts': [{"id": 1}]}, validators=False)
+    data_fetcher = stub_fetcher(stub)
+    url = f"{settings.BASE_URL}{settings.ENDPOINTS['posts']}"
+
+    first = await data_fetcher.fetch_data(url, {})
+    second = await data_fetcher.fetch_data(url, {})
+    other_page = await data_fetcher.fetch_data(url, {"page": 2})
+    await data_fetcher.close()
+
+    endpoint = data_fetcher.upstream.endpoint(url)
+    assert second is first
+    assert other_page is not first
+    assert (endpoint.not_modified, endpoint.unchanged) == (0, 1)
+
+@pytest.mark.asyncio
+async def test_conditional_refreshes_skip_rebuilds():
+    """Test that refreshes of unchanged datasets neither download them nor rebuild the engine"""
+    report = await measure(rounds=6, change_every=3, posts=50, users=10, interactions=200)
+
+    assert report['engine'] == {'rebuilds': 2, 'rebuilds_skipped': 4}
+    assert report['stub']['not_modified'] == report['fetcher']['not_modified'] == 24
+    assert report['stub']['bytes_saved'] > report['stub']['bytes_sent']
+
+@pytest.mark.asyncio
+async def test_interactions_keep_only_engine_fields():
+    """Test that interaction records are trimmed to the fields the engine reads while decoding"""
+    def handler(request):
+        item = {"id": 1, "username": "a", "post_id": 2, "rating": 50, "bio": "x" * 100, "picture_url": "p"}
+        return httpx.Response(200, json={"posts": [item]})
+
+    data_fetcher = fetcher_with(handler)
+    data = await data_fetcher.get_all_data(datasets=['posts', 'viewed'])
+    await data_fetcher.close()
+
+    assert data['interactions']['viewed'] == [{"id": 1, "username": "a", "post_id": 2, "rating": 50}]
+    assert data['posts'][0]['bio'] == "x" * 100
@@ -1,7 +1,7 @@
 import pytest
 from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker
-from app.database.models import Base, User, UserInteraction, UserPreference
+from app.database.models import Base, PendingPreferenceCredit, User, UserInteraction, UserPostAggregate, UserPreference
 from datetime import datetime
 
 def test_create_user(db_service):
@@ -114,6 +114,7 @@ def test_handle_duplicate_interactions(db_service):
 def test_update_preferences(db_service):
     """Test updating user preferences"""
     username = "test_user"
+    db_service.identity.update_post_categories({1: 2})
     
     # Create a like interaction to trigger preference update
     db_service.record_interaction(
@@ -131,6 +132,32 @@ def test_update_preferences(db_service):
     
     assert len(preferences) > 0
     assert all(p.preference_score > 0 for p in preferences)
+    assert [p.category_id for p in preferences] == [2]
+
+def test_preferences_recorded_before_engine_build_are_credited_later(db_service):
+    """Test that likes recorded before any engine build are credited once categories are known"""
+    db_service.record_interactions([
+        {"username": "early_user", "post_id": 1, "interaction_type": "like"},
+        {"username": "early_user", "post_id": 1, "interaction_type": "rate", "rating": 5.0},
+        {"username": "early_user", "post_id": 9, "interaction_type": "like"}
+    ])
+
+    session = db_service.SessionLocal()
+    assert session.query(UserPreference).count() == 0
+    assert session.query(PendingPreferenceCredit).count() == 2
+    session.close()
+
+    db_service.identity.update_post_categories({1: 2})
+    assert db_service.credit_pending_preferences() == 2
+    assert db_service.credit_pending_preferences() == 0
+
+    session = db_service.SessionLocal()
+    preferences = [(p.category_id, p.preference_score) for p in session.query(UserPreference).all()]
+    # Post 9 is still unknown and stays pending
+    pending = [p.post_id for p in session.query(PendingPreferenceCredit).all()]
+    session.close()
+    assert preferences == [(2, 2.0)]
+    assert pending == [9]
 
 def test_handle_invalid_interaction_type(db_service):
     """Test handling invalid interaction types"""
@@ -161,4 +188,359 @@ def test_cleanup(db_service):
     ).fetchall()
     
     session.close()
-    assert len(result) > 0
\ No newline at end of file
+    assert len(result) > 0
+
+
+def test_record_interactions_batch(db_service):
+    """Test recording a batch of interactions in one transaction"""
+    db_service.identity.update_post_categories({1: 2, 2: 3})
+    written = db_service.record_interactions([
+        {"username": "batch_user", "post_id": 1, "interaction_type": "view"},
+        {"username": "batch_user", "post_id": 2, "interaction_type": "like"},
+        {"username": "other_user", "post_id": 1, "interaction_type": "rate", "rating": 4.0}
+    ])
+
+    assert written == 3
+    session = db_service.SessionLocal()
+    assert session.query(User).count() == 2
+    assert session.query(UserInteraction).count() == 3
+    session.close()
+    assert db_service.get_user_preferences("batch_user") == {3: 1.0}
+    assert db_service.get_user_preferences("other_user") == {2: 1.0}
+
+def test_record_interactions_batch_is_atomic(db_service):
+    """Test that an invalid row rolls back the whole batch"""
+    with pytest.raises(ValueError):
+        db_service.record_interactions([
+            {"username": "batch_user", "post_id": 1, "interaction_type": "view"},
+            {"username": "batch_user", "post_id": 2, "interaction_type": "invalid_type"}
+        ])
+
+    session = db_service.SessionLocal()
+    assert session.query(UserInteraction).count() == 0
+    session.close()
+
+def test_sqlite_profile_pragmas(tmp_path):
+    """Test that file databases run with the WAL storage profile"""
+    from app.database.storage import apply_sqlite_profile
+    engine = create_engine(f"sqlite:///{tmp_path / 'profile.db'}")
+    apply_sqlite_profile(engine)
+
+    with engine.connect() as connection:
+        assert connection.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert connection.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+    engine.dispose()
+
+def test_history_and_preference_queries_are_index_only(db_service):
+    """Test that history reads and preference upserts are served from indexes"""
+    session = db_service.SessionLocal()
+    history_plan = " ".join(str(row[-1]) for row in session.execute(text(
+        "EXPLAIN QUERY PLAN SELECT post_id, interaction_type, rating, created_at "
+        "FROM user_interactions WHERE user_id = 1 ORDER BY created_at DESC"
+    )))
+    preference_plan = " ".join(str(row[-1]) for row in session.execute(text(
+        "EXPLAIN QUERY PLAN SELECT preference_score FROM user_preferences "
+        "WHERE user_id = 1 AND category_id = 1"
+    )))
+    session.close()
+
+    assert "COVERING INDEX ix_user_interactions_user_created" in history_plan
+    assert "TEMP B-TREE" not in history_plan
+
+    from app.database.database import encode_history_cursor, history_query
+    stmt = history_query(1, limit=50, before=encode_history_cursor("2024-01-01T00:00:00", 0, 10))
+    session = db_service.SessionLocal()
+    keyset_plan = " ".join(str(row[-1]) for row in session.execute(
+        text("EXPLAIN QUERY PLAN " + str(stmt.compile(compile_kwargs={"literal_binds": True})))
+    ))
+    session.close()
+    assert "COVERING INDEX ix_user_interactions_user_created" in keyset_plan
+    assert "TEMP B-TREE" not in keyset_plan
+    assert "uq_user_preferences_user_category" in preference_plan
+
+def test_preferences_are_upserted(db_service):
+    """Test that repeated credits update one preference row in place"""
+    db_service.identity.update_post_categories({1: 2})
+    for _ in range(3):
+        db_service.record_interaction(username="test_user", post_id=1, interaction_type="like")
+
+    session = db_service.SessionLocal()
+    preferences = session.query(UserPreference).all()
+    session.close()
+
+    assert len(preferences) == 1
+    assert preferences[0].preference_score == 3
+
+def test_migrate_legacy_database(tmp_path):
+    """Test migrating a database created before indexes and unique preferences"""
+    from app.database.migrations import MIGRATIONS, migrate
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with engine.begin() as connection:
+        connection.execute(text(
+            "CREATE TABLE users (id INTEGER PRIMARY KEY, username VARCHAR NOT NULL UNIQUE, created_at DATETIME)"
+        ))
+        connection.execute(text(
+            "CREATE TABLE user_interactions (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, "
+            "post_id INTEGER NOT NULL, interaction_type VARCHAR NOT NULL, rating FLOAT, created_at DATETIME)"
+        ))
+        connection.execute(text(
+            "CREATE TABLE user_preferences (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, "
+            "category_id INTEGER NOT NULL, preference_score FLOAT, last_updated DATETIME)"
+        ))
+        connection.execute(text(
+            "INSERT INTO user_preferences (user_id, category_id, preference_score) "
+            "VALUES (1, 1, 1.0), (1, 1, 2.0), (1, 2, 5.0)"
+        ))
+        connection.execute(text(
+            "INSERT INTO user_interactions (user_id, post_id, interaction_type, rating, created_at) "
+            "VALUES (1, 7, 'view', NULL, '2024-01-01'), (1, 7, 'rate', 5, '2024-01-02')"
+        ))
+
+    with engine.begin() as connection:
+        assert migrate(connection) == len(MIGRATIONS)
+
+    with engine.connect() as connection:
+        scores = connection.execute(text(
+            "SELECT category_id, preference_score FROM user_preferences ORDER BY category_id"
+        )).all()
+        indexes = {row[0] for row in connection.execute(text(
+            "SELECT name FROM sqlite_master WHERE type = 'index'"
+        ))}
+        aggregate = connection.execute(text(
+            "SELECT score, view_count, rate_count FROM user_post_aggregates WHERE user_id = 1 AND post_id = 7"
+        )).one()
+    engine.dispose()
+
+    assert scores == [(1, 3.0), (2, 5.0)]
+    assert tuple(aggregate) == (1.0 + 2.0 * 2, 1, 1)
+    assert {
+        "ix_user_interactions_user_created",
+        "ix_user_interactions_post_type",
+        "uq_user_preferences_user_category",
+        "ix_user_post_aggregates_updated"
+    } <= indexes
+
+def test_preferences_skip_posts_without_category(db_service):
+    """Test that likes on posts outside the snapshot are not credited"""
+    db_service.record_interaction(username="test_user", post_id=42, interaction_type="like")
+    assert db_service.get_user_preferences("test_user") == {}
+
+def test_identity_cache_spares_user_lookups(db_service):
+    """Test that known usernames resolve without querying the users table"""
+    from sqlalchemy import event
+    db_service.record_interaction(username="test_user", post_id=1, interaction_type="view")
+
+    statements = []
+    event.listen(db_service.engine, "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+    db_service.record_interaction(username="test_user", post_id=2, interaction_type="view")
+    db_service.get_user_history("test_user")
+    db_service.get_user_preferences("test_user")
+
+    assert not any("FROM users" in statement for statement in statements)
+
+def test_concurrent_get_or_create_user(db_service):
+    """Test that a user created by another writer is resolved, not duplicated"""
+    session = db_service.SessionLocal()
+    session.add(User(username="racing_user"))
+    session.commit()
+    session.close()
+
+    db_service.record_interaction(username="racing_user", post_id=1, interaction_type="view")
+
+    session = db_service.SessionLocal()
+    assert session.query(User).filter_by(username="racing_user").count() == 1
+    session.close()
+
+def test_failed_batch_does_not_cache_user_ids(db_service):
+    """Test that user ids from a rolled back transaction are not remembered"""
+    with pytest.raises(Exception):
+        db_service.record_interactions([
+            {"username": "ghost_user", "post_id": None, "interaction_type": "view"}
+        ])
+    assert db_service.identity.get_user_id("ghost_user") is None
+
+def test_aggregates_follow_engine_weights(db_service):
+    """Test that writes maintain weighted per-user/per-post aggregates"""
+    from app.core.interactions import INTERACTION_WEIGHTS
+    db_service.record_interactions([
+        {"username": "agg_user", "post_id": 1, "interaction_type": "view"},
+        {"username": "agg_user", "post_id": 1, "interaction_type": "like"},
+        {"username": "agg_user", "post_id": 2, "interaction_type": "rate", "rating": 2.5}
+    ])
+    db_service.record_interaction(username="agg_user", post_id=1, interaction_type="view")
+
+    session = db_service.SessionLocal()
+    aggregates = {a.post_id: a for a in session.query(UserPostAggregate).all()}
+    session.close()
+
+    assert aggregates[1].score == 2 * INTERACTION_WEIGHTS['viewed'] + INTERACTION_WEIGHTS['liked']
+    assert (aggregates[1].view_count, aggregates[1].like_count) == (2, 1)
+    assert aggregates[2].score == INTERACTION_WEIGHTS['rated'] * 1.5
+    assert sorted(db_service.iter_user_post_scores(chunk_size=1)) == [
+        ("agg_user", 1, aggregates[1].score),
+        ("agg_user", 2, aggregates[2].score)
+    ]
+
+# Compaction runs "now" at a fixed date so the 2024 rows stay within the archive retention
+COMPACTED_AT = datetime(2024, 3, 5)
+
+def _seed_aged_interactions(db_service, username, rows):
+    db_service.record_interaction(username=username, post_id=99, interaction_type="view")
+    session = db_service.SessionLocal()
+    user = session.query(User).filter_by(username=username).first()
+    for post_id, interaction_type, created_at in rows:
+        session.add(UserInteraction(
+            user_id=user.id, post_id=post_id, interaction_type=interaction_type,
+            rating=4.5 if interaction_type == "rate" else None, created_at=created_at
+        ))
+    session.commit()
+    session.close()
+
+def test_compaction_rolls_up_views_and_archives_rows(db_service):
+    """Test that compaction moves old rows out of the hot table without losing history"""
+    _seed_aged_interactions(db_service, "aged_user", [
+        (1, "view", datetime(2024, 1, 5, 9, 0)),
+        (1, "view", datetime(2024, 1, 5, 17, 30)),
+        (2, "view", datetime(2024, 1, 6, 8, 0)),
+        (1, "like", datetime(2024, 1, 5, 10, 0)),
+        (2, "rate", datetime(2024, 2, 1, 12, 0))
+    ])
+
+    stats = db_service.compact_interactions(retention_days=30, policy="archive", now=COMPACTED_AT)
+    assert stats == {
+        'rolled_up_views': 3, 'archived': 2, 'dropped': 0, 'months': 2, 'expired_months': 0, 'expired_rollups': 0
+    }
+
+    session = db_service.SessionLocal()
+    assert session.query(UserInteraction).count() == 1
+    tables = session.execute(text(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE 'user_interactions_2%' ORDER BY name"
+    )).scalars().all()
+    session.close()
+    assert tables == ["user_interactions_202401", "user_interactions_202402"]
+
+    history = db_service.get_user_history("aged_user")
+    views = sorted((v['post_id'], v.get('count', 1)) for v in history['views'])
+    assert views == [(1, 2), (2, 1), (99, 1)]
+    assert [like['post_id'] for like in history['likes']] == [1]
+    assert history['ratings'][0]['rating'] == 4.5
+
+    # Compacting again is a no-op and a later run adds to existing daily counts
+    assert db_service.compact_interactions(retention_days=30, now=COMPACTED_AT)['rolled_up_views'] == 0
+    _seed_aged_interactions(db_service, "aged_user", [(1, "view", datetime(2024, 1, 5, 20, 0))])
+    db_service.compact_interactions(retention_days=30, now=COMPACTED_AT)
+    views = {v['post_id']: v.get('count', 1) for v in db_service.get_user_history("aged_user")['views']}
+    assert views[1] == 3
+
+def test_compaction_archive_policy_only_loses_view_detail(db_service):
+    """Test that under the archive policy views keep only their daily counts while other events stay raw"""
+    _seed_aged_interactions(db_service, "lossy_user", [
+        (1, "view", datetime(2024, 1, 5, 9, 0)),
+        (1, "view", datetime(2024, 1, 5, 17, 30)),
+        (1, "like", datetime(2024, 1, 5, 10, 0))
+    ])
+    db_service.compact_interactions(retention_days=30, policy="archive", now=COMPACTED_AT)
+
+    session = db_service.SessionLocal()
+    archived = session.execute(text("SELECT interaction_type, created_at FROM user_interactions_202401")).all()
+    rollups = session.execute(text("SELECT day, view_count FROM user_interaction_daily")).all()
+    session.close()
+    assert archived == [("like", "2024-01-05 10:00:00.000000")]
+    assert rollups == [("2024-01-05 00:00:00.000000", 2)]
+
+def test_compaction_expires_archives_and_rollups_together(db_service):
+    """Test that archive partitions and view rollups share the monthly archive retention"""
+    _seed_aged_interactions(db_service, "expiring_user", [
+        (1, "view", datetime(2024, 1, 5, 9, 0)),
+        (1, "like", datetime(2024, 1, 5, 10, 0)),
+        (2, "view", datetime(2024, 2, 1, 9, 0)),
+        (2, "like", datetime(2024, 2, 1, 10, 0))
+    ])
+    db_service.compact_interactions(retention_days=30, now=COMPACTED_AT)
+
+    stats = db_service.compact_interactions(retention_days=30, now=COMPACTED_AT, archive_retention_months=1)
+    assert (stats['expired_months'], stats['expired_rollups']) == (1, 1)
+
+    history = db_service.get_user_history("expiring_user")
+    assert [like['post_id'] for like in history['likes']] == [2]
+    assert sorted(v['post_id'] for v in history['views']) == [2, 99]
+
+def test_compaction_drop_policy(db_service):
+    """Test that the drop policy discards old non-view rows but keeps view rollups"""
+    _seed_aged_interactions(db_service, "dropping_user", [
+        (1, "view", datetime(2024, 1, 5, 9, 0)),
+        (1, "like", datetime(2024, 1, 5, 10, 0))
+    ])
+
+    stats = db_service.compact_interactions(retention_days=30, policy="drop", now=COMPACTED_AT)
+    assert stats == {
+        'rolled_up_views': 1, 'archived': 0, 'dropped': 1, 'months': 0, 'expired_months': 0, 'expired_rollups': 0
+    }
+
+    history = db_service.get_user_history("dropping_user")
+    assert history['likes'] == []
+    assert sorted(v['post_id'] for v in history['views']) == [1, 99]
+
+    with pytest.raises(ValueError):
+        db_service.compact_interactions(policy="shred")
+
+def test_history_pages_across_partitions(db_service):
+    """Test that keyset pages walk hot, archived and rolled up rows in order"""
+    from app.database.database import archive_tables, history_item, history_query, next_history_cursor
+    _seed_aged_interactions(db_service, "paging_user", [
+        (post_id, "like" if post_id % 2 else "view", datetime(2024, 1, post_id, 12, 0))
+        for post_id in range(1, 11)
+    ])
+    db_service.compact_interactions(retention_days=30, now=COMPACTED_AT)
+
+    seen, cursor = [], None
+    session = db_service.SessionLocal()
+    user_id = session.query(User.id).filter_by(username="paging_user").scalar()
+    while True:
+        rows = session.execute(history_query(
+            user_id, 3, cursor, archive_tables=archive_tables(session), include_rollups=True
+        )).all()
+        seen.extend(history_item(row)['post_id'] for row in rows)
+        cursor = next_history_cursor(rows[-1] if rows else None, len(rows), 3)
+        if cursor is None:
+            break
+    session.close()
+
+    assert seen == [99] + list(range(10, 0, -1))
+
+def test_history_cursor_separates_sources_at_one_timestamp(db_service):
+    """Test that a raw row and a rollup row sharing a timestamp and an id are both paged through"""
+    from app.database.database import archive_tables, history_item, history_query, next_history_cursor
+    from app.database.models import UserInteractionDaily
+    _seed_aged_interactions(db_service, "tied_user", [(7, "like", datetime(2024, 1, 5))])
+
+    session = db_service.SessionLocal()
+    user_id = session.query(User.id).filter_by(username="tied_user").scalar()
+    like_id = session.query(UserInteraction.id).filter_by(user_id=user_id, post_id=7).scalar()
+    session.add(UserInteractionDaily(id=like_id, user_id=user_id, post_id=8, day=datetime(2024, 1, 5), view_count=2))
+    session.commit()
+
+    seen, cursor = [], None
+    while True:
+        rows = session.execute(history_query(
+            user_id, 1, cursor, archive_tables=archive_tables(session), include_rollups=True
+        )).all()
+        seen.extend(history_item(row)['post_id'] for row in rows)
+        cursor = next_history_cursor(rows[-1] if rows else None, len(rows), 1)
+        if cursor is None:
+            break
+    session.close()
+
+    assert seen == [99, 8, 7]
+
+def test_history_page_reads_only_archives_before_the_cursor(db_service):
+    """Test that a page after a cursor leaves out archive months newer than it"""
+    from app.database.database import encode_history_cursor, history_query
+    from app.database.models import interaction_archive_table
+    tables = [interaction_archive_table(month) for month in ("202403", "202402", "202401")]
+
+    sql = str(history_query(1, 10, encode_history_cursor("2024-02-10T00:00:00", 0, 5), archive_tables=tables))
+
+    assert "user_interactions_202403" not in sql
+    assert "user_interactions_202402" in sql and "user_interactions_202401" in sql
@@ -0,0 +1,116 @@
+import asyncio
+import time
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+from app.api import routes
+from app.main import app
+from app.services.deadline import Deadline, DeadlineExceeded
+from app.services.popularity import PopularityFeed
+from app.services.recommendation_engine import RecommendationEngine
+from app.services.upstream import UpstreamUnavailable
+from .test_fixtures import get_mock_data
+
+def test_deadline_from_header():
+    """Test header budgets in milliseconds with a fallback default"""
+    assert Deadline.from_header("250", 2.0).budget_seconds == 0.25
+    assert Deadline.from_header(None, 2.0).budget_seconds == 2.0
+    assert Deadline.from_header("soon", 2.0).budget_seconds == 2.0
+    assert Deadline.from_header("-5", 2.0).budget_seconds == 2.0
+
+@pytest.mark.asyncio
+async def test_deadline_cancels_slow_stage():
+    """Test that a stage running past the budget is cancelled"""
+    cancelled = asyncio.Event()
+
+    async def slow_stage():
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    deadline = Deadline(0.05)
+    assert await deadline.run("fast", asyncio.sleep(0, result="done")) == "done"
+    with pytest.raises(DeadlineExceeded) as exc_info:
+        await deadline.run("slow", slow_stage())
+    assert exc_info.value.stage == "slow"
+    assert cancelled.is_set()
+
+    with pytest.raises(DeadlineExceeded):
+        await deadline.run("late", asyncio.sleep(0))
+
+def test_popularity_feed(sample_data):
+    """Test global and per-category popularity lists"""
+    engine = RecommendationEngine(sample_data)
+    feed = PopularityFeed(top_n=5)
+    assert feed.get(None, 3) == []
+
+    feed.refresh(engine)
+    assert feed.get(None, 3) == engine.rank_posts(limit=3)
+    assert all(post['category']['id'] == 1 for post in feed.get(1, 5))
+    assert feed.get(999, 5) == []
+
+def test_feed_degrades_when_upstream_is_slow():
+    """Test that /feed answers within its budget from the popularity fallback"""
+    async def slow_upstream(self, datasets=None):
+        await asyncio.sleep(5)
+        return get_mock_data()
+
+    routes.popular_feeds.refresh(RecommendationEngine(get_mock_data()))
+    routes.engine_snapshot.clear()
+    with patch('app.services.data_fetcher.DataFetcher.get_all_data', new=slow_upstream):
+        with TestClient(app) as client:
+            started = time.perf_counter()
+            response = client.get(
+                "/feed", params={"username": "deadline_user", "category_id": 1, "limit": 3},
+                headers={"X-Deadline-Ms": "100"}
+            )
+            elapsed = time.perf_counter() - started
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["degraded"] is True
+    assert data["is_personalized"] is False
+    assert data["recommendations"] == routes.popular_feeds.get(1, 3)
+    assert elapsed < 1.0
+
+def test_feed_degrades_when_upstream_is_unavailable():
+    """Test that an unreachable upstream yields a degraded feed rather than a cached empty one"""
+    routes.popular_feeds.refresh(RecommendationEngine(get_mock_data()))
+    routes.engine_snapshot.clear()
+    with patch('app.services.data_fetcher.DataFetcher.get_all_data', side_effect=UpstreamUnavailable("down")):
+        with TestClient(app) as client:
+            response = client.get("/feed", params={"username": "outage_user", "limit": 2})
+            upstream_stats = client.get("/upstream/stats")
+
+    assert response.status_code == 200
+    assert response.json()["degraded"] is True
+    assert upstream_stats.status_code == 200
+    assert routes.posts_cache.get("outage_user:None:None:2") is None
+
+def test_feed_is_unavailable_before_the_first_build():
+    """Test that a cold start with no popularity feed answers 503 instead of an empty degraded feed"""
+    routes.engine_snapshot.clear()
+    with patch.object(routes, 'popular_feeds', PopularityFeed()), \
+            patch('app.services.data_fetcher.DataFetcher.get_all_data', side_effect=UpstreamUnavailable("down")):
+        with TestClient(app) as client:
+            response = client.get("/feed", params={"username": "cold_user", "limit": 2})
+
+    assert response.status_code == 503
+    assert routes.posts_cache.get("cold_user:None:None:2") is None
+
+def test_engine_build_outlives_a_request_out_of_time():
+    """Test that the shared engine build keeps running after the request that started it times out"""
+    async def slow_upstream(self, datasets=None):
+        await asyncio.sleep(0.3)
+        return get_mock_data()
+
+    routes.popular_feeds.refresh(RecommendationEngine(get_mock_data()))
+    routes.engine_snapshot.clear()
+    with patch('app.services.data_fetcher.DataFetcher.get_all_data', new=slow_upstream):
+        with TestClient(app) as client:
+            response = client.get("/feed", params={"username": "impatient_user"}, headers={"X-Deadline-Ms": "50"})
+            assert response.json()["degraded"] is True
+            time.sleep(0.6)
+            assert routes.engine_snapshot.engine is not None
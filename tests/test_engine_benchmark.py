@@ -0,0 +1,46 @@
+import json
+from app.core.interactions import INTERACTION_WEIGHTS
+from app.services.recommendation_engine import RecommendationEngine
+from tests.engine_benchmark import DAY_MS, compare, run_benchmarks, synthetic_engine_data
+
+NOW_MS = 1_700_000_000_000
+
+def test_synthetic_data_matches_upstream_shapes():
+    """Test that generated posts and interactions look like the upstream records"""
+    data = synthetic_engine_data(posts=200, users=50, interactions=1000, seed=7, now_ms=NOW_MS)
+
+    assert len(data['posts']) == 200
+    post = data['posts'][0]
+    assert set(post['category']) == {'id', 'name'}
+    assert isinstance(post['post_summary']['emotions'], list)
+    assert all(NOW_MS - 60 * DAY_MS < p['created_at'] <= NOW_MS for p in data['posts'])
+
+    assert set(data['interactions']) == set(INTERACTION_WEIGHTS)
+    assert sum(len(records) for records in data['interactions'].values()) == 1000
+    assert all('rating' in record for record in data['interactions']['rated'])
+    assert set(data['interactions']['viewed'][0]) == {'id', 'username', 'post_id'}
+
+    engine = RecommendationEngine(data)
+    assert engine.is_personalized('user_0')
+    assert len(engine.rank_posts(category_id=2, mood='happy', limit=5)) == 5
+
+def test_synthetic_data_is_seeded():
+    """Test that the same seed gives the same data and another seed does not"""
+    first = synthetic_engine_data(posts=100, users=20, interactions=500, seed=1, now_ms=NOW_MS)
+    assert synthetic_engine_data(posts=100, users=20, interactions=500, seed=1, now_ms=NOW_MS) == first
+    assert synthetic_engine_data(posts=100, users=20, interactions=500, seed=2, now_ms=NOW_MS) != first
+
+def test_run_benchmarks_records_time_and_memory_per_case():
+    """Test that every case gets timings and peak memory and the results compare across runs"""
+    results = run_benchmarks({'tiny': (100, 20, 500)}, repeats=1)
+    cases = json.loads(json.dumps(results))['scales']['tiny']['cases']
+
+    for case in ('engine_build', 'rank_posts_all', 'rank_posts_category_mood', 'get_recommendations_mood'):
+        assert cases[case]['seconds'] > 0
+        assert cases[case]['peak_bytes'] > 0
+    assert set(cases['rank_posts_mood']['stages']) == {'scoring', 'top_k'}
+    assert cases['is_personalized']['personalized'] > 0
+
+    rows = compare(results, results)
+    assert len(rows) == len(cases)
+    assert all(row['ratio'] == 1.0 for row in rows)
@@ -0,0 +1,151 @@
+import asyncio
+import pytest
+from datetime import datetime
+from app.services.compute_pool import ComputePool
+from app.services.engine_snapshot import EngineSnapshot
+from app.services.recommendation_engine import ENGINE_DATASETS, RecommendationEngine
+from .test_fixtures import get_mock_data
+
+class FakeUpstream:
+    """Records which datasets each refresh asked for"""
+
+    def __init__(self):
+        self.requests = []
+
+    async def fetch(self, datasets):
+        self.requests.append(sorted(datasets))
+        await asyncio.sleep(0.01)
+        data = get_mock_data()
+        return {'posts': data['posts'], 'interactions': data['interactions'], 'users': []}
+
+def make_snapshot(upstream, cadences, local_scores=None):
+    pool = ComputePool()
+
+    async def load_local_scores(since=None):
+        return local_scores
+
+    async def build(data, local, previous):
+        return await pool.build_engine(data, local_scores=local, previous=previous)
+
+    return EngineSnapshot(
+        fetch=upstream.fetch,
+        build=build,
+        load_local_scores=load_local_scores,
+        cadences=cadences,
+        local_refresh_seconds=3600.0
+    )
+
+@pytest.mark.asyncio
+async def test_only_engine_datasets_are_fetched():
+    """Test that users are never fetched and fresh datasets are not refetched"""
+    upstream = FakeUpstream()
+    snapshot = make_snapshot(upstream, {name: 3600.0 for name in ENGINE_DATASETS})
+
+    first = await snapshot.get()
+    assert await snapshot.get() is first
+    assert upstream.requests == [sorted(ENGINE_DATASETS)]
+
+@pytest.mark.asyncio
+async def test_due_datasets_refresh_on_their_own_cadence():
+    """Test that interactions refresh without refetching posts, reusing the post indexes"""
+    upstream = FakeUpstream()
+    cadences = {name: 0.0 for name in ENGINE_DATASETS}
+    cadences['posts'] = 3600.0
+    snapshot = make_snapshot(upstream, cadences, local_scores=[("local_user", 1, 2.0)])
+
+    first = await snapshot.get()
+    first.rank_posts(limit=3)
+    second = await snapshot.get()
+
+    assert upstream.requests[1] == ['inspired', 'liked', 'rated', 'viewed']
+    assert second is not first
+    assert second.post_lookup is first.post_lookup
+    assert second._score_features is first._score_features
+    assert second.user_profiles is not first.user_profiles
+    assert second.is_personalized("local_user")
+    assert snapshot.stats()['datasets']['posts']['fetches'] == 1
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_share_one_refresh():
+    """Test that requests arriving during a refresh wait for it instead of starting their own"""
+    upstream = FakeUpstream()
+    snapshot = make_snapshot(upstream, {name: 3600.0 for name in ENGINE_DATASETS})
+
+    engines = await asyncio.gather(*(snapshot.get() for _ in range(5)))
+    assert all(engine is engines[0] for engine in engines)
+    assert len(upstream.requests) == 1
+
+@pytest.mark.asyncio
+async def test_failed_refresh_keeps_previous_engine():
+    """Test that a failing refresh falls back to the engine already built"""
+    upstream = FakeUpstream()
+    snapshot = make_snapshot(upstream, {name: 0.0 for name in ENGINE_DATASETS})
+    first = await snapshot.get()
+
+    async def failing_fetch(datasets):
+        raise ConnectionError("upstream down")
+    snapshot.fetch = failing_fetch
+
+    assert await snapshot.get() is first
+    assert snapshot.failed_refreshes == 1
+
+@pytest.mark.asyncio
+async def test_unchanged_datasets_skip_the_rebuild():
+    """Test that a refresh returning the same lists keeps the current engine"""
+    upstream = FakeUpstream()
+    data = get_mock_data()
+
+    async def fetch(datasets):
+        return {'posts': data['posts'], 'interactions': data['interactions'], 'users': []}
+    snapshot = make_snapshot(upstream, {name: 0.0 for name in ENGINE_DATASETS})
+    snapshot.fetch = fetch
+
+    first = await snapshot.get()
+    assert await snapshot.get() is first
+    assert (snapshot.rebuilds, snapshot.rebuilds_skipped) == (1, 1)
+    assert snapshot.stats()['datasets']['posts']['unchanged'] == 1
+
+@pytest.mark.asyncio
+async def test_local_scores_are_read_incrementally():
+    """Test that later reads ask only for changed aggregate rows and merge them into the earlier ones"""
+    upstream = FakeUpstream()
+    reads = []
+    deltas = [[("local_user", 1, 2.0), ("other_user", 2, 1.0)], [("local_user", 1, 2.0)], [("other_user", 2, 4.0)]]
+
+    async def load_local_scores(since=None):
+        reads.append(since)
+        return deltas[len(reads) - 1]
+    snapshot = make_snapshot(upstream, {name: 3600.0 for name in ENGINE_DATASETS})
+    snapshot.load_local_scores = load_local_scores
+    snapshot.local_refresh_seconds = 0.0
+
+    first = await snapshot.get()
+    assert await snapshot.get() is first
+    third = await snapshot.get()
+
+    assert reads[0] is None
+    assert all(isinstance(since, datetime) for since in reads[1:])
+    assert (snapshot.rebuilds, snapshot.rebuilds_skipped) == (2, 1)
+    assert third.local_activity == {"local_user": 1, "other_user": 1}
+    assert third.user_profiles is first.user_profiles
+
+def test_posts_only_change_reuses_profiles(sample_data):
+    """Test that new posts rebuild post indexes but keep the profiles"""
+    previous = RecommendationEngine(sample_data, local_scores=[("local_user", 1, 2.0)])
+    data = {**sample_data, 'posts': list(sample_data['posts'])[:1]}
+    engine = RecommendationEngine(data, previous=previous)
+
+    assert engine.user_profiles is previous.user_profiles
+    assert engine.is_personalized("local_user")
+    assert engine.post_lookup is not previous.post_lookup
+    assert len(engine.post_lookup) == 1
+
+def test_local_scores_change_reuses_profiles(sample_data):
+    """Test that new local scores update personalization without rebuilding the profiles"""
+    previous = RecommendationEngine(sample_data)
+    engine = RecommendationEngine(sample_data, local_scores=[("local_user", 1, 2.0)], previous=previous)
+
+    assert engine.user_profiles is previous.user_profiles
+    assert engine.post_lookup is previous.post_lookup
+    assert engine.is_personalized("local_user")
+    assert not previous.is_personalized("local_user")
@@ -0,0 +1,83 @@
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from app.main import app
+from app.api.routes import posts_cache
+from app.services.events import EventBus, InteractionRecorded
+from app.services.feed_cache import FeedCache, feed_tags, post_tag, user_tag
+from .test_fixtures import get_mock_data
+
+def _event(username, post_id=1):
+    return InteractionRecorded(username=username, post_id=post_id, interaction_type="view")
+
+def test_interaction_evicts_only_users_entries():
+    """Test that an interaction evicts only the interacting user's feeds"""
+    cache = FeedCache(maxsize=10, ttl=60)
+    cache.set("alice:None:None:10", {"feed": 1}, tags=[user_tag("alice")])
+    cache.set("alice:2:None:10", {"feed": 2}, tags=[user_tag("alice")])
+    cache.set("bob:None:None:10", {"feed": 3}, tags=[user_tag("bob")])
+
+    cache.handle_interaction(_event("alice"))
+
+    assert "alice:None:None:10" not in cache
+    assert "alice:2:None:10" not in cache
+    assert "bob:None:None:10" in cache
+
+def test_popular_post_evicts_shared_entries():
+    """Test that crossing the popularity threshold evicts feeds containing the post"""
+    cache = FeedCache(maxsize=10, ttl=60, popularity_threshold=3)
+    cache.set("bob:None:None:10", {"feed": 1}, tags=[user_tag("bob"), post_tag(7)])
+    cache.set("carol:None:None:10", {"feed": 2}, tags=[user_tag("carol"), post_tag(8)])
+
+    cache.handle_interaction(_event("alice", post_id=7))
+    cache.handle_interaction(_event("alice", post_id=7))
+    assert "bob:None:None:10" in cache
+
+    cache.handle_interaction(_event("alice", post_id=7))
+    assert "bob:None:None:10" not in cache
+    assert "carol:None:None:10" in cache
+
+def test_tag_index_follows_evictions():
+    """Test that the tag index forgets keys dropped by size eviction"""
+    cache = FeedCache(maxsize=1, ttl=60)
+    cache.set("a", 1, tags=[user_tag("alice")])
+    cache.set("b", 2, tags=[user_tag("bob")])
+
+    assert "a" not in cache
+    assert cache.invalidate_tag(user_tag("alice")) == 0
+    assert cache.invalidate_tag(user_tag("bob")) == 1
+
+def test_feed_tags():
+    """Test tags derived from a feed response"""
+    tags = feed_tags("alice", [{"id": 1}, {"id": 2}, {"title": "no id"}])
+    assert tags == [user_tag("alice"), post_tag(1), post_tag(2)]
+
+def test_event_bus_isolates_failing_handlers():
+    """Test that one failing subscriber does not block the others"""
+    bus = EventBus()
+    received = []
+
+    def failing(event):
+        raise RuntimeError("boom")
+
+    bus.subscribe(InteractionRecorded, failing)
+    bus.subscribe(InteractionRecorded, received.append)
+    bus.publish(_event("alice"))
+
+    assert len(received) == 1
+
+def test_recorded_interaction_invalidates_cached_feed():
+    """Test that POST /interactions evicts the user's cached feed"""
+    posts_cache.clear()
+    with patch('app.services.data_fetcher.DataFetcher.get_all_data') as mock_get_data:
+        mock_get_data.return_value = get_mock_data()
+        client = TestClient(app)
+
+        client.get("/feed?username=cache_user")
+        assert "cache_user:None:None:10" in posts_cache
+
+        client.post("/interactions", json={
+            "username": "cache_user",
+            "post_id": 1,
+            "interaction_type": "view"
+        })
+        assert "cache_user:None:None:10" not in posts_cache
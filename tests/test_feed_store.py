@@ -0,0 +1,102 @@
+import json
+import time
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+from app.api import routes
+from app.main import app
+from app.services.events import InteractionRecorded
+from app.services.feed_store import FeedStore, most_active_users, precompute_feeds, write_feed_store
+from app.services.recommendation_engine import RecommendationEngine
+
+@pytest.fixture
+def store_path(tmp_path):
+    return str(tmp_path / "feeds.db")
+
+def write_store(path, engine, user_shapes, top_n=3, built_at=None):
+    return write_feed_store(path, engine, precompute_feeds(engine, user_shapes, top_n), top_n, built_at=built_at)
+
+def test_precomputed_feed_matches_online_ranking(sample_data, store_path):
+    """Test that stored feeds return the posts online ranking would"""
+    engine = RecommendationEngine(sample_data)
+    stats = write_store(store_path, engine, {"test_user": [(None, None), (1, "happy")]})
+    assert stats["feeds"] == 2
+
+    store = FeedStore(store_path)
+    for category_id, mood in [(None, None), (1, "happy")]:
+        recommendations, is_personalized = store.get("test_user", category_id, mood, 2)
+        expected = engine.get_recommendations("test_user", category_id=category_id, mood=mood, limit=2)
+        assert recommendations == expected
+        assert is_personalized
+
+    assert store.get("test_user", 2, None, 2) is None  # shape not precomputed
+    assert store.get("other_user", None, None, 2) is None
+    assert store.get("test_user", None, None, 5) is None  # beyond the stored top-N
+    assert (store.hits, store.misses) == (2, 3)
+
+def test_stale_feeds_are_misses(sample_data, store_path):
+    """Test the age limit and invalidation by a later interaction"""
+    engine = RecommendationEngine(sample_data)
+    write_store(store_path, engine, {"test_user": [(None, None)]}, built_at=time.time() - 120)
+
+    assert FeedStore(store_path, max_age_seconds=60).get("test_user", None, None, 1) is None
+
+    store = FeedStore(store_path, max_age_seconds=3600)
+    assert store.get("test_user", None, None, 1) is not None
+    store.handle_interaction(InteractionRecorded(username="test_user", post_id=1, interaction_type="view"))
+    assert store.get("test_user", None, None, 1) is None
+
+def test_rewritten_store_is_picked_up(sample_data, store_path):
+    """Test that readers switch to a store swapped in by a later job run"""
+    engine = RecommendationEngine(sample_data)
+    store = FeedStore(store_path)
+    assert store.get("test_user", None, None, 1) is None
+
+    write_store(store_path, engine, {"test_user": [(None, None)]})
+    assert store.get("test_user", None, None, 1) is not None
+    write_store(store_path, engine, {"another_user": [(None, None)]})
+    assert store.get("test_user", None, None, 1) is None
+    assert store.get("another_user", None, None, 1) is not None
+    store.close()
+
+def test_most_active_users(sample_data):
+    """Test ranking users by interaction volume"""
+    engine = RecommendationEngine(sample_data, local_scores=[("local_user", 1, 2.0)])
+    users = most_active_users(engine, top_n=10)
+    assert users[0] == "test_user"
+    assert "local_user" in users
+
+def test_feed_served_from_store(sample_data, store_path):
+    """Test that /feed answers from the store without ranking online"""
+    engine = RecommendationEngine(sample_data)
+    write_store(store_path, engine, {"stored_user": [(None, None)]})
+
+    with patch.object(routes, "feed_store", FeedStore(store_path)), \
+            patch('app.services.data_fetcher.DataFetcher.get_all_data') as mock_get_data:
+        with TestClient(app) as client:
+            response = client.get("/feed", params={"username": "stored_user", "limit": 2})
+            stats = client.get("/feed/store").json()
+
+    assert response.status_code == 200
+    assert [p["id"] for p in response.json()["recommendations"]] == \
+        [p["id"] for p in engine.get_recommendations("stored_user", limit=2)]
+    mock_get_data.assert_not_called()
+    assert stats["enabled"] and stats["hits"] == 1
+
+def test_feed_streamed_from_store(sample_data, store_path):
+    """Test streaming stored posts without re-encoding them"""
+    engine = RecommendationEngine(sample_data)
+    write_store(store_path, engine, {"streamed_user": [(None, None)]})
+
+    with patch.object(routes, "feed_store", FeedStore(store_path)), \
+            patch('app.services.data_fetcher.DataFetcher.get_all_data') as mock_get_data:
+        with TestClient(app) as client:
+            response = client.get(
+                "/feed", params={"username": "streamed_user", "limit": 2},
+                headers={"Accept": "application/x-ndjson"}
+            )
+
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert lines[0]["metadata"] == {"total_count": 2, "has_more": True, "is_personalized": False, "source": "store"}
+    assert lines[1:-1] == engine.get_recommendations("streamed_user", limit=2)
+    mock_get_data.assert_not_called()
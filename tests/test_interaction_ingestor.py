@@ -0,0 +1,147 @@
+import asyncio
+import threading
+import pytest
+from app.services.interaction_ingestor import IngestionBackpressure, InteractionIngestor
+
+def _interaction(post_id):
+    return {"username": "test_user", "post_id": post_id, "interaction_type": "view", "rating": None}
+
+class RecordingWriter:
+    def __init__(self, fail_post_ids=()):
+        self.batches = []
+        self.fail_post_ids = set(fail_post_ids)
+
+    def __call__(self, batch):
+        if any(i["post_id"] in self.fail_post_ids for i in batch):
+            raise ValueError("bad row")
+        self.batches.append([i["post_id"] for i in batch])
+
+@pytest.mark.asyncio
+async def test_interactions_are_batched():
+    """Test that concurrent submissions are grouped into micro-batches"""
+    writer = RecordingWriter()
+    ingestor = InteractionIngestor(writer, batch_size=10, max_delay_seconds=0.2)
+
+    await asyncio.gather(*(ingestor.submit(_interaction(i)) for i in range(25)))
+    ingestor.stop()
+
+    assert sorted(sum(writer.batches, [])) == list(range(25))
+    assert len(writer.batches) < 25
+    assert max(len(batch) for batch in writer.batches) <= 10
+
+@pytest.mark.asyncio
+async def test_enqueue_durability_acks_before_write():
+    """Test that enqueue durability does not wait for the commit"""
+    release = threading.Event()
+    written = []
+
+    def slow_writer(batch):
+        release.wait(5)
+        written.extend(batch)
+
+    ingestor = InteractionIngestor(slow_writer, durability="enqueue", max_delay_seconds=0)
+    await asyncio.wait_for(ingestor.submit(_interaction(1)), timeout=1)
+    assert written == []
+
+    release.set()
+    ingestor.stop()
+    assert len(written) == 1
+
+@pytest.mark.asyncio
+async def test_backpressure_when_queue_is_full():
+    """Test that a saturated queue rejects new interactions"""
+    release = threading.Event()
+    ingestor = InteractionIngestor(
+        lambda batch: release.wait(5),
+        batch_size=1,
+        max_delay_seconds=0,
+        max_queue_size=1,
+        durability="enqueue",
+        enqueue_timeout_seconds=0.05
+    )
+
+    with pytest.raises(IngestionBackpressure):
+        for post_id in range(5):
+            await ingestor.submit(_interaction(post_id))
+
+    release.set()
+    ingestor.stop()
+
+@pytest.mark.asyncio
+async def test_failed_rows_are_isolated():
+    """Test that one bad row only fails its own submission"""
+    writer = RecordingWriter(fail_post_ids={2})
+    ingestor = InteractionIngestor(writer, batch_size=10, max_delay_seconds=0.2)
+
+    results = await asyncio.gather(
+        *(ingestor.submit(_interaction(i)) for i in range(4)),
+        return_exceptions=True
+    )
+    ingestor.stop()
+
+    assert isinstance(results[2], ValueError)
+    assert [r for i, r in enumerate(results) if i != 2] == [None, None, None]
+    assert ingestor.failed == 1
+
+def test_stop_flushes_pending_interactions():
+    """Test that shutdown writes everything already queued"""
+    writer = RecordingWriter()
+    ingestor = InteractionIngestor(writer, batch_size=100, max_delay_seconds=10, durability="enqueue")
+
+    for post_id in range(5):
+        ingestor.submit_nowait(_interaction(post_id))
+    ingestor.stop()
+
+    assert sum(writer.batches, []) == list(range(5))
+
+def test_invalid_durability_mode():
+    """Test that unknown durability modes are rejected"""
+    with pytest.raises(ValueError):
+        InteractionIngestor(lambda batch: None, durability="eventually")
+
+@pytest.mark.asyncio
+async def test_reserved_slots_hold_back_submissions():
+    """Test that reservations are capped below the queue limit and count against it until released"""
+    writer = RecordingWriter()
+    ingestor = InteractionIngestor(writer, max_queue_size=4, enqueue_timeout_seconds=0.05, max_delay_seconds=0)
+
+    async with ingestor.reserve(10):
+        assert ingestor.reserved == 2
+        with pytest.raises(IngestionBackpressure):
+            async with ingestor.reserve(1):
+                pass
+        await ingestor.submit(_interaction(1))
+
+    assert ingestor.reserved == 0
+    async with ingestor.reserve(1):
+        pass
+    ingestor.stop()
+    assert writer.batches == [[1]]
+
+@pytest.mark.asyncio
+async def test_single_write_succeeds_while_bulk_is_in_flight():
+    """Test that a bulk write goes through the writer thread without starving single writes"""
+    writing_bulk, release = threading.Event(), threading.Event()
+    batches = []
+
+    def writer(batch):
+        if len(batch) > 1:
+            writing_bulk.set()
+            release.wait(5)
+        batches.append([i["post_id"] for i in batch])
+        return len(batch)
+
+    ingestor = InteractionIngestor(writer, max_queue_size=10, enqueue_timeout_seconds=0.05, max_delay_seconds=0)
+    bulk = asyncio.ensure_future(ingestor.submit_many([_interaction(i) for i in range(10)]))
+    assert await asyncio.to_thread(writing_bulk.wait, 5)
+
+    single = asyncio.ensure_future(ingestor.submit(_interaction(99)))
+    await asyncio.sleep(0.1)
+    assert ingestor.queue_depth == 1
+    release.set()
+
+    assert await bulk == 10
+    await single
+    ingestor.stop()
+    assert batches == [list(range(10)), [99]]
+    assert ingestor.written == 11
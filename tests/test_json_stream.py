@@ -0,0 +1,36 @@
+import json
+import pytest
+from app.services.json_stream import ItemStreamDecoder, project_fields
+
+def decode(body: bytes, chunk_size: int, **options):
+    decoder = ItemStreamDecoder(**options)
+    for start in range(0, len(body), chunk_size):
+        decoder.feed(body[start:start + chunk_size])
+    return decoder.close()
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 64, 1 << 20])
+@pytest.mark.parametrize("data,expected", [
+    ({"posts": [{"id": 1}]}, [{"id": 1}]),
+    ({"data": [{"id": 1}, {"id": 2}]}, [{"id": 1}, {"id": 2}]),
+    ([{"id": 1}, 2, "three", {"id": 4}], [{"id": 1}, {"id": 4}]),
+    ({"id": 1}, [{"id": 1}]),
+    ({}, []),
+    ([], []),
+    (12345, []),
+    ({"posts": None}, []),
+    ({"data": [{"id": 1}], "page": {"next": [1, 2]}, "posts": [{"id": "é\"]}"}]}, [{"id": "é\"]}"}]),
+])
+def test_decodes_upstream_formats_across_chunk_boundaries(data, expected, chunk_size):
+    """Test that every upstream format decodes the same however the body is split"""
+    assert decode(json.dumps(data, indent=2).encode(), chunk_size) == expected
+
+def test_items_are_projected_while_decoding():
+    """Test that only the requested fields of each item are kept"""
+    body = json.dumps({"posts": [{"id": 1, "username": "a", "bio": "x" * 1000}]}).encode()
+    assert decode(body, 16, project=project_fields(("id", "username"))) == [{"id": 1, "username": "a"}]
+
+@pytest.mark.parametrize("body", [b'{"posts": [{"id": 1}', b'[1, 2', b'{"a" 1}', b'[{"id": 1}] x', b''])
+def test_malformed_bodies_raise(body):
+    """Test that truncated or invalid bodies are errors, not partial results"""
+    with pytest.raises(ValueError):
+        decode(body, 4)
@@ -0,0 +1,93 @@
+import json
+import logging
+import queue
+import sys
+import threading
+from logging.handlers import QueueListener
+from unittest.mock import patch
+from app.core.logging import AsyncQueueHandler, HotPathFilter, JsonFormatter
+
+def make_record(name="app.services.recommendation_engine", level=logging.INFO, lineno=10, msg="scored", args=()):
+    return logging.LogRecord(name, level, "engine.py", lineno, msg, args, None)
+
+class RecordingHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append((record, self.format(record)))
+
+def test_json_formatter_includes_extra_fields_and_exception():
+    """Test that records become one JSON object carrying their extra fields"""
+    logger = logging.getLogger("test_json_formatter")
+    try:
+        raise ValueError("bad score")
+    except ValueError:
+        record = logger.makeRecord(
+            logger.name, logging.ERROR, "engine.py", 1, "Scoring %s failed", ("post 7",),
+            sys.exc_info(), extra={"event": "recommendation", "count": 3}
+        )
+
+    entry = json.loads(JsonFormatter().format(record))
+    assert entry["level"] == "ERROR"
+    assert entry["logger"] == "test_json_formatter"
+    assert entry["message"] == "Scoring post 7 failed"
+    assert entry["event"] == "recommendation"
+    assert entry["count"] == 3
+    assert "ValueError: bad score" in entry["exception"]
+
+def test_sampling_applies_below_warning_only():
+    """Test that sampled loggers drop INFO records but keep warnings, and others keep everything"""
+    hot_path = HotPathFilter({"app.services.recommendation_engine": 0.0})
+
+    assert not hot_path.filter(make_record())
+    assert not hot_path.filter(make_record(name="app.services.recommendation_engine.child"))
+    assert hot_path.filter(make_record(level=logging.WARNING))
+    assert hot_path.filter(make_record(name="app.services.recommendation_engines"))
+    assert hot_path.sampled_out == 2
+
+def test_rate_limit_per_call_site_reports_suppressed_records():
+    """Test that a source line is rate limited and the next record through counts what was dropped"""
+    hot_path = HotPathFilter(rate_limit_per_second=2.0)
+    with patch('app.core.logging.time.monotonic', return_value=100.0):
+        passed = [hot_path.filter(make_record(level=logging.ERROR)) for _ in range(5)]
+        assert hot_path.filter(make_record(level=logging.ERROR, lineno=11))
+    assert passed == [True, True, False, False, False]
+    assert hot_path.rate_limited == 3
+
+    with patch('app.core.logging.time.monotonic', return_value=101.0):
+        record = make_record(level=logging.ERROR)
+        assert hot_path.filter(record)
+    assert record.suppressed == 3
+
+def test_queue_handler_formats_on_the_listener_thread():
+    """Test that queued records are formatted by the listener, not the logging thread"""
+    formatted_on = []
+
+    class Lazy:
+        def __str__(self):
+            formatted_on.append(threading.current_thread().name)
+            return "lazy"
+
+    log_queue = queue.Queue()
+    recording = RecordingHandler()
+    listener = QueueListener(log_queue, recording)
+    handler = AsyncQueueHandler(log_queue)
+    listener.start()
+    try:
+        handler.handle(make_record(msg="value %s", args=(Lazy(),)))
+        assert formatted_on == []
+    finally:
+        listener.stop()
+
+    assert [message for _, message in recording.records] == ["value lazy"]
+    assert formatted_on and formatted_on[0] != threading.current_thread().name
+
+def test_full_queue_drops_instead_of_blocking():
+    """Test that a full log queue drops and counts records"""
+    handler = AsyncQueueHandler(queue.Queue(maxsize=2))
+    for _ in range(5):
+        handler.handle(make_record())
+    assert handler.queue.qsize() == 2
+    assert handler.dropped == 3
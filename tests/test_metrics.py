@@ -0,0 +1,80 @@
+import asyncio
+import pytest
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services.metrics import Histogram, Metrics, Sample
+from .test_fixtures import get_mock_data
+
+def test_histogram_renders_cumulative_buckets():
+    """Test that bucket counts are cumulative and sum/count are reported per label set"""
+    histogram = Histogram("latency_seconds", "Latency", ("stage",), buckets=(0.1, 1.0))
+    for seconds in (0.05, 0.5, 0.5, 5.0):
+        histogram.observe(seconds, "scoring")
+
+    lines = histogram.render()
+    assert 'latency_seconds_bucket{stage="scoring",le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{stage="scoring",le="1.0"} 3' in lines
+    assert 'latency_seconds_bucket{stage="scoring",le="+Inf"} 4' in lines
+    assert 'latency_seconds_sum{stage="scoring"} 6.05' in lines
+    assert 'latency_seconds_count{stage="scoring"} 4' in lines
+
+@pytest.mark.asyncio
+async def test_stages_are_billed_to_the_request_that_ran_them():
+    """Test that stage timings reach the request's own timings, including from tasks and threads"""
+    metrics = Metrics()
+
+    @metrics.timed("db_write")
+    async def write():
+        await asyncio.sleep(0)
+
+    def rank():
+        with metrics.stage("scoring"):
+            pass
+
+    with metrics.stage("outside"):
+        pass
+    timings = metrics.start_request()
+    await asyncio.ensure_future(write())
+    await asyncio.to_thread(rank)
+    await asyncio.to_thread(metrics.untracked, rank)
+
+    assert set(timings) == {"db_write", "scoring"}
+    assert metrics.stage_seconds.count("scoring") == 2
+    assert metrics.stage_seconds.count("outside") == 1
+
+def test_collector_samples_are_grouped_and_failures_skipped():
+    """Test that samples of one metric from several collectors render as one family"""
+    metrics = Metrics()
+    metrics.register(lambda: [Sample("queue_depth", "gauge", "Depth", {"queue": "a"}, 1)])
+    metrics.register(lambda: [Sample("queue_depth", "gauge", "Depth", {"queue": "b\""}, 2)])
+    metrics.register(lambda: 1 / 0)
+
+    text = metrics.render()
+    assert text.count("# TYPE recommender_queue_depth gauge") == 1
+    assert 'recommender_queue_depth{queue="a"} 1.0\nrecommender_queue_depth{queue="b\\""} 2.0' in text
+
+def test_feed_reports_fresh_stage_timings_and_metrics_endpoint():
+    """Test that cache hits report their own timings and /metrics exposes the stages"""
+    with patch('app.services.data_fetcher.DataFetcher.get_all_data') as mock_get_data:
+        mock_get_data.return_value = get_mock_data()
+        client = TestClient(app)
+        first = client.get("/feed?username=metrics_user&limit=7").json()["performance_metrics"]
+        second = client.get("/feed?username=metrics_user&limit=7").json()["performance_metrics"]
+        response = client.get("/metrics")
+
+    assert {"cache_lookup_seconds", "scoring_seconds", "top_k_seconds"} <= set(first)
+    assert set(second) == {"processing_time_seconds", "cache_lookup_seconds"}
+    assert second["processing_time_seconds"] != first["processing_time_seconds"]
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    for series in (
+        'recommender_stage_duration_seconds_count{stage="cache_lookup"}',
+        'recommender_stage_duration_seconds_bucket{stage="scoring",le="+Inf"}',
+        "recommender_feed_cache_hits_total",
+        'recommender_pool_queue_depth{pool="scoring"}',
+        "recommender_ingestor_queue_depth",
+        "recommender_engine_rebuilds_total"
+    ):
+        assert series in response.text
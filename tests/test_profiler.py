@@ -0,0 +1,103 @@
+import os
+import time
+from unittest.mock import patch
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+from app.api import routes
+from app.main import app
+from app.services.profiler import MAX_SAMPLE_RATE, ProfilingMiddleware, RequestProfiler
+
+def busy_loop(seconds: float) -> int:
+    deadline = time.perf_counter() + seconds
+    count = 0
+    while time.perf_counter() < deadline:
+        count += 1
+    return count
+
+def profiled_app(profiler: RequestProfiler) -> TestClient:
+    test_app = FastAPI()
+
+    @test_app.get("/feed")
+    async def feed():
+        return {"count": busy_loop(0.05)}
+
+    @test_app.get("/feed/stream")
+    async def feed_stream():
+        async def lines():
+            yield "first\n"
+            busy_loop(0.05)
+            yield "second\n"
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    @test_app.get("/other")
+    async def other():
+        return {}
+
+    test_app.add_middleware(ProfilingMiddleware, profiler=profiler)
+    return TestClient(test_app)
+
+def test_profile_requires_admin_token(tmp_path):
+    """Test that ?profile=1 without the admin token runs unprofiled"""
+    profiler = RequestProfiler(str(tmp_path), admin_token="secret")
+    client = profiled_app(profiler)
+
+    assert "x-profile-id" not in client.get("/feed?profile=1").headers
+    assert "x-profile-id" not in client.get("/feed?profile=1", headers={"X-Admin-Token": "wrong"}).headers
+    assert "x-profile-id" not in client.get("/other?profile=1", headers={"X-Admin-Token": "secret"}).headers
+    assert profiler.profiles_written == 0
+
+def test_profile_writes_summary_and_collapsed_stacks(tmp_path):
+    """Test that a profiled request stores a top-functions summary and flamegraph stacks"""
+    profiler = RequestProfiler(str(tmp_path), admin_token="secret", interval_seconds=0.001)
+    client = profiled_app(profiler)
+
+    response = client.get("/feed?profile=deterministic", headers={"X-Admin-Token": "secret"})
+    profile_id = response.headers["x-profile-id"]
+    summary = profiler.load(profile_id)
+
+    assert summary["mode"] == "deterministic"
+    assert summary["status_code"] == 200
+    assert summary["samples"] > 0
+    assert any("busy_loop" in row["function"] for row in summary["top_functions"]["self"])
+    assert any("busy_loop" in row["function"] for row in summary["cprofile"])
+    with open(tmp_path / f"{profile_id}.collapsed") as f:
+        stack, count = f.readline().rsplit(" ", 1)
+    assert ";" in stack and int(count) > 0
+
+def test_streamed_response_is_profiled_to_the_end(tmp_path):
+    """Test that the profile of a streamed response covers the work done while streaming"""
+    profiler = RequestProfiler(str(tmp_path), admin_token="secret", interval_seconds=0.001)
+    client = profiled_app(profiler)
+
+    response = client.get("/feed/stream", headers={"X-Admin-Token": "secret", "X-Profile": "1"})
+    summary = profiler.load(response.headers["x-profile-id"])
+    assert response.text == "first\nsecond\n"
+    assert summary["duration_seconds"] >= 0.05
+
+def test_retention_and_sample_rate_are_capped(tmp_path):
+    """Test that old profiles are pruned and the sample rate cannot exceed its cap"""
+    profiler = RequestProfiler(str(tmp_path), sample_rate=1.0, max_profiles=2)
+    client = profiled_app(profiler)
+    assert profiler.sample_rate == MAX_SAMPLE_RATE
+
+    with patch('app.services.profiler.random.random', return_value=0.0):
+        for _ in range(4):
+            assert "x-profile-id" in client.get("/feed").headers
+    assert profiler.profiles_written == 4
+    assert len([name for name in os.listdir(tmp_path) if name.endswith(".json")]) == 2
+    assert len(os.listdir(tmp_path)) == 4
+
+def test_disabled_profiler_and_admin_endpoint(tmp_path):
+    """Test that profiling is off by default and stored profiles need the admin token"""
+    assert not RequestProfiler(str(tmp_path)).enabled
+
+    profiler = RequestProfiler(str(tmp_path), admin_token="secret")
+    profile_id = profiled_app(profiler).get("/feed", headers={"X-Admin-Token": "secret", "X-Profile": "1"}).headers["x-profile-id"]
+    with patch.object(routes, 'request_profiler', profiler):
+        client = TestClient(app)
+        assert client.get(f"/profiles/{profile_id}").status_code == 403
+        response = client.get(f"/profiles/{profile_id}", headers={"X-Admin-Token": "secret"})
+        assert response.status_code == 200
+        assert response.json()["id"] == profile_id
+        assert client.get("/profiles/missing", headers={"X-Admin-Token": "secret"}).status_code == 404
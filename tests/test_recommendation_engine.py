@@ -112,4 +112,43 @@ def test_recommendation_sorting(sample_data):
     if len(recommendations) >= 2:
         first_score = engine._calculate_post_score(recommendations[0])
         second_score = engine._calculate_post_score(recommendations[1])
-        assert first_score >= second_score
\ No newline at end of file
+        assert first_score >= second_score
+
+def test_post_categories(sample_data):
+    """Test post to category mapping"""
+    engine = RecommendationEngine(sample_data)
+    assert engine.post_categories == {1: 2, 2: 2}
+
+def test_local_scores_count_towards_personalization(sample_data):
+    """Test that locally recorded aggregates personalize a user without touching the profiles"""
+    engine = RecommendationEngine(sample_data, local_scores=[("local_user", 1, 3.0), ("local_user", 2, 1.0)])
+    assert engine.local_activity == {"local_user": 2}
+    assert "local_user" not in engine.user_profiles
+    assert engine.is_personalized("local_user") is True
+    assert engine.is_personalized("new_user") is False
+
+def test_category_filter_uses_category_index(sample_data):
+    """Test that category filtering keeps catalog order and ignores uncategorized posts"""
+    sample_data['posts'].append({'id': 3, 'category': None, 'view_count': 1})
+    sample_data['posts'].append({'id': 4, 'category': {'id': 7}, 'view_count': 1})
+    engine = RecommendationEngine(sample_data)
+
+    assert engine.category_posts[2] == [0, 1]
+    assert [post['id'] for post in engine.get_recommendations("test_user", category_id=7)] == [4]
+    assert engine.get_recommendations("test_user", category_id=99) == []
+
+def test_rank_posts_matches_scalar_scores(sample_data):
+    """Test that the vectorized ranking orders posts as the scalar post score does"""
+    posts = [
+        {**post, 'id': post['id'] + 100 * copy, 'view_count': (post.get('view_count') or 0) + copy}
+        for copy in range(20) for post in sample_data['posts']
+    ]
+    posts.append({'id': 9999, 'title': 'broken', 'category': {'id': 1}, 'view_count': 'n/a'})
+    engine = RecommendationEngine({**sample_data, 'posts': posts})
+
+    for category_id in (None, 1, 2, 42):
+        for mood in (None, 'happy', 'calm'):
+            candidates = posts if category_id is None else [posts[i] for i in engine.category_posts.get(category_id, [])]
+            expected = sorted(candidates, key=lambda post: engine._calculate_post_score(post, mood), reverse=True)[:15]
+            ranked = engine.rank_posts(category_id=category_id, mood=mood, limit=15)
+            assert [p['id'] for p in ranked] == [p['id'] for p in expected]
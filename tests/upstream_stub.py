@@ -0,0 +1,199 @@
+"""
+Local stand-in for the upstream API that honours conditional requests, for
+measuring what ETag/Last-Modified revalidation saves.
+
+    python -m tests.upstream_stub --serve --port 8001   # then BASE_URL=http://127.0.0.1:8001
+    python -m tests.upstream_stub --rounds 20 --change-every 5
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import time
+from collections import Counter
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Any, Dict, List, Tuple
+import httpx
+from fastapi import FastAPI, Request, Response
+from app.core.config import settings
+from app.services.data_fetcher import DataFetcher
+from app.services.engine_snapshot import EngineSnapshot
+from app.services.recommendation_engine import ENGINE_DATASETS, PROFILE_DATASETS, RecommendationEngine
+
+def synthetic_datasets(posts: int, users: int, interactions: int) -> Dict[str, List[Dict[str, Any]]]:
+    """Posts plus interactions spread over every interaction type"""
+    datasets = {'posts': [{'id': i, 'category': {'id': i % 5}, 'view_count': i} for i in range(posts)]}
+    for t, name in enumerate(PROFILE_DATASETS):
+        datasets[name] = [
+            {'id': (i * 7 + t) % users, 'username': f"user_{(i * 7 + t) % users}",
+             'post_id': (i * 13) % posts, 'rating': 50}
+            for i in range(t, interactions, len(PROFILE_DATASETS))
+        ]
+    return datasets
+
+class UpstreamStub:
+    """
+    Serves each dataset at its settings.ENDPOINTS path with an ETag and a
+    Last-Modified header, answering matching conditional requests with 304.
+    With validators=False no validators are sent, like an upstream that
+    does not support them.
+    """
+
+    def __init__(self, datasets: Dict[str, List[Dict[str, Any]]], validators: bool = True):
+        self.datasets = datasets
+        self.validators = validators
+        self.requests: Counter = Counter()
+        self.not_modified: Counter = Counter()
+        self.bytes_sent = 0
+        self.bytes_saved = 0
+        self._paths = {settings.ENDPOINTS[name]: name for name in datasets}
+        # name -> (body, etag, last modified as unix seconds)
+        self._published: Dict[str, Tuple[bytes, str, int]] = {}
+        for name in datasets:
+            self._publish(name)
+
+        self.app = FastAPI()
+        self.app.add_api_route("/{path:path}", self._serve, methods=["GET"])
+
+    def _publish(self, name: str) -> None:
+        body = json.dumps({'posts': self.datasets[name]}).encode()
+        etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+        previous = self._published.get(name)
+        # Last-Modified has one-second resolution, so a change must move it forward
+        modified = int(time.time()) if previous is None else max(int(time.time()), previous[2] + 1)
+        self._published[name] = (body, etag, modified)
+
+    def update(self, name: str, items: List[Dict[str, Any]]) -> None:
+        """Replace a dataset, giving it a new ETag and Last-Modified"""
+        self.datasets[name] = items
+        self._publish(name)
+
+    def _is_not_modified(self, request: Request, etag: str, modified: int) -> bool:
+        if_none_match = request.headers.get('if-none-match')
+        if if_none_match is not None:
+            # If-None-Match takes precedence over If-Modified-Since
+            return if_none_match.strip() == '*' or etag in [tag.strip() for tag in if_none_match.split(',')]
+        if_modified_since = request.headers.get('if-modified-since')
+        if if_modified_since is not None:
+            try:
+                return modified <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    async def _serve(self, path: str, request: Request) -> Response:
+        name = self._paths.get(f"/{path}")
+        if name is None:
+            return Response(status_code=404)
+
+        body, etag, modified = self._published[name]
+        self.requests[name] += 1
+        headers = {'ETag': etag, 'Last-Modified': formatdate(modified, usegmt=True)} if self.validators else {}
+        if self.validators and self._is_not_modified(request, etag, modified):
+            self.not_modified[name] += 1
+            self.bytes_saved += len(body)
+            return Response(status_code=304, headers=headers)
+
+        self.bytes_sent += len(body)
+        return Response(body, media_type="application/json", headers=headers)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'requests': sum(self.requests.values()),
+            'not_modified': sum(self.not_modified.values()),
+            'bytes_sent': self.bytes_sent,
+            'bytes_saved': self.bytes_saved
+        }
+
+def stub_fetcher(stub: UpstreamStub) -> DataFetcher:
+    """A DataFetcher whose requests are answered in-process by the stub"""
+    fetcher = DataFetcher()
+    fetcher.client = httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=stub.app),
+        headers=settings.HEADERS
+    )
+    return fetcher
+
+async def measure(
+    rounds: int = 20,
+    change_every: int = 5,
+    posts: int = 2000,
+    users: int = 500,
+    interactions: int = 20000,
+    validators: bool = True,
+    changed: str = 'viewed'
+) -> Dict[str, Any]:
+    """
+    Refresh every engine dataset `rounds` times against the stub, changing
+    one dataset every `change_every` rounds, and report the bytes and engine
+    rebuilds the conditional requests saved.
+    """
+    stub = UpstreamStub(synthetic_datasets(posts, users, interactions), validators=validators)
+    fetcher = stub_fetcher(stub)
+
+    async def build(data, local_scores, previous):
+        return RecommendationEngine(data, local_scores=local_scores, previous=previous)
+
+    async def load_local_scores(since=None):
+        return None
+
+    snapshot = EngineSnapshot(
+        fetch=lambda datasets: fetcher.get_all_data(datasets=datasets),
+        build=build,
+        load_local_scores=load_local_scores,
+        cadences={name: 0.0 for name in ENGINE_DATASETS},
+        local_refresh_seconds=float('inf')
+    )
+
+    started = time.perf_counter()
+    try:
+        for round_number in range(rounds):
+            if round_number and change_every and round_number % change_every == 0:
+                interaction = {'id': round_number, 'username': f"user_{round_number % users}",
+                               'post_id': round_number % posts, 'rating': 50}
+                stub.update(changed, stub.datasets[changed] + [interaction])
+            await snapshot.get()
+    finally:
+        await fetcher.close()
+
+    endpoints = fetcher.upstream.stats().values()
+    return {
+        'rounds': rounds,
+        'seconds': time.perf_counter() - started,
+        'stub': stub.stats(),
+        'fetcher': {
+            key: sum(endpoint[key] for endpoint in endpoints)
+            for key in ('requests', 'not_modified', 'unchanged', 'bytes_received', 'bytes_saved')
+        },
+        'engine': {
+            'rebuilds': snapshot.rebuilds,
+            'rebuilds_skipped': snapshot.rebuilds_skipped
+        }
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Upstream stub honouring conditional requests")
+    parser.add_argument("--serve", action="store_true", help="serve the stub over HTTP instead of measuring")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--change-every", type=int, default=5)
+    parser.add_argument("--posts", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--interactions", type=int, default=20000)
+    parser.add_argument("--no-validators", action="store_true", help="send no ETag/Last-Modified")
+    args = parser.parse_args()
+
+    if args.serve:
+        import uvicorn
+        stub = UpstreamStub(synthetic_datasets(args.posts, args.users, args.interactions),
+                            validators=not args.no_validators)
+        uvicorn.run(stub.app, host="127.0.0.1", port=args.port)
+    else:
+        print(json.dumps(asyncio.run(measure(
+            rounds=args.rounds,
+            change_every=args.change_every,
+            posts=args.posts,
+            users=args.users,
+            interactions=args.interactions,
+            validators=not args.no_validators
+        )), indent=2))